@@ -0,0 +1,388 @@
+"""Handler benchmarks over a reproducible synthetic corpus.
+
+    python benchmark.py                          # generate corpus (once) and run everything
+    python benchmark.py --only jpeg,mp3 --sizes small --repeat 10
+    python benchmark.py --out new.json --compare old.json
+
+The corpus is generated from a fixed seed into --corpus (default: bench_corpus/) and reused
+on later runs. Every case (kind x size) runs in a fresh process on a scratch copy of its
+file, so peak RSS is per case and saves never modify the corpus. Results are JSON.
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import datetime, timezone
+
+SEED = 1234
+FORMAT_VERSION = 1
+
+# kind -> size tier -> generator parameter
+SIZES = {
+    "jpeg": {"small": (640, 480), "medium": (1920, 1080), "large": (4000, 3000)},
+    "pdf": {"small": 10, "medium": 100, "large": 1000},           # pages
+    "xlsx": {"small": 1_000, "medium": 20_000, "large": 100_000},  # rows (10 columns)
+    "docx": {"small": 100, "medium": 2_000, "large": 20_000},     # paragraphs
+    "mp3": {"small": 30, "medium": 300, "large": 1800},           # seconds at 128 kbps
+    "flac": {"small": 30, "medium": 300, "large": 600},           # seconds
+}
+# Written into every generated file instead of "now", so the corpus is byte-for-byte reproducible
+FIXED_DATE = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+EXTENSIONS = {"jpeg": ".jpg", "pdf": ".pdf", "xlsx": ".xlsx", "docx": ".docx", "mp3": ".mp3", "flac": ".flac"}
+
+# The tag each save case edits (one changed tag on top of the file's full tag set)
+SAVE_KEYS = {"jpeg": "Artist", "pdf": "Title", "xlsx": "title", "docx": "title", "mp3": "TIT2", "flac": "title"}
+
+
+# --- Corpus ---------------------------------------------------------------
+
+def _noise_image(rng: random.Random, size, mode="RGB"):
+    """Smooth-ish deterministic content: seeded noise at 1/8 scale, upsampled."""
+    from PIL import Image
+    w, h = max(1, size[0] // 8), max(1, size[1] // 8)
+    small = Image.frombytes(mode, (w, h), rng.randbytes(w * h * len(mode)))
+    return small.resize(size, Image.BICUBIC)
+
+
+def _cover_jpeg(rng: random.Random) -> bytes:
+    buf = io.BytesIO()
+    _noise_image(rng, (1000, 1000)).save(buf, "JPEG", quality=85)
+    return buf.getvalue()
+
+
+def _pin_zip_dates(path: str):
+    """Rewrites an OOXML package with FIXED_DATE for the core properties and every member."""
+    stamp = FIXED_DATE.strftime("%Y-%m-%dT%H:%M:%SZ").encode()
+    tmp = path + ".zip"
+    with zipfile.ZipFile(path) as src, zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            data = src.read(info)
+            if info.filename == "docProps/core.xml":
+                for tag in (b"dcterms:created", b"dcterms:modified"):
+                    start = data.find(b">", data.find(b"<" + tag)) + 1
+                    end = data.find(b"</" + tag, start)
+                    if start and end > 0:
+                        data = data[:start] + stamp + data[end:]
+            dst.writestr(zipfile.ZipInfo(info.filename, FIXED_DATE.timetuple()[:6]), data,
+                         compress_type=zipfile.ZIP_DEFLATED)
+    os.replace(tmp, path)
+
+
+def _make_jpeg(path: str, size, rng: random.Random):
+    import piexif
+    thumb = io.BytesIO()
+    _noise_image(rng, (160, 120)).save(thumb, "JPEG", quality=70)
+    exif_dict = {
+        "0th": {
+            piexif.ImageIFD.Make: b"BenchCam", piexif.ImageIFD.Model: b"Model 7",
+            piexif.ImageIFD.Software: b"bench 1.0", piexif.ImageIFD.DateTime: b"2024:01:02 03:04:05",
+            piexif.ImageIFD.Artist: b"Benchmark", piexif.ImageIFD.Copyright: b"Public domain",
+            piexif.ImageIFD.ImageDescription: b"Synthetic benchmark image " * 4,
+            piexif.ImageIFD.Orientation: 1,
+        },
+        "Exif": {
+            piexif.ExifIFD.DateTimeOriginal: b"2024:01:02 03:04:05",
+            piexif.ExifIFD.DateTimeDigitized: b"2024:01:02 03:04:05",
+            piexif.ExifIFD.ExposureTime: (1, 250), piexif.ExifIFD.FNumber: (28, 10),
+            piexif.ExifIFD.ISOSpeedRatings: 200, piexif.ExifIFD.FocalLength: (686, 100),
+            piexif.ExifIFD.LensModel: b"Bench 24-70mm", piexif.ExifIFD.BodySerialNumber: b"0001",
+            piexif.ExifIFD.UserComment: b"ASCII\x00\x00\x00" + b"comment " * 32,
+            piexif.ExifIFD.MakerNote: rng.randbytes(4096),
+        },
+        "GPS": {
+            piexif.GPSIFD.GPSLatitudeRef: b"N", piexif.GPSIFD.GPSLatitude: ((52, 1), (31, 1), (1234, 100)),
+            piexif.GPSIFD.GPSLongitudeRef: b"E", piexif.GPSIFD.GPSLongitude: ((13, 1), (24, 1), (5678, 100)),
+            piexif.GPSIFD.GPSAltitude: (3400, 100),
+        },
+        "1st": {piexif.ImageIFD.Compression: 6},
+        "thumbnail": thumb.getvalue(),
+    }
+    _noise_image(rng, size).save(path, "JPEG", quality=90, exif=piexif.dump(exif_dict))
+
+
+def _make_pdf(path: str, pages: int, rng: random.Random):
+    first = _noise_image(rng, (200, 260), "L")
+    rest = [_noise_image(rng, (200, 260), "L") for _ in range(pages - 1)]
+    first.save(path, "PDF", save_all=True, append_images=rest, resolution=72.0,
+               title="Benchmark document", author="Benchmark", subject="Synthetic", keywords="bench, pdf",
+               creator="benchmark.py", producer="Pillow", creationDate=FIXED_DATE.timetuple(),
+               modDate=FIXED_DATE.timetuple())
+
+
+def _make_xlsx(path: str, rows: int, rng: random.Random):
+    import openpyxl
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Data")
+    ws.append([f"col{i}" for i in range(10)])
+    for r in range(rows):
+        ws.append([r, rng.random(), f"text {rng.randrange(10**6)}"] + [rng.randrange(1000) for _ in range(7)])
+    wb.properties.title = "Benchmark workbook"
+    wb.properties.creator = "Benchmark"
+    wb.properties.subject = "Synthetic"
+    wb.save(path)
+    _pin_zip_dates(path)
+
+
+def _make_docx(path: str, paragraphs: int, rng: random.Random):
+    import docx
+    words = ["metadata", "benchmark", "exif", "handler", "synthetic", "corpus", "paragraph", "editor"]
+    doc = docx.Document()
+    for _ in range(paragraphs):
+        doc.add_paragraph(" ".join(rng.choice(words) for _ in range(40)))
+    doc.core_properties.title = "Benchmark document"
+    doc.core_properties.author = "Benchmark"
+    doc.core_properties.subject = "Synthetic"
+    doc.save(path)
+    _pin_zip_dates(path)
+
+
+def _make_mp3(path: str, seconds: int, rng: random.Random):
+    from mutagen.id3 import APIC, COMM, ID3, TALB, TDRC, TIT2, TPE1, TRCK
+    # MPEG-1 Layer III, 128 kbps, 44.1 kHz: 417/418-byte frames of 1152 samples
+    header = struct.pack(">I", 0xFFFB9064)
+    frames = int(seconds * 44100 / 1152)
+    with open(path, "wb") as f:
+        for i in range(frames):
+            pad = 1 if (i * 417.95918) % 1 > 0.04 else 0  # Close enough to the real padding cadence
+            f.write(header[:2] + bytes([header[2] | (pad << 1)]) + header[3:] + rng.randbytes(413 + pad))
+    tags = ID3()
+    tags.add(TIT2(encoding=3, text=["Benchmark track"]))
+    tags.add(TPE1(encoding=3, text=["Benchmark"]))
+    tags.add(TALB(encoding=3, text=["Synthetic"]))
+    tags.add(TRCK(encoding=3, text=["1/10"]))
+    tags.add(TDRC(encoding=3, text=["2024"]))
+    tags.add(COMM(encoding=3, lang="eng", desc="", text=["comment " * 16]))
+    tags.add(APIC(encoding=3, mime="image/jpeg", type=3, desc="Cover", data=_cover_jpeg(rng)))
+    tags.save(path)
+
+
+def _make_flac(path: str, seconds: int, rng: random.Random):
+    from mutagen.flac import FLAC, Picture
+    samples = seconds * 44100
+    # STREAMINFO: block sizes, frame sizes (unknown), 44.1 kHz, 2 channels, 16 bits, sample count, MD5
+    info = struct.pack(">HH", 4096, 4096) + b"\x00" * 6
+    info += ((44100 << 44) | (1 << 41) | (15 << 36) | samples).to_bytes(8, "big") + b"\x00" * 16
+    with open(path, "wb") as f:
+        f.write(b"fLaC" + bytes([0x80]) + len(info).to_bytes(3, "big") + info)
+        remaining = seconds * 88200  # ~700 kbps of stand-in frame data
+        while remaining > 0:
+            chunk = min(remaining, 1 << 20)
+            f.write(rng.randbytes(chunk))
+            remaining -= chunk
+    audio = FLAC(path)
+    audio["title"] = "Benchmark track"
+    audio["artist"] = "Benchmark"
+    audio["album"] = "Synthetic"
+    audio["tracknumber"] = "1"
+    audio["comment"] = "comment " * 16
+    pic = Picture()
+    pic.type, pic.mime, pic.desc, pic.width, pic.height, pic.depth = 3, "image/jpeg", "Cover", 1000, 1000, 24
+    pic.data = _cover_jpeg(rng)
+    audio.add_picture(pic)
+    audio.save()
+
+
+GENERATORS = {"jpeg": _make_jpeg, "pdf": _make_pdf, "xlsx": _make_xlsx, "docx": _make_docx,
+              "mp3": _make_mp3, "flac": _make_flac}
+
+
+def corpus_path(corpus: str, kind: str, size: str) -> str:
+    return os.path.join(corpus, f"{kind}-{size}{EXTENSIONS[kind]}")
+
+
+def generate_corpus(corpus: str, kinds, sizes, seed: int = SEED, log=print):
+    """Creates any missing corpus files. Each file has its own RNG stream, so a file's
+    bytes do not depend on which other files were generated."""
+    os.makedirs(corpus, exist_ok=True)
+    for kind in kinds:
+        for size in sizes:
+            path = corpus_path(corpus, kind, size)
+            if os.path.exists(path):
+                continue
+            log(f"Generating {os.path.basename(path)}...")
+            rng = random.Random(f"{seed}:{kind}:{size}")
+            tmp = path + ".part"
+            GENERATORS[kind](tmp, SIZES[kind][size], rng)
+            os.replace(tmp, path)
+
+
+# --- Measurement ----------------------------------------------------------
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, or None where it cannot be read."""
+    try:
+        # Linux: VmHWM is reset by exec, unlike ru_maxrss, which a spawned worker
+        # inherits from the parent it was forked from
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024  # Linux reports KiB
+    except ImportError:
+        pass
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+        counters = Counters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+    return None
+
+
+def _summary(samples):
+    ms = [s * 1000 for s in samples]
+    return {"min_ms": round(min(ms), 3), "median_ms": round(statistics.median(ms), 3),
+            "mean_ms": round(statistics.fmean(ms), 3), "runs": len(ms)}
+
+
+def run_case(kind: str, size: str, source: str, repeat: int) -> dict:
+    """Times handler load and save on a scratch copy of source. Runs in its own process."""
+    from src import instrument
+    from src.core import MetadataManager
+
+    workdir = tempfile.mkdtemp(prefix="metaexif-bench-")
+    try:
+        path = os.path.join(workdir, os.path.basename(source))
+        shutil.copyfile(source, path)
+        handler, hint = MetadataManager.resolve(path)
+        rss_before = peak_rss_bytes()
+        quiet = contextlib.redirect_stdout(io.StringIO())  # Third-party code may still print
+
+        loads = []
+        with quiet:
+            data = handler.load(path, hint)  # Warm-up: lazy imports, first-touch page cache
+            counters = instrument.enable()
+            for _ in range(repeat):
+                start = time.perf_counter()
+                data = handler.load(path, hint)
+                loads.append(time.perf_counter() - start)
+
+        load_stages = counters.drain()
+
+        # One changed tag per save, passed the way MetadataManager.save would pass it
+        key = SAVE_KEYS[kind]
+        saves = []
+        for i in range(repeat):
+            value = f"Benchmark edit {i}"
+            if handler.accepts_delta:
+                edit = {key: value}
+            else:
+                edit = {k: v for k, v in data.items() if not k.startswith("@")}
+                edit[key] = value
+            with quiet:
+                start = time.perf_counter()
+                handler.save(path, edit, hint)
+                saves.append(time.perf_counter() - start)
+
+        return {
+            "kind": kind, "size": size, "handler": type(handler).__name__,
+            "file_bytes": os.path.getsize(source), "tags": len(data),
+            "load": _summary(loads), "save": _summary(saves),
+            "stages": {"load": load_stages, "save": counters.drain()},
+            "peak_rss_bytes": peak_rss_bytes(), "baseline_rss_bytes": rss_before,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=10,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results: dict, baseline: dict, log=print):
+    """Prints median load/save ratios (new / baseline) for cases present in both."""
+    old = {(r["kind"], r["size"]): r for r in baseline.get("results", [])}
+    log(f"{'case':<16}{'load':>10}{'save':>10}{'rss':>10}")
+    for r in results["results"]:
+        b = old.get((r["kind"], r["size"]))
+        if b is None:
+            continue
+        ratio = lambda op: r[op]["median_ms"] / b[op]["median_ms"] if b[op]["median_ms"] else float("nan")
+        rss = r["peak_rss_bytes"] / b["peak_rss_bytes"] if r["peak_rss_bytes"] and b["peak_rss_bytes"] else float("nan")
+        log(f"{r['kind'] + '-' + r['size']:<16}{ratio('load'):>9.2f}x{ratio('save'):>9.2f}x{rss:>9.2f}x")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark metadata handlers on a synthetic corpus.")
+    parser.add_argument("--corpus", default="bench_corpus", help="Corpus directory (generated if missing)")
+    parser.add_argument("--out", default="bench_results.json", help="Where to write the JSON results")
+    parser.add_argument("--only", default=",".join(SIZES), help="Comma-separated kinds: " + ",".join(SIZES))
+    parser.add_argument("--sizes", default="small,medium,large", help="Comma-separated size tiers")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per operation (default: 5)")
+    parser.add_argument("--seed", type=int, default=SEED, help="Corpus seed (change it with a fresh --corpus)")
+    parser.add_argument("--compare", help="Baseline results JSON to print ratios against")
+    args = parser.parse_args(argv)
+
+    kinds = [k for k in args.only.split(",") if k]
+    sizes = [s for s in args.sizes.split(",") if s]
+    unknown = [k for k in kinds if k not in SIZES] + [s for s in sizes if s not in SIZES["jpeg"]]
+    if unknown:
+        parser.error(f"Unknown kind or size: {', '.join(unknown)}")
+
+    generate_corpus(args.corpus, kinds, sizes, args.seed)
+
+    results = {
+        "format": FORMAT_VERSION,
+        "meta": {
+            "commit": _git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(), "platform": platform.platform(),
+            "seed": args.seed, "repeat": args.repeat,
+        },
+        "results": [],
+    }
+    # maxtasksperchild=1: each case gets a fresh interpreter, so peak RSS is its own
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(processes=1, maxtasksperchild=1) as pool:
+        for kind in kinds:
+            for size in sizes:
+                source = corpus_path(args.corpus, kind, size)
+                r = pool.apply(run_case, (kind, size, source, args.repeat))
+                results["results"].append(r)
+                print(f"{kind + '-' + size:<16} load {r['load']['median_ms']:>10.2f} ms   "
+                      f"save {r['save']['median_ms']:>10.2f} ms   "
+                      f"peak RSS {(r['peak_rss_bytes'] or 0) / 2**20:>8.1f} MiB")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
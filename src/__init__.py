@@ -0,0 +1,8 @@
+"""MetaExif Pro.
+
+Modules log through the standard logging module under the "src" logger, which is silent
+until the application configures logging (e.g. python -m src.cli -v).
+"""
+import logging
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
@@ -0,0 +1,315 @@
+"""Batch tag writer: python -m src.batch --set KEY=VALUE [--set ...] PATH [PATH ...]
+
+Applies one edit set (tag key -> new value, keys as load() returns them) to every file
+under the given paths, on a process pool (or a thread pool with --threads).
+
+Each file is committed atomically: the new file is built in a temp file in the same
+directory, which then replaces the original with os.replace. A crash or a failed
+write leaves the original untouched; there is never a half-written file in its place.
+Handlers that splice a new file anyway (JPEG/PNG/WebP Exif, DOCX/XLSX) write it straight
+to the temp file. In-place editors (TIFF IFDs, PDF incremental updates, MP4 moov, audio
+tags) edit a full copy instead: atomicity costs one copy of the file there.
+
+Every outcome is appended to a journal (JSON Lines). Re-running with the same journal
+and edit set skips files already recorded as written or unchanged and retries the
+failed ones. Files committed but not yet journaled when a run dies are harmless:
+on the re-run their diff is empty and they come back as unchanged.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from . import cache, instrument
+from .cli import Progress, chunks, configure_logging, iter_files
+from .core import GenericHandler, MetadataManager, diff_metadata, is_writable_key
+
+WRITTEN = "written"
+UNCHANGED = "unchanged"
+FAILED = "failed"
+
+JOURNAL_VERSION = 1
+
+
+class Outcome(NamedTuple):
+    path: str
+    status: str  # WRITTEN, UNCHANGED or FAILED
+    reason: Optional[str] = None  # Why it failed ("ExceptionType: message")
+
+    @property
+    def ok(self) -> bool:
+        return self.status != FAILED
+
+
+class BatchError(Exception):
+    pass
+
+
+def _temp_path(path: str) -> str:
+    """A fresh hidden file next to path, keeping the extension (handlers may look at it)."""
+    directory, name = os.path.split(path)
+    fd, temp = tempfile.mkstemp(dir=directory or ".", prefix=f".{name}.", suffix=".tmp" + os.path.splitext(name)[1])
+    os.close(fd)
+    return temp
+
+
+def apply_edits(path: str, edits: Dict[str, str], preserve_times: bool = True) -> Outcome:
+    """Sets the tags in edits on one file, committing through a temp file and os.replace.
+    With preserve_times the file keeps its access and modification times."""
+    temp = None
+    try:
+        st = os.stat(path)
+        handler, hint = MetadataManager.resolve(path)
+        loaded = handler.load(path, hint)
+        if not loaded and not handler.accepts_delta and not isinstance(handler, GenericHandler):
+            # load() returns {} on errors too; writing just the edits would drop every other tag
+            raise BatchError("No metadata could be read, so the file is not rewritten")
+        current = {k: v for k, v in loaded.items() if is_writable_key(k)}
+        changes = diff_metadata(current, {**current, **edits})
+        if not changes:
+            return Outcome(path, UNCHANGED)
+        data = {**changes.added, **changes.changed} if handler.accepts_delta else {**current, **edits}
+
+        temp = _temp_path(path)
+        try:
+            shutil.copystat(path, temp)  # Mode and xattrs; the write that follows bumps mtime
+            result = handler.write_to(path, temp, data, hint)
+            if result is None:
+                with instrument.span("copy") as s:
+                    shutil.copyfile(path, temp)
+                    s.bytes_read = s.bytes_written = st.st_size
+                result = handler.write(temp, data, hint)
+            if not result.written:
+                os.remove(temp)
+                return Outcome(path, UNCHANGED)
+            if preserve_times:
+                with instrument.span("utime"):
+                    os.utime(temp, ns=(st.st_atime_ns, st.st_mtime_ns))
+            if cache.identity(os.stat(path)) != cache.identity(st):
+                raise BatchError("File changed while it was being written")
+            with instrument.span("rename"):
+                os.replace(temp, path)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+        MetadataManager.invalidate(path)
+        return Outcome(path, WRITTEN)
+    except Exception as e:
+        reason = f"{type(e).__name__}: {e}"
+        if temp is not None:
+            reason = reason.replace(temp, path)  # Handler errors name the file they were given
+        return Outcome(path, FAILED, reason)
+
+
+def _apply_batch(paths: List[str], edits: Dict[str, str], preserve_times: bool = True,
+                 stats: bool = False):
+    outcomes = [apply_edits(p, edits, preserve_times) for p in paths]
+    return outcomes, instrument.drain() if stats else None
+
+
+def _init_worker(log_level: Optional[int] = None, stats: bool = False):
+    if log_level is not None:
+        configure_logging(log_level)
+    if stats:
+        instrument.enable()
+
+
+class Journal:
+    """Append-only JSON Lines record of outcomes. The first line holds the edit set, so a
+    journal cannot be resumed with different edits. Paths are stored absolute."""
+
+    def __init__(self, path: str, edits: Dict[str, str]):
+        self.path = path
+        self.done = set()  # Files with a written or unchanged outcome; failures are retried
+        header = {"journal": JOURNAL_VERSION, "edits": edits}
+        needs_newline = False
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, encoding="utf-8") as f:
+                try:
+                    first = json.loads(f.readline())
+                except ValueError:
+                    raise BatchError(f"{path} is not a batch journal")
+                if first.get("journal") != JOURNAL_VERSION or first.get("edits") != edits:
+                    raise BatchError(f"{path} was written for a different edit set")
+                for line in f:
+                    needs_newline = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line from an interrupted run
+                    if entry.get("status") == FAILED:
+                        self.done.discard(entry.get("path"))
+                    else:
+                        self.done.add(entry.get("path"))
+            self._f = open(path, "a", encoding="utf-8")
+            if needs_newline:
+                self._f.write("\n")
+        else:
+            self._f = open(path, "w", encoding="utf-8")
+            self._f.write(json.dumps(header, ensure_ascii=False) + "\n")
+        self._f.flush()
+
+    def skip(self, path: str) -> bool:
+        return os.path.abspath(path) in self.done
+
+    def record(self, outcome: Outcome):
+        entry = {"path": os.path.abspath(outcome.path), "status": outcome.status}
+        if outcome.reason:
+            entry["reason"] = outcome.reason
+        self._f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def flush(self):
+        self._f.flush()
+
+    def close(self):
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._f.close()
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def iter_outcomes(paths: Iterable[str], edits: Dict[str, str], workers: int = None, chunksize: int = 16,
+                  threads: bool = False, include_hidden: bool = False, preserve_times: bool = True,
+                  journal: Optional[Journal] = None, stats: Optional[instrument.Counters] = None,
+                  log_level: Optional[int] = None) -> Iterator[Outcome]:
+    """Yields an Outcome per file under paths, in completion order, journaling each one.
+
+    Same scheduling as cli.iter_records: chunks of `chunksize` files with at most
+    2 * workers chunks in flight. Files the journal already has as done are skipped.
+    threads=True uses a thread pool instead of processes (for slow or network storage,
+    where waiting on I/O dominates)."""
+    if not edits:
+        raise BatchError("No edits given")
+    workers = workers or os.cpu_count() or 1
+    files = iter_files(paths, include_hidden)
+    if journal is not None:
+        files = (p for p in files if not journal.skip(p))
+    batches = chunks(files, max(1, chunksize))
+
+    def collect(result) -> Iterator[Outcome]:
+        outcomes, counters = result
+        if stats is not None:
+            stats.merge(counters)
+        for outcome in outcomes:
+            if journal is not None:
+                journal.record(outcome)
+            yield outcome
+        if journal is not None:
+            journal.flush()
+
+    if workers > 1 and not threads:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(log_level, stats is not None)) as pool:
+            yield from _drain(batches, workers, collect,
+                              lambda batch: pool.submit(_apply_batch, batch, edits, preserve_times, stats is not None))
+        return
+
+    # In this process, spans go straight into stats
+    previous = instrument.active()
+    if stats is not None:
+        instrument.enable(stats)
+    try:
+        if workers == 1:
+            for batch in batches:
+                yield from collect(_apply_batch(batch, edits, preserve_times))
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                yield from _drain(batches, workers, collect,
+                                  lambda batch: pool.submit(_apply_batch, batch, edits, preserve_times))
+    finally:
+        if previous is not None:
+            instrument.enable(previous)
+        elif stats is not None:
+            instrument.disable()
+
+
+def _drain(batches: Iterator[List[str]], workers: int, collect, submit) -> Iterator[Outcome]:
+    pending = set()
+    for batch in batches:
+        pending.add(submit(batch))
+        if len(pending) >= 2 * workers:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from collect(future.result())
+    for future in wait(pending).done:
+        yield from collect(future.result())
+
+
+def _parse_edit(text: str):
+    key, sep, value = text.partition("=")
+    if not sep or not key.strip():
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got {text!r}")
+    return key.strip(), value
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.batch",
+                                     description="Set tags on many files, committing each file atomically.")
+    parser.add_argument("paths", nargs="+", help="Files or directories (walked recursively)")
+    parser.add_argument("-s", "--set", dest="edits", metavar="KEY=VALUE", type=_parse_edit, action="append",
+                        required=True, help="Tag to set, as load() names it (e.g. Artist, TPE1, title); repeatable")
+    parser.add_argument("-j", "--journal", help="Outcome journal; re-running with it resumes where the last run stopped")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Workers (default: CPU count; 1 runs in-process)")
+    parser.add_argument("--threads", action="store_true", help="Use threads instead of processes")
+    parser.add_argument("-c", "--chunksize", type=int, default=16, help="Files per task (default: 16)")
+    parser.add_argument("--hidden", action="store_true", help="Include dot-files and dot-directories")
+    parser.add_argument("--touch", action="store_true", help="Give written files a new modification time")
+    parser.add_argument("-q", "--quiet", action="store_true", help="No progress line on stderr")
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="Log to stderr: -v for warnings and info, -vv for per-tag debug output")
+    parser.add_argument("--stats", action="store_true", help="Print per-stage timings and byte counts to stderr")
+    args = parser.parse_args(argv)
+
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    edits = dict(args.edits)
+    log_level = None
+    if args.verbose:
+        log_level = logging.DEBUG if args.verbose > 1 else logging.INFO
+        configure_logging(log_level)
+    stats = instrument.Counters() if args.stats else None
+
+    counts = {WRITTEN: 0, UNCHANGED: 0, FAILED: 0}
+    meter = Progress(sys.stderr, not args.quiet and sys.stderr.isatty())
+    try:
+        journal = Journal(args.journal, edits) if args.journal else None
+    except (OSError, BatchError) as e:
+        parser.error(str(e))
+    try:
+        for outcome in iter_outcomes(args.paths, edits, workers=args.workers, chunksize=args.chunksize,
+                                     threads=args.threads, include_hidden=args.hidden,
+                                     preserve_times=not args.touch, journal=journal,
+                                     stats=stats, log_level=log_level):
+            counts[outcome.status] += 1
+            meter.update(outcome.ok)
+            if not outcome.ok:
+                sys.stderr.write(f"{outcome.path}: {outcome.reason}\n")
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        meter.finish()
+        if journal is not None:
+            journal.close()
+
+    sys.stderr.write(f"{counts[WRITTEN]} written, {counts[UNCHANGED]} unchanged, {counts[FAILED]} failed"
+                     + (f" (see {args.journal})" if args.journal and counts[FAILED] else "") + "\n")
+    if stats is not None:
+        sys.stderr.write(instrument.format_table(stats.snapshot()) + "\n")
+    return 1 if counts[FAILED] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
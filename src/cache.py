@@ -0,0 +1,154 @@
+"""Persistent cache of handler results, keyed by file identity.
+
+An entry is valid only while (path, st_dev, st_ino, st_size, st_mtime_ns) all match and it
+was written at the current VERSION, so a lookup costs one stat plus one indexed SELECT. The store is a WAL-mode SQLite file that
+several processes (e.g. the CLI workers) can share; it is capped at `max_entries` and
+evicts least-recently-used rows.
+"""
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+DEFAULT_MAX_ENTRIES = 200_000
+
+# Version of the cached handler output. Bump it whenever a handler's keys or value formats
+# change, so rows written by older code are treated as misses and replaced.
+VERSION = 2
+# Layout of the entries table (PRAGMA user_version); a mismatch drops the table.
+_SCHEMA_VERSION = 2
+
+# Hits only bump the LRU clock in memory; it is written back in batches of this size.
+_TOUCH_FLUSH = 256
+# Eviction trims down to this fraction of max_entries so it does not run on every insert.
+_EVICT_TO = 0.9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    path TEXT PRIMARY KEY,
+    dev INTEGER NOT NULL,
+    ino INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    used INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_used ON entries (used);
+"""
+
+
+def default_path() -> str:
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "MetaExifPro", "metadata-cache.sqlite3")
+
+
+def identity(st: os.stat_result):
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class MetadataCache:
+    def __init__(self, path: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path or default_path()
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+            self._db.executescript("DROP TABLE IF EXISTS entries;" + _SCHEMA +
+                                   f"PRAGMA user_version = {_SCHEMA_VERSION};")
+        self._db.executescript(_SCHEMA)
+        self._count = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        self._touched: Dict[str, int] = {}
+
+    def get(self, path: str, st: os.stat_result) -> Optional[Dict[str, str]]:
+        """Returns the cached handler result, or None if missing or the file has changed."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT dev, ino, size, mtime_ns, version, data FROM entries WHERE path = ?", (path,)).fetchone()
+            if row is None or tuple(row[:4]) != identity(st) or row[4] != VERSION:
+                return None
+            self._touched[path] = time.time_ns()
+            if len(self._touched) >= _TOUCH_FLUSH:
+                self._flush_touches()
+        return json.loads(row[5])
+
+    def put(self, path: str, st: os.stat_result, data: Dict[str, str]):
+        payload = json.dumps(data, ensure_ascii=False, default=str)
+        with self._lock:
+            self._touched.pop(path, None)
+            existed = self._db.execute("SELECT 1 FROM entries WHERE path = ?", (path,)).fetchone()
+            self._db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             (path, *identity(st), time.time_ns(), VERSION, payload))
+            self._count += existed is None
+            if self._count > self.max_entries:
+                self._evict()
+
+    def invalidate(self, path: str):
+        with self._lock:
+            self._touched.pop(path, None)
+            self._count -= self._db.execute("DELETE FROM entries WHERE path = ?", (path,)).rowcount
+
+    def clear(self):
+        with self._lock:
+            self._touched.clear()
+            self._db.execute("DELETE FROM entries")
+            self._count = 0
+
+    def close(self):
+        with self._lock:
+            self._flush_touches()
+            self._db.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _flush_touches(self):
+        if self._touched:
+            self._db.execute("BEGIN")
+            self._db.executemany("UPDATE entries SET used = ? WHERE path = ?",
+                                 [(used, path) for path, used in self._touched.items()])
+            self._db.execute("COMMIT")
+            self._touched.clear()
+
+    def _evict(self):
+        self._flush_touches()
+        keep = int(self.max_entries * _EVICT_TO)
+        self._db.execute(
+            "DELETE FROM entries WHERE path IN (SELECT path FROM entries ORDER BY used LIMIT "
+            "max(0, (SELECT COUNT(*) FROM entries) - ?))", (keep,))
+        self._count = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+_default: Optional[MetadataCache] = None
+_default_pid: Optional[int] = None
+_default_lock = threading.Lock()  # load() runs on the GUI's thread pool
+
+
+def _after_fork():
+    global _default_lock
+    _default_lock = threading.Lock()  # Another thread may have held it at the fork
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def get_default() -> Optional[MetadataCache]:
+    """Process-wide cache at default_path(), opened on first use (reopened after fork).
+    Returns None if the cache cannot be opened, in which case callers just parse."""
+    global _default, _default_pid
+    with _default_lock:
+        if _default_pid != os.getpid():
+            _default_pid = os.getpid()
+            try:
+                _default = MetadataCache()
+                atexit.register(_default.close)
+            except (OSError, sqlite3.Error):
+                _default = None
+        return _default
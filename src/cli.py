@@ -0,0 +1,242 @@
+"""Headless batch reader: python -m src.cli PATH [PATH ...]
+
+Walks the given files/directories and runs MetadataManager.load over a process pool.
+Emits one record per file in completion order, as JSON Lines (default) or CSV (see export):
+    {"path": ..., "ok": true, "metadata": {...}}
+    {"path": ..., "ok": false, "error": "OSError: ..."}
+Progress, log output (-v) and stage timings (--stats) go to stderr so stdout stays
+machine-readable.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from . import export, instrument
+from .core import MetadataManager
+
+PROGRESS_INTERVAL = 0.5  # Seconds between progress line refreshes
+LOG_FORMAT = "%(levelname)s %(name)s: %(message)s"
+
+
+def iter_files(paths: Iterable[str], include_hidden: bool = False) -> Iterator[str]:
+    """Yields files under paths lazily (scandir, no list of the whole tree is built).
+    Symlinked directories are not followed."""
+    for root in paths:
+        if not os.path.isdir(root):
+            yield root
+            continue
+        stack = [root]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError:
+                continue
+            subdirs = []
+            for entry in entries:
+                if not include_hidden and entry.name.startswith("."):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file():
+                        yield entry.path
+                except OSError:
+                    continue
+            stack.extend(reversed(subdirs))
+
+
+def chunks(items: Iterator[str], size: int) -> Iterator[List[str]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load_record(path: str, use_cache: bool = True) -> Dict:
+    try:
+        os.stat(path)  # load() tolerates missing files; surface them as errors here
+        return {"path": path, "ok": True, "metadata": MetadataManager.load(path, use_cache)}
+    except Exception as e:
+        return {"path": path, "ok": False, "error": f"{type(e).__name__}: {e}"}
+
+
+def _load_batch(paths: List[str], use_cache: bool = True, stats: bool = False):
+    """Records for paths, plus this worker's stage counters since its last batch when stats is set."""
+    records = [load_record(p, use_cache) for p in paths]
+    return records, instrument.drain() if stats else None
+
+
+def configure_logging(level: int):
+    """Sends this package's log records at `level` to stderr; other libraries stay at warnings."""
+    logging.basicConfig(stream=sys.stderr, level=logging.WARNING, format=LOG_FORMAT)
+    logging.getLogger(__package__).setLevel(level)
+
+
+def _init_worker(log_level: Optional[int] = None, stats: bool = False):
+    # Third-party code may still print; keep it off the parent's stdout.
+    sys.stdout = sys.stderr
+    if log_level is not None:
+        configure_logging(log_level)
+    if stats:
+        instrument.enable()
+
+
+class Progress:
+    def __init__(self, stream, enabled: bool):
+        self.stream = stream
+        self.enabled = enabled
+        self.done = 0
+        self.errors = 0
+        self.start = time.monotonic()
+        self._last = 0.0
+
+    def update(self, ok: bool):
+        self.done += 1
+        self.errors += not ok
+        now = time.monotonic()
+        if self.enabled and now - self._last >= PROGRESS_INTERVAL:
+            self._last = now
+            self._write(now)
+
+    def _write(self, now: float):
+        rate = self.done / max(now - self.start, 1e-9)
+        self.stream.write(f"\r{self.done} files, {self.errors} errors, {rate:.0f} files/s")
+        self.stream.flush()
+
+    def finish(self):
+        if self.enabled:
+            self._write(time.monotonic())
+            self.stream.write("\n")
+            self.stream.flush()
+
+
+def iter_records(paths: Iterable[str], workers: int = None, chunksize: int = 64,
+                 include_hidden: bool = False, use_cache: bool = True,
+                 stats: Optional[instrument.Counters] = None, log_level: Optional[int] = None) -> Iterator[Dict]:
+    """Yields a load record per file under paths, in completion order.
+
+    Work is submitted in chunks of `chunksize` paths with at most 2 * workers chunks in
+    flight, so memory stays flat no matter how large the tree is. With stats, every
+    worker's stage spans are merged into it as their batches come back. log_level
+    configures logging in the workers (the caller configures its own process)."""
+    workers = workers or os.cpu_count() or 1
+    batches = chunks(iter_files(paths, include_hidden), max(1, chunksize))
+
+    if workers == 1:
+        previous = instrument.active()
+        if stats is not None:
+            instrument.enable(stats)
+        try:
+            for batch in batches:
+                with contextlib.redirect_stdout(sys.stderr):
+                    records = [load_record(p, use_cache) for p in batch]
+                yield from records
+        finally:
+            if previous is not None:
+                instrument.enable(previous)
+            elif stats is not None:
+                instrument.disable()
+        return
+
+    def collect(future) -> List[Dict]:
+        records, counters = future.result()
+        if stats is not None:
+            stats.merge(counters)
+        return records
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(log_level, stats is not None)) as pool:
+        pending = set()
+        for batch in batches:
+            pending.add(pool.submit(_load_batch, batch, use_cache, stats is not None))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from collect(future)
+        for future in wait(pending).done:
+            yield from collect(future)
+
+
+def run(paths: Iterable[str], writer, progress: bool = True, **options) -> int:
+    """Streams records for paths into an export writer. Returns the error count."""
+    meter = Progress(sys.stderr, progress)
+
+    def metered(records: Iterator[Dict]) -> Iterator[Dict]:
+        for record in records:
+            meter.update(record["ok"])
+            yield record
+
+    export.export(metered(iter_records(paths, **options)), writer)
+    meter.finish()
+    return meter.errors
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.cli",
+                                     description="Read metadata from files and directory trees as JSON Lines or CSV.")
+    parser.add_argument("paths", nargs="+", help="Files or directories (walked recursively)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Worker processes (default: CPU count; 1 runs in-process)")
+    parser.add_argument("-c", "--chunksize", type=int, default=64, help="Files per task (default: 64)")
+    parser.add_argument("-o", "--output", help="Write records here instead of stdout ('.zst' compresses)")
+    parser.add_argument("-f", "--format", choices=export.FORMATS, default="jsonl", help="Output format (default: jsonl)")
+    parser.add_argument("--columns", help="CSV: comma-separated metadata columns (default: union of the first records)")
+    parser.add_argument("--sample", type=int, default=export.DEFAULT_SAMPLE,
+                        help="CSV: records used to pick the columns when --columns is not given")
+    parser.add_argument("--zstd", action="store_true", default=None, help="Compress the output with zstd")
+    parser.add_argument("--hidden", action="store_true", help="Include dot-files and dot-directories")
+    parser.add_argument("--no-cache", action="store_true", help="Parse every file, ignoring the metadata cache")
+    parser.add_argument("-q", "--quiet", action="store_true", help="No progress line on stderr")
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="Log to stderr: -v for warnings and info, -vv for per-tag debug output")
+    parser.add_argument("--stats", action="store_true", help="Print per-stage timings and byte counts to stderr")
+    parser.add_argument("--stats-json", metavar="PATH", help="Write per-stage counters to PATH as JSON")
+    args = parser.parse_args(argv)
+
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    columns = [c.strip() for c in args.columns.split(",") if c.strip()] if args.columns else None
+    log_level = None
+    if args.verbose:
+        log_level = logging.DEBUG if args.verbose > 1 else logging.INFO
+        configure_logging(log_level)
+    stats = instrument.Counters() if args.stats or args.stats_json else None
+
+    try:
+        with export.open_output(args.output, args.zstd) as out:
+            writer = export.make_writer(args.format, out, columns, args.sample)
+            errors = run(args.paths, writer, progress=not args.quiet and sys.stderr.isatty(),
+                         workers=args.workers, chunksize=args.chunksize,
+                         include_hidden=args.hidden, use_cache=not args.no_cache,
+                         stats=stats, log_level=log_level)
+    except export.ExportError as e:
+        parser.error(str(e))
+    except BrokenPipeError:
+        # Reader went away (e.g. piped into head); silence the flush at interpreter exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    if stats is not None:
+        snapshot = stats.snapshot()
+        if args.stats:
+            sys.stderr.write(instrument.format_table(snapshot) + "\n")
+        if args.stats_json:
+            with open(args.stats_json, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, indent=2)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
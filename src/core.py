@@ -1,409 +1,1148 @@
 from abc import ABC, abstractmethod
 import os
+import logging
+import inspect
+import copy
+import sqlite3
+import struct
+import threading
 import datetime
-from typing import Dict, Any, Optional
+from collections import OrderedDict
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
 
 import mutagen
+from mutagen import id3
+from mutagen.aac import AAC
+from mutagen.aiff import AIFF
+from mutagen.asf import ASF
+from mutagen.flac import FLAC
+from mutagen.mp3 import MP3
+from mutagen.mp4 import MP4
+from mutagen.oggflac import OggFLAC
+from mutagen.oggopus import OggOpus
+from mutagen.oggspeex import OggSpeex
+from mutagen.oggtheora import OggTheora
+from mutagen.oggvorbis import OggVorbis
+from mutagen.wave import WAVE
 from mutagen.easyid3 import EasyID3
+from mutagen.id3 import ID3, COMM, TXXX
 import piexif
 from PIL import Image, ExifTags
 import pypdf
-from docx import Document as DocxDocument
-from openpyxl import load_workbook
+
+from . import cache, exif, instrument, jpeg, mp4, ooxml, pdf, png, scan, sniff, tiff, webp, xmp
+
+log = logging.getLogger(__name__)
 
 # Helper to reverse ExifTags for saving (Name -> ID)
 TAG_NAME_TO_ID = {v: k for k, v in ExifTags.TAGS.items()}
 
+class WriteReport(NamedTuple):
+    """What a save cost: in_place means only the tag region was rewritten."""
+    in_place: bool
+    bytes_written: int
+    padding: int
+
+
+class SaveResult(NamedTuple):
+    """Outcome of FileHandler.save. written is False when the file already held the data.
+    metadata is the handler's writable keys as load() would now return them, or None if
+    that is unknown without re-reading the file."""
+    written: bool
+    metadata: Optional[Dict[str, str]] = None
+    report: Optional[WriteReport] = None
+
+
+class MetadataDiff(NamedTuple):
+    """Tag-level difference between a loaded snapshot and the data being saved."""
+    added: Dict[str, str]
+    changed: Dict[str, str]
+    removed: List[str]
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+def is_writable_key(key: str) -> bool:
+    """'@' keys are container properties and 'File:' keys are file system stats; neither is a tag."""
+    return not key.startswith("@") and not key.startswith("File:")
+
+
+def diff_metadata(old: Dict[str, str], new: Dict[str, str]) -> MetadataDiff:
+    old = {k: v for k, v in old.items() if is_writable_key(k)}
+    new = {k: v for k, v in new.items() if is_writable_key(k)}
+    return MetadataDiff(
+        added={k: v for k, v in new.items() if k not in old},
+        changed={k: v for k, v in new.items() if k in old and old[k] != v},
+        removed=[k for k in old if k not in new],
+    )
+
+
+def _xmp_keys(packet) -> Dict[str, str]:
+    """XMP: keys of a raw packet (bytes, str or PIL's tuple of ints); a malformed packet has none."""
+    if not packet:
+        return {}
+    try:
+        return xmp.parse(packet.encode("utf-8") if isinstance(packet, str) else bytes(packet))
+    except ValueError as e:
+        log.debug("Unreadable XMP packet: %s", e)
+        return {}
+
+
 class FileHandler(ABC):
+    """Base handler. `hint` is the dispatcher's sniff result (kind + header bytes), when known.
+
+    write() receives the full desired tag set (keys missing from it may be removed) unless
+    accepts_delta is set, in which case it only gets the added and changed keys. It raises
+    on failure; save() is the same call with the error logged and None returned instead."""
+    accepts_delta = False
+
     @abstractmethod
-    def load(self, path: str) -> Dict[str, str]:
+    def load(self, path: str, hint: Optional[sniff.Sniffed] = None) -> Dict[str, str]:
         pass
 
     @abstractmethod
-    def save(self, path: str, data: Dict[str, str]) -> None:
+    def write(self, path: str, data: Dict[str, str], hint: Optional[sniff.Sniffed] = None) -> SaveResult:
         pass
 
+    def write_to(self, path: str, dest: str, data: Dict[str, str],
+                 hint: Optional[sniff.Sniffed] = None) -> Optional[SaveResult]:
+        """write() with the result going to dest and path left untouched, for callers that
+        commit through their own temp file. Handlers whose writer builds a new file anyway
+        produce dest straight from path; dest is only written when the result says so.
+        None means the handler edits in place: the caller copies path to dest and calls write()."""
+        return None
+
+    def save(self, path: str, data: Dict[str, str], hint: Optional[sniff.Sniffed] = None) -> Optional[SaveResult]:
+        try:
+            return self.write(path, data, hint)
+        except Exception as e:
+            log.error("%s could not save %s: %s", type(self).__name__, path, e,
+                      exc_info=log.isEnabledFor(logging.DEBUG))
+            return None
+
+
+class _CountingFile:
+    """File wrapper that counts bytes read and written through it (mutagen only uses read/write/seek)."""
+    def __init__(self, f):
+        self._f = f
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def read(self, *args):
+        b = self._f.read(*args)
+        self.bytes_read += len(b)
+        return b
+
+    def write(self, b):
+        self.bytes_written += len(b)
+        return self._f.write(b)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+# Sniffed kind -> concrete mutagen class
+MUTAGEN_TYPES = {
+    "mp3": MP3, "aac": AAC, "flac": FLAC, "wav": WAVE, "aiff": AIFF, "mp4": MP4, "asf": ASF,
+    "ogg_vorbis": OggVorbis, "ogg_opus": OggOpus, "ogg_flac": OggFLAC,
+    "ogg_speex": OggSpeex, "ogg_theora": OggTheora,
+}
+
+
 class AudioHandler(FileHandler):
-    """Handles Audio/Video via Mutagen (MP3, MP4, FLAC, etc). Returns ALL raw tags."""
-    def load(self, path: str) -> Dict[str, str]:
+    """Handles Audio/Video via Mutagen (MP3, MP4, FLAC, etc). Returns ALL raw tags.
+
+    Saves reuse whatever padding the file already has, so edits that fit rewrite only the
+    tag region. When the tag outgrows it, at least `padding` bytes are reserved so that
+    following edits fit again.
+    """
+    def __init__(self, padding: int = 16 * 1024):
+        self.padding = padding
+
+    @staticmethod
+    def _supports_padding(audio) -> bool:
+        # FileType.save forwards **kwargs to the tag object, so check both levels
+        for fn in (audio.save, getattr(audio.tags, "save", None)):
+            if fn is not None and "padding" in inspect.signature(fn).parameters:
+                return True
+        return False
+
+    def _padding_policy(self, state: Dict[str, Any]):
+        def choose(info) -> int:
+            if info.padding >= 0:
+                chosen = info.padding  # Fits: keep the layout, no data after the tag moves
+            else:
+                chosen = max(self.padding, info.get_default_padding())
+            state["in_place"] = chosen == info.padding
+            state["padding"] = chosen
+            return chosen
+        return choose
+
+    @staticmethod
+    def _open(f, hint: Optional[sniff.Sniffed]):
+        """Parses an open file with the mutagen class the sniffer picked; only unknown files
+        pay for mutagen.File probing and scoring every format."""
+        cls = MUTAGEN_TYPES.get(hint.kind) if hint else None
+        if cls is not None:
+            try:
+                return cls(f)
+            except mutagen.MutagenError:
+                f.seek(0)
+        return mutagen.File(f)
+
+    def _parse(self, path: str, hint: Optional[sniff.Sniffed], prefix: bytes = b""):
+        """(mutagen file or None, editor view), timed as one parse span. Reads inside the
+        sniffed prefix (load only) are answered from memory and not counted."""
+        with instrument.span("parse") as s, open(path, "rb") as raw:
+            f = _CountingFile(raw)
+            audio = self._open(sniff.PrefixedFile(f, prefix) if prefix else f, hint)
+            data = self._read(audio) if audio is not None else {}
+            s.bytes_read = f.bytes_read
+        return audio, data
+
+    @staticmethod
+    def _set_id3(tags, key: str, value: str):
+        """ID3 keys are frame hash keys (TIT2, TXXX:desc, COMM:desc:lang); values need real frames.
+        Binary frames (APIC, GEOB, ...) are left alone since the editor only shows their repr."""
+        frame_id = key.split(":", 1)[0]
+        if key in tags and str(tags[key]) == value:
+            return
+        if frame_id == "TXXX":
+            tags[key] = TXXX(encoding=3, desc=key.split(":", 1)[1] if ":" in key else "", text=[value])
+        elif frame_id == "COMM":
+            parts = key.split(":")
+            desc = parts[1] if len(parts) > 1 else ""
+            lang = parts[2] if len(parts) > 2 else "eng"
+            tags[key] = COMM(encoding=3, lang=lang, desc=desc, text=[value])
+        elif frame_id.startswith("T") and frame_id in id3.Frames:
+            tags[key] = id3.Frames[frame_id](encoding=3, text=[value])
+
+    # Helper to stringify values (Mutagen values can be lists, bytes, or objects)
+    @staticmethod
+    def _fmt(v) -> str:
+        if isinstance(v, list) or isinstance(v, tuple):
+            return "; ".join([str(x) for x in v])
+        return str(v)
+
+    @staticmethod
+    def _info_keys(info) -> Dict[str, str]:
+        """Read-only @ keys for a stream info object (mutagen's, or mp4.Audio)."""
+        data = {}
+        if hasattr(info, 'length'):
+            m, s = divmod(info.length, 60)
+            data['@Duration'] = f"{int(m):02d}:{int(s):02d} ({info.length:.2f}s)"
+        if hasattr(info, 'bitrate'):
+            data['@Bitrate'] = f"{int(info.bitrate / 1000)} kbps"
+        if hasattr(info, 'sample_rate'):
+            data['@SampleRate'] = f"{info.sample_rate} Hz"
+        if hasattr(info, 'channels'):
+            data['@Channels'] = str(info.channels)
+        if hasattr(info, 'encoder_info'):
+            data['@Encoder'] = str(info.encoder_info)
+        return data
+
+    @classmethod
+    def _read(cls, audio) -> Dict[str, str]:
+        """Editor view of an opened mutagen file: stringified tags plus stream info."""
         data = {}
+        if hasattr(audio, "tags") and audio.tags:
+            for k, v in audio.tags.items():
+                data[str(k)] = cls._fmt(v)
+        else:
+            # Some formats act as dictionary directly
+            for k, v in audio.items():
+                 data[str(k)] = cls._fmt(v)
+
+        # Add stream info (Read-only usually)
+        if audio.info:
+            data.update(cls._info_keys(audio.info))
+        return data
+
+    @classmethod
+    def _movie_view(cls, movie: mp4.Movie) -> Dict[str, str]:
+        """Editor view of an MP4/MOV read by the box walker. Tags and stream info match what
+        mutagen reports; the movie header times, track list and QuickTime udta text come on top."""
+        data = {k: cls._fmt(v) for k, v in movie.tags.items()}
+        # Like mutagen: stream info of the first sound track, else just the movie duration
+        data.update(cls._info_keys(movie.audio or mp4.Audio(movie.duration, 0, 0, 0, 0)))
+        for key, when in (("@Created", movie.created), ("@Modified", movie.modified)):
+            if when is not None:
+                data[key] = when.strftime("%Y-%m-%d %H:%M:%S")
+        if movie.tracks:
+            data["@Tracks"] = "; ".join(
+                f"{t.kind} {t.codec} {t.width}x{t.height}" if t.width else f"{t.kind} {t.codec}"
+                for t in movie.tracks)
+        for k, v in movie.udta.items():
+            data[f"@udta:{k}"] = v
+        return data
+
+    @staticmethod
+    def _read_movie(path: str, prefix: bytes = b"") -> Optional[mp4.Movie]:
+        """Reads just the moov box, or None when the file needs mutagen's parser."""
         try:
-            # mutagen.File covers MP3, MP4, FLAC, OGG, etc.
-            # We do NOT use easy=True to get raw tags.
-            audio = mutagen.File(path)
-            if audio is None: return {}
-            
-            # Helper to stringify values (Mutagen values can be lists, bytes, or objects)
-            def fmt(v):
-                if isinstance(v, list) or isinstance(v, tuple):
-                    return "; ".join([str(x) for x in v])
-                return str(v)
-
-            if hasattr(audio, "tags") and audio.tags:
-                for k, v in audio.tags.items():
-                    data[str(k)] = fmt(v)
+            with instrument.span("parse") as s:
+                movie = mp4.read_movie(path, prefix)
+                s.bytes_read = movie.moov.size
+        except (ValueError, IndexError, struct.error) as e:
+            log.debug("MP4 box walk failed for %s (%s), using mutagen", path, e)
+            return None
+        if movie.duration is None and movie.audio is None:
+            return None  # No mvhd: leave the error reporting to mutagen
+        return movie
+
+    @staticmethod
+    def _is_mp4(path: str, hint: Optional[sniff.Sniffed]) -> bool:
+        kind = hint.kind if hint is not None and hint.kind is not None else xmp.kind_of(path)
+        return kind == "mp4"
+
+    def load(self, path: str, hint: Optional[sniff.Sniffed] = None) -> Dict[str, str]:
+        is_mp4 = self._is_mp4(path, hint)
+        prefix = hint.prefix if hint is not None else b""
+        movie = self._read_movie(path, prefix) if is_mp4 else None
+        if movie is not None:
+            data = self._movie_view(movie)
+        else:
+            try:
+                # We do NOT use easy=True to get raw tags.
+                data = self._parse(path, hint, prefix)[1]
+            except Exception as e:
+                log.warning("Audio load error for %s: %s", path, e)
+                return {}
+        if is_mp4:
+            # XMP lives in its own box, outside what mutagen reads
+            with instrument.span("parse"):
+                data.update(xmp.read(path, "mp4"))
+        return data
+
+    def write(self, path: str, data: Dict[str, str], hint: Optional[sniff.Sniffed] = None) -> SaveResult:
+        data, xmp_edits = xmp.split(data)
+        is_mp4 = self._is_mp4(path, hint)
+        if xmp_edits and not is_mp4:
+            log.debug("  [SKIP] %d XMP keys -> only MP4/MOV carry XMP", len(xmp_edits))
+            xmp_edits = {}
+        result = self._save_movie(path, data) if is_mp4 else None
+        if result is not None:
+            return self._save_xmp(path, xmp_edits, result)
+        audio, before = self._parse(path, hint)
+        if audio is None:
+            raise ValueError("Not a recognized audio file")
+        if audio.tags is None:
+            audio.add_tags()
+            before = self._read(audio)
+
+        for k, v in data.items():
+            if k.startswith("@"): continue # Skip read-only props
+            if isinstance(audio.tags, ID3):
+                self._set_id3(audio.tags, k, v)
+                continue
+            try:
+                audio.tags[k] = [v]
+            except:
+                try: audio.tags[k] = v
+                except: pass
+
+        current_keys = list(audio.tags.keys())
+        for k in current_keys:
+            if k not in data and not k.startswith("@"):
+                 diff_k = str(k)
+                 if diff_k not in data:
+                    del audio.tags[k]
+
+        # The edited tags are still in memory, so the post-save view needs no re-read
+        after = self._read(audio)
+        if after == before:
+            return self._save_xmp(path, xmp_edits, SaveResult(False, after))
+
+        state = {"in_place": False, "padding": 0}
+        # mutagen renders and writes in one call, so both count as the write stage
+        with instrument.span("write") as s, open(path, "r+b") as raw:
+            f = _CountingFile(raw)
+            if self._supports_padding(audio):
+                audio.save(f, padding=self._padding_policy(state))
             else:
-                # Some formats act as dictionary directly
-                for k, v in audio.items():
-                     data[str(k)] = fmt(v)
-
-            # Add stream info (Read-only usually)
-            if audio.info:
-                if hasattr(audio.info, 'length'): 
-                    m, s = divmod(audio.info.length, 60)
-                    data['@Duration'] = f"{int(m):02d}:{int(s):02d} ({audio.info.length:.2f}s)"
-                if hasattr(audio.info, 'bitrate'): 
-                    data['@Bitrate'] = f"{int(audio.info.bitrate / 1000)} kbps"
-                if hasattr(audio.info, 'sample_rate'):
-                    data['@SampleRate'] = f"{audio.info.sample_rate} Hz"
-                if hasattr(audio.info, 'channels'):
-                    data['@Channels'] = str(audio.info.channels)
-                if hasattr(audio.info, 'encoder_info'):
-                    data['@Encoder'] = str(audio.info.encoder_info)
+                audio.save(f)  # Format without padding support: always a rewrite
+            s.bytes_read, s.bytes_written = f.bytes_read, f.bytes_written
 
-            return data
-        except Exception as e:
-            print(f"Audio load error: {e}")
-            return {}
+        report = WriteReport(state["in_place"], f.bytes_written, state["padding"])
+        log.debug("Audio save %s: %s, %d bytes written, %d bytes padding", path,
+                  "in-place" if report.in_place else "rewrite", report.bytes_written, report.padding)
+        return self._save_xmp(path, xmp_edits, SaveResult(True, after, report))
 
-    def save(self, path: str, data: Dict[str, str]) -> None:
-        try:
-            audio = mutagen.File(path)
-            if audio is None: return 
-            if audio.tags is None: audio.add_tags()
-            
-            for k, v in data.items():
-                if k.startswith("@"): continue # Skip read-only props
+    def _save_movie(self, path: str, data: Dict[str, str]) -> Optional[SaveResult]:
+        """Saves ilst items through the box walker: unchanged items are written back byte for
+        byte and only the moov region is touched unless it has to grow. None when the file
+        needs mutagen's writer (no mvhd, fragmented, stco overflow)."""
+        movie = self._read_movie(path)
+        if movie is None:
+            return None
+        before = self._movie_view(movie)
+        current = {k: self._fmt(v) for k, v in movie.tags.items()}
+
+        items, replaced = [], set()
+        for item in movie.items:
+            key = item.key
+            if key is None or (key in data and data[key] == current[key]):
+                items.append(item.raw)  # Unmodeled or unchanged: keep every atom as is
+            elif key in data and key not in replaced:
+                replaced.add(key)  # Repeated atoms of an edited key merge into the first
                 try:
-                    audio.tags[k] = [v]
-                except:
-                    try: audio.tags[k] = v
-                    except: pass
-            
-            current_keys = list(audio.tags.keys())
-            for k in current_keys:
-                if k not in data and not k.startswith("@"):
-                     diff_k = str(k)
-                     if diff_k not in data:
-                        del audio.tags[k]
-            audio.save()
-        except Exception as e:
-            print(f"Audio save error: {e}")
+                    items.append(mp4.render_item(key, data[key]))
+                except ValueError as e:
+                    log.debug("  [SKIP] %s: %s", key, e)
+                    items.append(item.raw)
+        for key, value in data.items():
+            if key.startswith("@") or key in current:
+                continue
+            try:
+                items.append(mp4.render_item(key, value))
+            except ValueError as e:
+                log.debug("  [SKIP] %s: %s", key, e)
+
+        if items == [item.raw for item in movie.items]:
+            return SaveResult(False, before)
+        try:
+            with instrument.span("write") as s:
+                stats = mp4.write_items(path, items, self.padding)
+                s.bytes_written = stats.bytes_written
+        except ValueError as e:
+            log.debug("MP4 box write not possible for %s (%s), using mutagen", path, e)
+            return None
+
+        ilst = b"".join(items)
+        after = self._movie_view(movie._replace(items=mp4.parse_items(ilst, 0, len(ilst))))
+        report = WriteReport(stats.in_place, stats.bytes_written, stats.padding)
+        log.debug("MP4 save %s: %s, %d bytes written, %d bytes padding", path,
+                  "in-place" if report.in_place else "rewrite", report.bytes_written, report.padding)
+        return SaveResult(True, after, report)
+
+    @staticmethod
+    def _save_xmp(path: str, xmp_edits: Dict[str, str], result: SaveResult) -> SaveResult:
+        """Writes XMP keys into the MP4 packet after the mutagen save (which may move boxes)."""
+        if not xmp_edits:
+            return result
+        stats = xmp.write(path, xmp_edits, "mp4")
+        if stats is not None:
+            log.debug("XMP save %s: %d bytes written in place", path, stats.bytes_written)
+        # The XMP keys of the packet are not in mutagen's view: read back
+        return SaveResult(result.written or stats is not None, None, result.report)
+
+# SOF component count -> PIL mode, as JpegImagePlugin maps it
+_JPEG_MODES = {1: "L", 3: "RGB", 4: "CMYK"}
+
 
 class ImageHandler(FileHandler):
-    """Handles Images. aggressively reads Exif and generic Info."""
-    def load(self, path: str) -> Dict[str, str]:
+    """Handles Images. aggressively reads Exif and generic Info.
+
+    With header_only (the default) pixels are never decoded: only container headers
+    and metadata segments are read. header_only=False restores the full img.load().
+    """
+    accepts_delta = True  # Tags are applied one by one onto the file's current Exif
+
+    def __init__(self, header_only: bool = True):
+        self.header_only = header_only
+
+    def load(self, path: str, hint: Optional[sniff.Sniffed] = None) -> Dict[str, str]:
+        if self.header_only and self._is_jpeg(path, hint):
+            data = self._load_jpeg(path)
+            if data is not None:
+                return data
         data = {}
         try:
-            with Image.open(path) as img:
-                # Basic Image Properties
-                data["@Resolution"] = f"{img.width}x{img.height}"
-                data["@Format"] = str(img.format)
-                data["@Mode"] = str(img.mode)
-                if hasattr(img, "n_frames") and img.n_frames > 1:
-                    data["@Frames"] = str(img.n_frames)
-
-                img.load()
+            with open(path, "rb") as raw:
+                with instrument.span("open"):
+                    # Header reads come from the sniffed prefix; decoding (header_only=False) reads the file
+                    img = Image.open(sniff.PrefixedFile(raw, hint.prefix) if self.header_only and hint and hint.prefix else raw)
+                with img, instrument.span("parse") as s:
+                    # Basic Image Properties
+                    data["@Resolution"] = f"{img.width}x{img.height}"
+                    data["@Format"] = str(img.format)
+                    data["@Mode"] = str(img.mode)
+                    frames = self._frame_count(img)
+                    if frames:
+                        data["@Frames"] = frames
+
+                    if not self.header_only:
+                        img.load()
+                    elif img.format == "PNG":
+                        # Text chunks after IDAT only reach img.info on decode; walk the chunk list instead
+                        for k, v in png.read_text(path).items():
+                            img.info.setdefault(k, v)
                 
-                # 1. Standard Exif
-                exif = img.getexif()
-                if exif:
-                    for k, v in exif.items():
-                         key_name = ExifTags.TAGS.get(k, f"Exif:{k}")
-                         if isinstance(v, bytes):
-                             try: v = v.decode().strip('\x00')
-                             except: v = str(v)
-                         data[key_name] = str(v)
-
-                # 2. Deep Dive (GPS, Interop)
-                if "exif" in img.info:
-                    try:
-                        exif_dict = piexif.load(img.info["exif"])
-                        for ifd in ["0th", "Exif", "GPS", "1st", "Interop"]:
-                            if ifd in exif_dict:
-                                for tag_id, val in exif_dict[ifd].items():
-                                    tag_name = ExifTags.TAGS.get(tag_id, f"Unknown_{tag_id}")
-                                    key = f"{ifd}:{tag_name}"
-                                    if tag_name in data: continue 
-                                    if isinstance(val, bytes):
-                                        try: val = val.decode().strip('\x00')
-                                        except: val = f"<Binary {len(val)}>"
-                                    data[key] = str(val)
-                    except: pass
-
-                # 3. Info Dict
-                for k, v in img.info.items():
-                    if k in ['exif']: continue
-                    if isinstance(v, (str, int, float)):
-                        data[f"Info:{k}"] = str(v)
-                    elif isinstance(v, bytes):
-                        try: data[f"Info:{k}"] = v.decode()
-                        except: data[f"Info:{k}"] = f"<Binary {len(v)} bytes>"
+                    # 1. Exif (all IFDs in one pass)
+                    parsed = self._read_exif(img, path)
+                    if parsed:
+                        data.update(parsed.display)
+                    if s and isinstance(img.info.get("exif"), bytes):
+                        s.bytes_read = len(img.info["exif"])
+
+                    # 2. XMP packet (PIL surfaces it for JPEG, PNG, WebP and TIFF)
+                    data.update(_xmp_keys(img.info.get("xmp") or img.info.get(png.XMP_KEYWORD)))
+
+                    # 3. Info Dict
+                    data.update(self._info_keys(img.info))
                             
-            return data
+                return data
         except Exception as e:
-            print(f"Image load error: {e}")
+            log.warning("Image load error for %s: %s", path, e)
             return {}
 
-    def save(self, path: str, data: Dict[str, str]) -> None:
+    @staticmethod
+    def _info_keys(info: Dict[str, Any]) -> Dict[str, str]:
+        data = {}
+        for k, v in info.items():
+            if k in ['exif']: continue
+            if isinstance(v, (str, int, float)):
+                data[f"Info:{k}"] = str(v)
+            elif isinstance(v, bytes):
+                try: data[f"Info:{k}"] = v.decode()
+                except: data[f"Info:{k}"] = f"<Binary {len(v)} bytes>"
+        return data
+
+    def _load_jpeg(self, path: str) -> Optional[Dict[str, str]]:
+        """PIL-free JPEG load: walks the mapped markers up to SOS and rebuilds what
+        Image.open would put in img.info, so only the header pages are ever read.
+        Returns None for what the walk doesn't model (MPO, non-8-bit frames, odd layer
+        counts, malformed markers); the caller then goes through PIL."""
         try:
-            print(f"\n{'='*50}")
-            print(f"[ImageHandler] SAVING TO: {path}")
-            print(f"[ImageHandler] Total keys to process: {len(data)}")
-            
-            # Step 1: Load current exif (if exists)
+            with scan.mapped(path) as buf:
+                with instrument.span("open") as s:
+                    layout = scan.scan_jpeg(buf)
+                    s.bytes_read = layout.sos
+                with instrument.span("parse"):
+                    return self._jpeg_keys(buf, layout)
+        except (ValueError, IndexError, struct.error, OSError):
+            return None
+
+    @classmethod
+    def _jpeg_keys(cls, buf, layout: scan.JpegLayout) -> Optional[Dict[str, str]]:
+        frame = scan.frame(buf, layout)
+        mode = _JPEG_MODES.get(frame.components) if frame else None
+        if mode is None or frame.bits != 8:
+            return None
+
+        # Same keys, values and insertion order as JpegImagePlugin's marker handlers
+        info = {}
+        icc = []
+        blob = None
+        for segment in layout.segments:
+            marker = segment.marker
+            s = scan.payload(buf, segment)
+            head = bytes(s[:len(scan.XMP_HEADER)])
+            if marker == scan.APP0 and head.startswith(b"JFIF"):
+                info["jfif"] = struct.unpack_from(">H", s, 5)[0]
+                if len(s) >= 12:
+                    info["jfif_unit"] = s[7]
+            elif marker == scan.APP1 and head.startswith(scan.EXIF_HEADER):
+                if blob is not None:
+                    return None  # PIL concatenates multi-segment Exif
+                blob = s
+            elif marker == scan.APP1 and head == scan.XMP_HEADER:
+                info["xmp"] = bytes(s[len(scan.XMP_HEADER):])
+            elif marker == scan.APP2 and head.startswith(b"FPXR\0"):
+                info["flashpix"] = bytes(s)
+            elif marker == scan.APP2 and head.startswith(b"ICC_PROFILE\0"):
+                icc.append(bytes(s))
+            elif marker == scan.APP2 and head.startswith(b"MPF\0"):
+                return None  # May be an MPO; let PIL decide
+            elif marker == scan.APP14 and head.startswith(b"Adobe"):
+                info["adobe"] = struct.unpack_from(">H", s, 5)[0]
+                if len(s) > 11:
+                    info["adobe_transform"] = s[11]
+            elif marker == scan.COM:
+                info["comment"] = bytes(s)
+            elif marker in scan.SOF_MARKERS:
+                if segment != layout.sof:
+                    return None
+                if frame.progressive:
+                    info["progressive"] = info["progression"] = 1
+                if icc:
+                    icc.sort()
+                    if icc[0][13] == len(icc):
+                        info["icc_profile"] = b"".join(p[14:] for p in icc)
+                    icc = []
+
+        data = {
+            "@Resolution": f"{frame.width}x{frame.height}",
+            "@Format": "JPEG",
+            "@Mode": mode,
+        }
+        if blob is not None:
+            try:
+                data.update(exif.read(blob).display)
+            except (ValueError, struct.error):
+                pass
+        data.update(_xmp_keys(info.get("xmp")))
+        data.update(cls._info_keys(info))
+        return data
+
+    @staticmethod
+    def _read_exif(img, path: str) -> Optional[exif.ExifResult]:
+        """TIFF files are their own IFD structure (mapped, not read); other formats carry an Exif blob."""
+        try:
+            if img.format == "TIFF":
+                with scan.mapped(path) as buf:
+                    return exif.read(buf)
+            if "exif" in img.info:
+                return exif.read(img.info["exif"])
+        except (ValueError, struct.error):
+            pass
+        return None
+
+    def _frame_count(self, img) -> Optional[str]:
+        """Frame count for animated files, or None for stills."""
+        if not self.header_only:
+            if hasattr(img, "n_frames") and img.n_frames > 1:
+                return str(img.n_frames)
+            return None
+        # is_animated only probes for a second frame; GIF has no frame count in its header,
+        # so counting would mean walking every frame's data blocks
+        if not getattr(img, "is_animated", False):
+            return None
+        if img.format == "GIF":
+            return "animated"
+        return str(img.n_frames)
+
+    @staticmethod
+    def _empty_exif() -> Dict[str, Any]:
+        return {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
+
+    @staticmethod
+    def _is_jpeg(path: str, hint: Optional[sniff.Sniffed] = None) -> bool:
+        if hint is not None and hint.kind is not None:
+            return hint.kind == "jpeg"
+        return os.path.splitext(path)[1].lower() in (".jpg", ".jpeg") and jpeg.is_jpeg(path)
+
+    @staticmethod
+    def _is_tiff(path: str, hint: Optional[sniff.Sniffed] = None) -> bool:
+        if hint is not None and hint.kind is not None:
+            return hint.kind == "tiff"
+        return os.path.splitext(path)[1].lower() in (".tif", ".tiff") and tiff.is_tiff(path)
+
+    @staticmethod
+    def _is_png(path: str, hint: Optional[sniff.Sniffed] = None) -> bool:
+        if hint is not None and hint.kind is not None:
+            return hint.kind == "png"
+        return os.path.splitext(path)[1].lower() == ".png" and sniff.read_prefix(path, 8) == png.PNG_SIGNATURE
+
+    @staticmethod
+    def _is_webp(path: str, hint: Optional[sniff.Sniffed] = None) -> bool:
+        if hint is not None and hint.kind is not None:
+            return hint.kind == "webp"
+        return os.path.splitext(path)[1].lower() == ".webp" and webp.is_webp(path)
+
+    def write(self, path: str, data: Dict[str, str], hint: Optional[sniff.Sniffed] = None) -> SaveResult:
+        log.debug("Saving %s (%d keys)", path, len(data))
+        data, xmp_edits = xmp.split(data)
+
+        if not data:
+            result = SaveResult(False)
+        elif self._is_jpeg(path, hint):
+            result = self._save_jpeg(path, data)
+        elif self._is_tiff(path, hint):
+            result = self._save_tiff(path, data)
+        elif self._is_png(path, hint):
+            result = self._save_png(path, data)
+        elif self._is_webp(path, hint):
+            result = self._save_webp(path, data)
+        else:
+            result = self._save_reencode(path, data)
+
+        if xmp_edits:
+            # After the Exif save, which may have replaced the file
+            stats = xmp.write(path, xmp_edits, hint.kind if hint is not None else None)
+            if stats is not None:
+                log.debug("XMP save %s: %s, %d bytes written", path,
+                          "in-place" if stats.in_place else "rewrite", stats.bytes_written)
+                # Info:xmp mirrors the packet, so the new view is only known by reading back
+                result = SaveResult(True)
+
+        log.debug("%s: %s", path, "saved" if result.written else "no changes, file left untouched")
+        return result
+
+    def write_to(self, path: str, dest: str, data: Dict[str, str],
+                 hint: Optional[sniff.Sniffed] = None) -> Optional[SaveResult]:
+        # Only the JPEG/PNG/WebP splices build a new file; TIFF patches in place, XMP may too
+        if not data or any(k.startswith(xmp.PREFIX) for k in data):
+            return None
+        if self._is_jpeg(path, hint):
+            return self._save_jpeg(path, data, dest)
+        if self._is_png(path, hint):
+            return self._save_png(path, data, dest)
+        if self._is_webp(path, hint):
+            return self._save_webp(path, data, dest)
+        return None
+
+    def _save_jpeg(self, path: str, data: Dict[str, str], dest: Optional[str] = None) -> SaveResult:
+        """Lossless path: swaps the Exif APP1 segment and copies the scan data verbatim.
+        With dest set the new file goes there and path is left alone."""
+        log.debug("Format: JPEG (segment splice)")
+
+        # Step 1: Load current exif straight from the APP1 segment
+        with instrument.span("parse") as s:
+            try:
+                blob = jpeg.read_exif(path) or b""
+                s.bytes_read = len(blob)
+                exif_dict = exif.to_piexif(exif.parse(blob))
+            except:
+                exif_dict = self._empty_exif()
+
+        # Step 2: Modify exif_dict
+        before = copy.deepcopy(exif_dict)
+        self._apply_tags(exif_dict, data)
+        if exif_dict == before:
+            return SaveResult(False)
+
+        # Step 3: Dump new exif and splice it in
+        with instrument.span("encode") as s:
+            exif_bytes = piexif.dump(exif_dict)
+            s.bytes_written = len(exif_bytes)
+        log.debug("Exif bytes size: %d", len(exif_bytes))
+
+        temp_path = dest or path + ".tmp"
+        try:
+            with instrument.span("write") as s:
+                s.bytes_written = jpeg.write_exif(path, temp_path, exif_bytes)
+        except:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        if dest is None:
+            with instrument.span("rename"):
+                os.replace(temp_path, path)
+        # Only the APP1 segment changed: its display keys are the new Exif block, parsed in memory
+        return SaveResult(True, exif.read(exif_bytes).display)
+
+    def _save_tiff(self, path: str, data: Dict[str, str]) -> SaveResult:
+        """In-place path: patches IFD entries, appending values and relinked IFDs that no
+        longer fit. Strips and tiles are never read, so memory use doesn't grow with the image."""
+        log.debug("Format: TIFF (IFD patch)")
+
+        # Step 1: The file is its own IFD structure; read the tag tables straight from it
+        with instrument.span("parse"):
+            try:
+                with scan.mapped(path) as buf:
+                    current = exif.parse(buf)
+            except (ValueError, struct.error) as e:
+                log.debug("IFD walk failed (%s), re-encoding instead", e)  # e.g. BigTIFF
+                return self._save_reencode(path, data)
+
+        # Step 2: Apply the edits to a copy and keep only the tags that changed
+        tags = {ifd: dict(current[ifd]) for ifd in exif.IFD_ORDER}
+        self._apply_tags(tags, data)
+        edits = {ifd: {t: v for t, v in tags[ifd].items() if t not in current[ifd] or current[ifd][t] != v}
+                 for ifd in exif.IFD_ORDER}
+        edits = {ifd: changed for ifd, changed in edits.items() if changed}
+        if not edits:
+            return SaveResult(False)
+
+        # Step 3: Patch the file (encode and write spans are recorded inside)
+        stats = tiff.write_tags(path, edits)
+        log.debug("IFD patch: %d bytes patched, %d bytes appended", stats.patched, stats.appended)
+        with scan.mapped(path) as buf:
+            display = exif.read(buf).display
+        report = WriteReport(not stats.appended, stats.patched + stats.appended, 0)
+        return SaveResult(True, display, report)
+
+    def _save_png(self, path: str, data: Dict[str, str], dest: Optional[str] = None) -> SaveResult:
+        """Chunk path: replaces eXIf and text chunks, copying IDAT verbatim (no recompression).
+        Info: keys go back as tEXt/iTXt chunks. dest works as in _save_jpeg."""
+        log.debug("Format: PNG (chunk splice)")
+
+        # Step 1: Load current exif and text chunks
+        with instrument.span("parse") as s:
+            try:
+                blob = png.read_exif(path) or b""
+                s.bytes_read = len(blob)
+                exif_dict = exif.to_piexif(exif.parse(blob))
+            except:
+                exif_dict = self._empty_exif()
+            current_text = png.read_text(path)
+
+        # Step 2: Modify exif_dict and collect the text chunks that change
+        before = copy.deepcopy(exif_dict)
+        self._apply_tags(exif_dict, data)
+        texts = {}
+        for key, val in data.items():
+            if not key.startswith("Info:"):
+                continue
+            keyword = key[len("Info:"):]
+            if keyword not in current_text and (keyword in png.RESERVED_INFO or val.startswith("<Binary ")):
+                continue  # Shown from other chunks, not text
+            if not png.is_valid_keyword(keyword):
+                log.debug("  [SKIP] '%s' -> not a valid PNG keyword", key)
+                continue
+            if current_text.get(keyword) != val:
+                texts[keyword] = val
+        if exif_dict == before and not texts:
+            return SaveResult(False)
+
+        # Step 3: Dump new exif (if it changed) and splice the chunks in
+        exif_bytes = None
+        if exif_dict != before:
+            with instrument.span("encode") as s:
+                exif_bytes = piexif.dump(exif_dict)
+                s.bytes_written = len(exif_bytes)
+            log.debug("Exif bytes size: %d", len(exif_bytes))
+
+        temp_path = dest or path + ".tmp"
+        try:
+            with instrument.span("write") as s:
+                s.bytes_written = png.write_chunks(path, temp_path, exif_bytes, texts)
+        except:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        if dest is None:
+            with instrument.span("rename"):
+                os.replace(temp_path, path)
+        # Info: keys also come from non-text chunks, so the result is only known by reading back
+        return SaveResult(True)
+
+    def _save_webp(self, path: str, data: Dict[str, str], dest: Optional[str] = None) -> SaveResult:
+        """Chunk path: swaps the RIFF EXIF chunk and copies the bitstream chunks verbatim
+        (no lossy re-encode). dest works as in _save_jpeg."""
+        log.debug("Format: WebP (chunk splice)")
+
+        # Step 1: Load current exif from the EXIF chunk
+        with instrument.span("parse") as s:
+            try:
+                blob = webp.read_chunk(path, webp.EXIF) or b""
+                s.bytes_read = len(blob)
+                exif_dict = exif.to_piexif(exif.parse(blob))
+            except:
+                exif_dict = self._empty_exif()
+
+        # Step 2: Modify exif_dict
+        before = copy.deepcopy(exif_dict)
+        self._apply_tags(exif_dict, data)
+        if exif_dict == before:
+            return SaveResult(False)
+
+        # Step 3: Dump new exif and splice it in
+        with instrument.span("encode") as s:
+            exif_bytes = piexif.dump(exif_dict)
+            s.bytes_written = len(exif_bytes)
+        log.debug("Exif bytes size: %d", len(exif_bytes))
+
+        temp_path = dest or path + ".tmp"
+        try:
+            with instrument.span("write") as s:
+                s.bytes_written = webp.write_chunks(path, temp_path, exif_bytes)
+        except:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        if dest is None:
+            with instrument.span("rename"):
+                os.replace(temp_path, path)
+        return SaveResult(True, exif.read(exif_bytes).display)
+
+    def _save_reencode(self, path: str, data: Dict[str, str]) -> SaveResult:
+        """Fallback path for formats without a container-level writer (goes through PIL)."""
+        # Step 1: Load current exif (if exists)
+        with instrument.span("open"):
             img = Image.open(path)
-            img_format = img.format or "JPEG"
-            print(f"[ImageHandler] Format: {img_format}")
-            
-            try: 
-                exif_dict = piexif.load(img.info.get("exif", b""))
-            except: 
-                exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
-            
-            # Save image to memory buffer and CLOSE file handle
-            from io import BytesIO
-            img_bytes = BytesIO()
+        img_format = img.format or "JPEG"
+        log.debug("Format: %s", img_format)
+
+        with instrument.span("parse") as s:
+            try:
+                blob = img.info.get("exif", b"")
+                s.bytes_read = len(blob)
+                exif_dict = exif.to_piexif(exif.parse(blob))
+            except:
+                exif_dict = self._empty_exif()
+
+        # Nothing to change: skip the decode/re-encode round trip entirely
+        probe = copy.deepcopy(exif_dict)
+        self._apply_tags(probe, data)
+        if probe == exif_dict:
+            img.close()
+            return SaveResult(False)
+
+        # Save image to memory buffer and CLOSE file handle
+        from io import BytesIO
+        img_bytes = BytesIO()
+        with instrument.span("encode") as s:
             if img_format.upper() in ["JPEG", "JPG"]:
                 img.save(img_bytes, format="JPEG", quality=95)
             else:
                 img.save(img_bytes, format=img_format)
             img.close()
-            
+
             # Step 2: Modify exif_dict
-            tags_written = 0
-            for key, val in data.items():
-                if key.startswith("@") or key.startswith("Info:") or key.startswith("File:"): 
-                    continue
-                
-                # Skip technical tags that cause piexif errors (they're auto-managed)
-                SKIP_TAGS = ["XResolution", "YResolution", "ResolutionUnit", "YCbCrPositioning", 
-                             "ExifOffset", "ComponentsConfiguration", "FlashPixVersion", "Compression",
-                             "JPEGInterchangeFormat", "JPEGInterchangeFormatLength"]
-                tag_base = key.split(":")[-1] if ":" in key else key
-                if tag_base in SKIP_TAGS:
-                    continue
+            self._apply_tags(exif_dict, data)
 
-                tag_id = None
-                target_ifd = None
-                
-                # Handle prefixed keys like "0th:Make" or "Exif:DateTimeOriginal"
-                if ":" in key:
-                    parts = key.split(":", 1)
-                    prefix = parts[0]
-                    tag_name = parts[1] if len(parts) > 1 else key
-                    
-                    # Check if prefix is IFD name
-                    if prefix in ["0th", "Exif", "GPS", "1st", "Interop"]:
-                        target_ifd = prefix
-                        tag_id = TAG_NAME_TO_ID.get(tag_name)
-                    else:
-                        # Try full key or just the part after colon
-                        tag_id = TAG_NAME_TO_ID.get(key) or TAG_NAME_TO_ID.get(tag_name)
-                else:
-                    tag_id = TAG_NAME_TO_ID.get(key)
-                
-                if tag_id is None:
-                    print(f"  [SKIP] '{key}' -> No tag ID found")
-                    continue
+            # Step 3: Dump new exif and save
+            exif_bytes = piexif.dump(exif_dict)
+            s.bytes_written = img_bytes.tell() + len(exif_bytes)
+        log.debug("Exif bytes size: %d", len(exif_bytes))
 
-                # Type casting for different tag types
-                INT_TAGS = [34855, 34850, 41987, 41986, 37383, 37385, 40961, 274, 41989]  # ISO, ExposureProgram, FocalLength35mm, etc
-                RATIONAL_TAGS = [37377, 37378, 37379, 37380, 37381, 37386, 33434, 33437, 282, 283]  # Shutter, Aperture, Focal, XRes, YRes
-                
-                val_final = val
-                
-                if tag_id in INT_TAGS:
-                    try: 
-                        val_final = int(val)
-                    except: 
-                        pass
-                        
-                elif tag_id in RATIONAL_TAGS:
-                    # Parse rational: "1/100" -> (1, 100), "1.7" -> (17, 10), "23" -> (23, 1)
-                    # Also handle already-tuple strings: "(190, 100)"
-                    try:
-                        val_str = str(val).strip()
-                        
-                        # Already a tuple string like "(190, 100)"
-                        if val_str.startswith("(") and val_str.endswith(")"):
-                            inner = val_str[1:-1]
-                            parts = inner.split(",")
-                            val_final = (int(parts[0].strip()), int(parts[1].strip()))
-                        elif "/" in val_str:
-                            parts = val_str.split("/")
-                            val_final = (int(parts[0]), int(parts[1]))
-                        elif "." in val_str:
-                            f = float(val_str)
-                            val_final = (int(f * 100), 100)
-                        else:
-                            val_final = (int(val_str), 1)
-                    except Exception as e:
-                        print(f"    -> Rational parse failed: {e}")
-                        val_final = (0, 1)  # Default safe value
-                
-                # Encode string values to bytes
-                if isinstance(val_final, str):
-                    val_encoded = val_final.encode('utf-8')
-                elif isinstance(val_final, tuple):
-                    val_encoded = val_final  # Keep as tuple for piexif
+        # Re-open from memory buffer and save with new exif
+        img_bytes.seek(0)
+        final_img = Image.open(img_bytes)
+
+        # Save to temp file first
+        temp_path = path + ".tmp"
+        try:
+            with instrument.span("write") as s:
+                if img_format.upper() in ["JPEG", "JPG"]:
+                    final_img.save(temp_path, format="JPEG", exif=exif_bytes, quality=95)
                 else:
-                    val_encoded = val_final  # int or other
+                    final_img.save(temp_path, format=img_format, exif=exif_bytes)
+                if s:
+                    s.bytes_written = os.path.getsize(temp_path)
+        except:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        finally:
+            final_img.close()
+
+        # Replace original with temp
+        with instrument.span("rename"):
+            os.replace(temp_path, path)
+        # The encoder may drop or rewrite other chunks, so the result is only known by reading back
+        return SaveResult(True)
+
+    def _apply_tags(self, exif_dict: Dict[str, Any], data: Dict[str, str]) -> int:
+        """Writes editor keys into a piexif dict in place. Returns the number of tags placed."""
+
+        tags_written = 0
+        for key, val in data.items():
+            if key.startswith(("@", "Info:", "File:", xmp.PREFIX)):
+                continue
+            
+            # Skip technical tags that cause piexif errors (they're auto-managed)
+            SKIP_TAGS = ["XResolution", "YResolution", "ResolutionUnit", "YCbCrPositioning", 
+                         "ExifOffset", "ComponentsConfiguration", "FlashPixVersion", "Compression",
+                         "JPEGInterchangeFormat", "JPEGInterchangeFormatLength"]
+            tag_base = key.split(":")[-1] if ":" in key else key
+            if tag_base in SKIP_TAGS:
+                continue
 
-                # Place into correct IFD
-                placed = False
+            tag_id = None
+            target_ifd = None
+            
+            # Handle prefixed keys like "0th:Make" or "Exif:DateTimeOriginal"
+            if ":" in key:
+                parts = key.split(":", 1)
+                prefix = parts[0]
+                tag_name = parts[1] if len(parts) > 1 else key
                 
-                # If we have a target IFD from prefix, use it
-                if target_ifd and target_ifd in exif_dict:
-                    exif_dict[target_ifd][tag_id] = val_encoded
-                    placed = True
-                    print(f"  [WRITE] '{key}' -> ID {tag_id} -> IFD '{target_ifd}' = '{val}'")
+                # Check if prefix is IFD name
+                if prefix in ["0th", "Exif", "GPS", "1st", "Interop"]:
+                    target_ifd = prefix
+                    tag_id = exif.tag_id(prefix, tag_name) or TAG_NAME_TO_ID.get(tag_name)
                 else:
-                    # Check existing IFDs
-                    for ifd in ["0th", "Exif", "GPS", "1st"]:
-                        if ifd in exif_dict and tag_id in exif_dict[ifd]:
-                            exif_dict[ifd][tag_id] = val_encoded
-                            placed = True
-                            print(f"  [UPDATE] '{key}' -> ID {tag_id} -> IFD '{ifd}' = '{val}'")
-                            break
-                    
-                    if not placed:
-                        # Default placement
-                        if tag_id in [271, 272, 305, 306, 315]:  # Make, Model, Software, DateTime, Artist
-                            exif_dict["0th"][tag_id] = val_encoded
-                            print(f"  [NEW->0th] '{key}' -> ID {tag_id} = '{val}'")
-                        else:
-                            exif_dict["Exif"][tag_id] = val_encoded
-                            print(f"  [NEW->Exif] '{key}' -> ID {tag_id} = '{val}'")
-                
-                tags_written += 1
+                    # Try full key or just the part after colon
+                    tag_id = TAG_NAME_TO_ID.get(key) or TAG_NAME_TO_ID.get(tag_name)
+            else:
+                tag_id = TAG_NAME_TO_ID.get(key)
+            
+            if tag_id is None:
+                log.debug("  [SKIP] '%s' -> No tag ID found", key)
+                continue
 
-            print(f"[ImageHandler] Tags written: {tags_written}")
+            # Type casting for different tag types
+            INT_TAGS = [34855, 34850, 41987, 41986, 37383, 37385, 40961, 274, 41989]  # ISO, ExposureProgram, FocalLength35mm, etc
+            RATIONAL_TAGS = [37377, 37378, 37379, 37380, 37381, 37386, 33434, 33437, 282, 283]  # Shutter, Aperture, Focal, XRes, YRes
             
-            # Step 3: Dump new exif and save
-            exif_bytes = piexif.dump(exif_dict)
-            print(f"[ImageHandler] Exif bytes size: {len(exif_bytes)}")
+            val_final = val
             
-            # Re-open from memory buffer and save with new exif
-            img_bytes.seek(0)
-            final_img = Image.open(img_bytes)
+            if tag_id in INT_TAGS:
+                try: 
+                    val_final = int(val)
+                except: 
+                    pass
+                    
+            elif tag_id in RATIONAL_TAGS:
+                # Parse rational: "1/100" -> (1, 100), "1.7" -> (17, 10), "23" -> (23, 1)
+                # Also handle already-tuple strings: "(190, 100)"
+                try:
+                    val_str = str(val).strip()
+                    
+                    # Already a tuple string like "(190, 100)"
+                    if val_str.startswith("(") and val_str.endswith(")"):
+                        inner = val_str[1:-1]
+                        parts = inner.split(",")
+                        val_final = (int(parts[0].strip()), int(parts[1].strip()))
+                    elif "/" in val_str:
+                        parts = val_str.split("/")
+                        val_final = (int(parts[0]), int(parts[1]))
+                    elif "." in val_str:
+                        f = float(val_str)
+                        val_final = (int(f * 100), 100)
+                    else:
+                        val_final = (int(val_str), 1)
+                except Exception as e:
+                    log.debug("    -> Rational parse failed for '%s': %s", key, e)
+                    val_final = (0, 1)  # Default safe value
             
-            # Save to temp file first
-            temp_path = path + ".tmp"
-            if img_format.upper() in ["JPEG", "JPG"]:
-                final_img.save(temp_path, format="JPEG", exif=exif_bytes, quality=95)
+            # Encode string values to bytes
+            if isinstance(val_final, str):
+                val_encoded = val_final.encode('utf-8')
+            elif isinstance(val_final, tuple):
+                val_encoded = val_final  # Keep as tuple for piexif
             else:
-                if img_format.upper() == "PNG":
-                    print("[ImageHandler] WARNING: PNG does not support EXIF!")
-                    final_img.save(temp_path, format="PNG")
-                else:
-                    final_img.save(temp_path, format=img_format, exif=exif_bytes)
-            
-            final_img.close()
+                val_encoded = val_final  # int or other
+
+            # Place into correct IFD
+            placed = False
             
-            # Replace original with temp
-            os.replace(temp_path, path)
-            print(f"[ImageHandler] SUCCESS! File saved.")
-            print(f"{'='*50}\n")
+            # If we have a target IFD from prefix, use it
+            if target_ifd and target_ifd in exif_dict:
+                exif_dict[target_ifd][tag_id] = val_encoded
+                placed = True
+                log.debug("  [WRITE] '%s' -> ID %s -> IFD '%s' = '%s'", key, tag_id, target_ifd, val)
+            else:
+                # Check existing IFDs
+                for ifd in ["0th", "Exif", "GPS", "1st"]:
+                    if ifd in exif_dict and tag_id in exif_dict[ifd]:
+                        exif_dict[ifd][tag_id] = val_encoded
+                        placed = True
+                        log.debug("  [UPDATE] '%s' -> ID %s -> IFD '%s' = '%s'", key, tag_id, ifd, val)
+                        break
+                
+                if not placed:
+                    # Default placement (piexif rejects IFD0-only tags such as Copyright in the Exif IFD)
+                    if tag_id in [271, 272, 305, 306, 315] or tag_id not in piexif.TAGS["Exif"]:  # Make, Model, Software, DateTime, Artist
+                        exif_dict["0th"][tag_id] = val_encoded
+                        log.debug("  [NEW->0th] '%s' -> ID %s = '%s'", key, tag_id, val)
+                    else:
+                        exif_dict["Exif"][tag_id] = val_encoded
+                        log.debug("  [NEW->Exif] '%s' -> ID %s = '%s'", key, tag_id, val)
             
-        except Exception as e:
-            print(f"[ImageHandler] ERROR: {e}")
-            import traceback
-            traceback.print_exc()
+            tags_written += 1
+
+        log.debug("Tags written: %d", tags_written)
+        return tags_written
+
 
 
 class PDFHandler(FileHandler):
-    def load(self, path: str) -> Dict[str, str]:
+    """Handles PDF Info dictionaries.
+
+    Loads go through a lazy xref-based reader and only fall back to pypdf when it fails.
+    With incremental (the default) saves append an update section to the file instead of
+    rewriting it; encrypted or unparseable files fall back to a full pypdf rewrite.
+    """
+    def __init__(self, incremental: bool = True):
+        self.incremental = incremental
+
+    def load(self, path: str, hint: Optional[sniff.Sniffed] = None) -> Dict[str, str]:
+        # Fast path: resolve only /Info and /Root/Pages/Count through the xref
         try:
-            reader = pypdf.PdfReader(path)
-            data = {}
-            # Pages
-            data["@Pages"] = str(len(reader.pages))
-            
-            meta = reader.metadata
-            if meta:
-                for k, v in meta.items():
-                    data[k.lstrip('/')] = str(v)
+            with instrument.span("parse") as s, open(path, "rb") as raw:
+                f = _CountingFile(raw)
+                doc = pdf.PdfFile(f)
+                data = {"@Pages": str(doc.page_count())}
+                data.update(doc.info())
+                data.update(_xmp_keys(doc.xmp()))
+                s.bytes_read = f.bytes_read
+            return data
+        except (OSError, ValueError, TypeError, KeyError):  # PdfError is a ValueError
+            pass
+
+        try:
+            with instrument.span("parse"):
+                reader = pypdf.PdfReader(path)
+                data = {}
+                # Pages
+                data["@Pages"] = str(len(reader.pages))
+
+                meta = reader.metadata
+                if meta:
+                    for k, v in meta.items():
+                        data[k.lstrip('/')] = str(v)
+                data.update(xmp.read(path, "pdf"))
             return data
         except Exception:
             return {}
 
-    def save(self, path: str, data: Dict[str, str]) -> None:
+    def write(self, path: str, data: Dict[str, str], hint: Optional[sniff.Sniffed] = None) -> SaveResult:
+        data, xmp_edits = xmp.split(data)
+        meta_args = {f"/{k}": v for k, v in data.items() if not k.startswith("@")}
+        result = None
+        if self.incremental:
+            try:
+                with instrument.span("write") as s:
+                    appended = s.bytes_written = pdf.write_info_incremental(path, meta_args)
+                # The new Info dictionary holds exactly meta_args
+                result = SaveResult(appended > 0, {k.lstrip("/"): str(v) for k, v in meta_args.items()})
+            except (OSError, ValueError, TypeError, KeyError) as e:
+                log.warning("PDF incremental save failed for %s (%s), rewriting document", path, e)
+        if result is None:
+            result = self._rewrite(path, meta_args)
+        if xmp_edits:
+            stats = xmp.write(path, xmp_edits, "pdf")
+            # XMP keys come from the /Metadata stream, not the Info dictionary: read back
+            result = SaveResult(result.written or stats is not None)
+        return result
+
+    @staticmethod
+    def _rewrite(path: str, meta_args: Dict[str, str]) -> SaveResult:
+        """Full pypdf rewrite, for files the incremental writer can't update."""
+        reader = pypdf.PdfReader(path)
+        writer = pypdf.PdfWriter()
+        writer.append_pages_from_reader(reader)
+
+        writer.add_metadata(meta_args)
+
+        temp = path + ".tmp"
         try:
-            reader = pypdf.PdfReader(path)
-            writer = pypdf.PdfWriter()
-            writer.append_pages_from_reader(reader)
-            
-            meta_args = {f"/{k}": v for k, v in data.items() if not k.startswith("@")}
-            writer.add_metadata(meta_args)
-            
-            temp = path + ".tmp"
-            with open(temp, "wb") as f:
+            with instrument.span("write") as s, open(temp, "wb") as f:
                 writer.write(f)
+                s.bytes_written = f.tell()
+        except:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+        with instrument.span("rename"):
             os.replace(temp, path)
-        except Exception as e:
-            print(f"PDF save error: {e}")
+        return SaveResult(True)  # pypdf adds its own /Producer; read back to see the result
 
 class DocxHandler(FileHandler):
-    def load(self, path: str) -> Dict[str, str]:
+    def load(self, path: str, hint: Optional[sniff.Sniffed] = None) -> Dict[str, str]:
+        # Reads docProps/* straight from the ZIP; the document body is never parsed
         try:
-            doc = DocxDocument(path)
-            props = doc.core_properties
-            data = {}
-            for prop in dir(props):
-                if not prop.startswith('_') and not callable(getattr(props, prop)):
-                    val = getattr(props, prop)
-                    if val and isinstance(val, (str, int, float)):
-                        data[prop] = str(val)
-            return data
+            with instrument.span("parse"):
+                return ooxml.read_properties(path, ooxml.DOCX_NAMES)
         except Exception:
             return {}
 
-    def save(self, path: str, data: Dict[str, str]) -> None:
-        try:
-            doc = DocxDocument(path)
-            props = doc.core_properties
-            for k, v in data.items():
-                if hasattr(props, k):
-                    try: setattr(props, k, v)
-                    except: pass
-            doc.save(path)
-        except Exception as e:
-            print(f"DOCX save error: {e}")
+    def write(self, path: str, data: Dict[str, str], hint: Optional[sniff.Sniffed] = None) -> SaveResult:
+        # Regenerates docProps/* only; every other ZIP member is copied byte for byte
+        return SaveResult(*ooxml.write_properties(path, ooxml.DOCX_NAMES, data))
+
+    def write_to(self, path: str, dest: str, data: Dict[str, str],
+                 hint: Optional[sniff.Sniffed] = None) -> Optional[SaveResult]:
+        return SaveResult(*ooxml.write_properties(path, ooxml.DOCX_NAMES, data, dest))
 
 class XlsxHandler(FileHandler):
-    def load(self, path: str) -> Dict[str, str]:
+    def load(self, path: str, hint: Optional[sniff.Sniffed] = None) -> Dict[str, str]:
+        # Reads docProps/* straight from the ZIP; worksheets are never loaded
         try:
-            wb = load_workbook(path)
-            props = wb.properties
-            data = {}
-            for prop in dir(props):
-                if not prop.startswith('_') and not callable(getattr(props, prop)):
-                    val = getattr(props, prop)
-                    if val and isinstance(val, (str, int, float)):
-                        data[prop] = str(val)
-            return data
+            with instrument.span("parse"):
+                return ooxml.read_properties(path, ooxml.XLSX_NAMES)
         except Exception:
             return {}
 
-    def save(self, path: str, data: Dict[str, str]) -> None:
-        try:
-            wb = load_workbook(path)
-            props = wb.properties
-            for k, v in data.items():
-                 if hasattr(props, k):
-                    try: setattr(props, k, v)
-                    except: pass
-            wb.save(path)
-        except Exception as e:
-            print(f"XLSX save error: {e}")
+    def write(self, path: str, data: Dict[str, str], hint: Optional[sniff.Sniffed] = None) -> SaveResult:
+        # Regenerates docProps/* only; every other ZIP member is copied byte for byte
+        return SaveResult(*ooxml.write_properties(path, ooxml.XLSX_NAMES, data))
+
+    def write_to(self, path: str, dest: str, data: Dict[str, str],
+                 hint: Optional[sniff.Sniffed] = None) -> Optional[SaveResult]:
+        return SaveResult(*ooxml.write_properties(path, ooxml.XLSX_NAMES, data, dest))
 
 class GenericHandler(FileHandler):
     """Handles any file type just for file system stats (Dates)."""
-    def load(self, path: str) -> Dict[str, str]:
+    def load(self, path: str, hint: Optional[sniff.Sniffed] = None) -> Dict[str, str]:
         return {} # No internal metadata
-    def save(self, path: str, data: Dict[str, str]) -> None:
-        pass # No internal metadata to save
+    def write(self, path: str, data: Dict[str, str], hint: Optional[sniff.Sniffed] = None) -> SaveResult:
+        return SaveResult(False, {}) # No internal metadata to save
 
 class MetadataManager:
     HANDLERS = {
@@ -432,49 +1171,134 @@ class MetadataManager:
         ".css": GenericHandler(), ".json": GenericHandler(), ".xml": GenericHandler()
     }
 
+    # Sniffed content kind -> handler. Takes priority over the extension, so mislabeled
+    # files still reach the right handler.
+    KIND_HANDLERS = {
+        **{kind: AudioHandler() for kind in sniff.AUDIO_KINDS},
+        **{kind: ImageHandler() for kind in sniff.IMAGE_KINDS},
+        "pdf": PDFHandler(), "docx": DocxHandler(), "xlsx": XlsxHandler(),
+        "matroska": GenericHandler(), "zip": GenericHandler(),  # Nothing mutagen can read
+    }
+
     @staticmethod
-    def get_handler(filepath: str) -> Optional[FileHandler]:
-        _, ext = os.path.splitext(filepath)
-        handler = MetadataManager.HANDLERS.get(ext.lower())
+    def resolve(filepath: str) -> Tuple[FileHandler, sniff.Sniffed]:
+        """Reads the file prefix once and picks a handler by magic signature, then extension."""
+        with instrument.span("open") as s:
+            hint = sniff.sniff(filepath)
+            s.bytes_read = len(hint.prefix)
+        handler = MetadataManager.KIND_HANDLERS.get(hint.kind)
+        if handler is None:
+            _, ext = os.path.splitext(filepath)
+            handler = MetadataManager.HANDLERS.get(ext.lower())
         if handler is None:
             # Fallback to generic for any unknown file to allow Date Editing
-            return GenericHandler()
-        return handler
+            handler = GenericHandler()
+        return handler, hint
 
     @staticmethod
-    def load(filepath: str) -> Dict[str, str]:
-        handler = MetadataManager.get_handler(filepath)
-        data = {}
-        
+    def get_handler(filepath: str) -> Optional[FileHandler]:
+        return MetadataManager.resolve(filepath)[0]
+
+    # What load() last returned per path, with the file identity it was read at. save() diffs
+    # against it so unchanged files are not rewritten. Bounded: only recent loads are kept.
+    SNAPSHOT_LIMIT = 1024
+    _snapshots = OrderedDict()
+    _snapshot_lock = threading.Lock()
+
+    # Keys a handler's SaveResult.metadata may leave out: container properties, PIL's container
+    # info and the XMP view (a handler that rewrites XMP returns no metadata, forcing a reload)
+    _PRESERVED_PREFIXES = ("@", "Info:", xmp.PREFIX)
+    # Keys that feed the file system date sync in save()
+    _DATE_KEYS = ("Exif:DateTimeOriginal", "0th:DateTime", "DateTime", "File:Created", "File:Modified")
+
+    @staticmethod
+    def load(filepath: str, use_cache: bool = True) -> Dict[str, str]:
+        """Format tags plus File:* stats. Format tags come from the persistent cache when the
+        file's identity (device, inode, size, mtime) is unchanged; use_cache=False always parses."""
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            stat = None
+        store = cache.get_default() if use_cache and stat is not None else None
+
         # 1. Load Format-Specific Tags
-        if handler:
-            data = handler.load(filepath)
+        data = None
+        if store is not None:
+            try:
+                data = store.get(filepath, stat)
+            except sqlite3.Error:
+                store = None
+        if data is None:
+            handler, hint = MetadataManager.resolve(filepath)
+            data = handler.load(filepath, hint) if handler else {}
+            if store is not None:
+                try:
+                    store.put(filepath, stat, data)
+                except sqlite3.Error:
+                    pass
         
         # 2. Add Generic File System Stats (Like ExifTool)
-        try:
-            stat = os.stat(filepath)
+        return MetadataManager._finish(filepath, stat, data)
+
+    @staticmethod
+    def _finish(filepath: str, stat: Optional[os.stat_result], data: Dict[str, str]) -> Dict[str, str]:
+        """Adds File:* stats to handler data and remembers the result as the file's snapshot."""
+        if stat is not None:
             data["File:Size"] = f"{stat.st_size / 1024:.2f} KB"
             data["File:Modified"] = datetime.datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
             data["File:Created"] = datetime.datetime.fromtimestamp(stat.st_ctime).strftime('%Y-%m-%d %H:%M:%S')
             data["File:Path"] = filepath
-        except Exception:
-            pass
-
+            with MetadataManager._snapshot_lock:
+                MetadataManager._snapshots[filepath] = (cache.identity(stat), dict(data))
+                MetadataManager._snapshots.move_to_end(filepath)
+                while len(MetadataManager._snapshots) > MetadataManager.SNAPSHOT_LIMIT:
+                    MetadataManager._snapshots.popitem(last=False)
         return data
 
+    @staticmethod
+    def snapshot(filepath: str) -> Optional[Dict[str, str]]:
+        """The last loaded data for filepath, or None if it was never loaded or has changed since."""
+        with MetadataManager._snapshot_lock:
+            entry = MetadataManager._snapshots.get(filepath)
+        if entry is None:
+            return None
+        try:
+            if cache.identity(os.stat(filepath)) != entry[0]:
+                return None
+        except OSError:
+            return None
+        return dict(entry[1])
 
+    @staticmethod
+    def save(filepath: str, data: Dict[str, str], base: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Writes data and returns the file's metadata afterwards (what load() would return).
 
+        data is diffed against `base` (default: the snapshot from the last load()). When no
+        tag changed the handler is not called at all; handlers with accepts_delta only get
+        the added and changed keys. Without a usable base every tag is written as before.
+        A failed write raises (the handler's exception) instead of reporting a save."""
+        handler, hint = MetadataManager.resolve(filepath)
+        if base is None:
+            base = MetadataManager.snapshot(filepath)
+        changes = diff_metadata(base, data) if base is not None else None
 
-    @staticmethod
-    def save(filepath: str, data: Dict[str, str]):
-        handler = MetadataManager.get_handler(filepath)
-        if handler:
-            # 1. Save Internal Metadata (Exif, etc)
-            writable_data = {k: v for k, v in data.items() if not k.startswith("@") and not k.startswith("File:")}
-            handler.save(filepath, writable_data)
+        # 1. Save Internal Metadata (Exif, etc)
+        writable_data = {k: v for k, v in data.items() if is_writable_key(k)}
+        if changes is not None and not changes:
+            result = SaveResult(False)
+        else:
+            if changes is not None and handler.accepts_delta:
+                writable_data = {**changes.added, **changes.changed}
+            try:
+                result = handler.write(filepath, writable_data, hint)
+            except Exception:
+                MetadataManager.invalidate(filepath)  # It may have been partly written
+                raise
+        written = result.written
             
-            # 2. Sync File System Dates
-            # Priority: Exif dates > File:Created/Modified (for mimicry, EXIF dates are authoritative)
+        # 2. Sync File System Dates (a tag write bumps mtime, so they are redone after one)
+        # Priority: Exif dates > File:Created/Modified (for mimicry, EXIF dates are authoritative)
+        if written or base is None or any(data.get(k) != base.get(k) for k in MetadataManager._DATE_KEYS):
             exif_date = None
             for key in ["Exif:DateTimeOriginal", "0th:DateTime", "DateTime"]:
                 if key in data and data[key]:
@@ -487,7 +1311,51 @@ class MetadataManager:
             
             if created_date or modified_date:
                 MetadataManager.set_file_dates(filepath, created_date, modified_date)
-                print(f"[MetadataManager] File dates set: Created={created_date}, Modified={modified_date}")
+                log.debug("File dates set for %s: Created=%s, Modified=%s", filepath, created_date, modified_date)
+
+        # 3. Canonical metadata without re-parsing, when the handler or the snapshot can tell
+        if base is not None and not written:
+            tags = {k: v for k, v in base.items() if not k.startswith("File:")}
+        elif base is not None and result.metadata is not None:
+            tags = {k: v for k, v in base.items() if k.startswith(MetadataManager._PRESERVED_PREFIXES)}
+            tags.update(result.metadata)
+        else:
+            # The file was just written: the sniffed prefix no longer describes it
+            tags = handler.load(filepath, hint._replace(prefix=b""))
+
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            stat = None
+        MetadataManager._store(filepath, stat, tags)
+        return MetadataManager._finish(filepath, stat, tags)
+
+    @staticmethod
+    def _store(filepath: str, stat: Optional[os.stat_result], tags: Dict[str, str]):
+        """Replaces the cache entry after a save. Dropping it is not enough on its own: an
+        in-place write keeps the size and set_file_dates can put mtime back."""
+        store = cache.get_default()
+        if store is None:
+            return
+        try:
+            if stat is not None:
+                store.put(filepath, stat, tags)
+            else:
+                store.invalidate(filepath)
+        except sqlite3.Error:
+            pass
+
+    @staticmethod
+    def invalidate(filepath: str):
+        """Drops the cached entry and the snapshot for filepath."""
+        with MetadataManager._snapshot_lock:
+            MetadataManager._snapshots.pop(filepath, None)
+        store = cache.get_default()
+        if store is not None:
+            try:
+                store.invalidate(filepath)
+            except sqlite3.Error:
+                pass
 
     @staticmethod
     def set_file_dates(filepath: str, created_str: str = None, modified_str: str = None):
@@ -507,7 +1375,7 @@ class MetadataManager:
                     return datetime.datetime.strptime(str(date_str).strip(), fmt).timestamp()
                 except ValueError:
                     continue
-            print(f"[set_file_dates] Could not parse: {date_str}")
+            log.warning("set_file_dates: could not parse %r", date_str)
             return None
         
         created_ts = parse_date(created_str)
@@ -517,49 +1385,48 @@ class MetadataManager:
             return
         
         try:
-            # 1. Set Modified/Access Time via os.utime
-            if modified_ts:
-                os.utime(filepath, (modified_ts, modified_ts))
+            with instrument.span("utime"):
+                # 1. Set Modified/Access Time via os.utime
+                if modified_ts:
+                    os.utime(filepath, (modified_ts, modified_ts))
             
-            # 2. Set Creation Time (Windows Only) via kernel32
-            if os.name == 'nt' and (created_ts or modified_ts):
-                import ctypes
+                # 2. Set Creation Time (Windows Only) via kernel32
+                if os.name == 'nt' and (created_ts or modified_ts):
+                    import ctypes
                 
-                FILE_WRITE_ATTRIBUTES = 0x0100
-                OPEN_EXISTING = 3
-                kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+                    FILE_WRITE_ATTRIBUTES = 0x0100
+                    OPEN_EXISTING = 3
+                    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
                 
-                h = kernel32.CreateFileW(
-                    filepath, 
-                    FILE_WRITE_ATTRIBUTES, 
-                    0, None, OPEN_EXISTING, 
-                    128,  # FILE_ATTRIBUTE_NORMAL
-                    None
-                )
+                    h = kernel32.CreateFileW(
+                        filepath, 
+                        FILE_WRITE_ATTRIBUTES, 
+                        0, None, OPEN_EXISTING, 
+                        128,  # FILE_ATTRIBUTE_NORMAL
+                        None
+                    )
                 
-                if h != -1:
-                    def ts_to_filetime(ts):
-                        if ts is None: return None
-                        intervals = int((ts + 11644473600) * 10000000)
-                        return ctypes.c_int64(intervals)
+                    if h != -1:
+                        def ts_to_filetime(ts):
+                            if ts is None: return None
+                            intervals = int((ts + 11644473600) * 10000000)
+                            return ctypes.c_int64(intervals)
                     
-                    ft_created = ts_to_filetime(created_ts)
-                    ft_modified = ts_to_filetime(modified_ts)
+                        ft_created = ts_to_filetime(created_ts)
+                        ft_modified = ts_to_filetime(modified_ts)
                     
-                    # SetFileTime(handle, lpCreationTime, lpLastAccessTime, lpLastWriteTime)
-                    kernel32.SetFileTime(
-                        h,
-                        ctypes.byref(ft_created) if ft_created else None,
-                        None,  # Access time
-                        ctypes.byref(ft_modified) if ft_modified else None
-                    )
-                    kernel32.CloseHandle(h)
-                    print("[set_file_dates] Windows timestamps updated successfully")
-                else:
-                    print(f"[set_file_dates] Failed to open file handle, error: {ctypes.get_last_error()}")
+                        # SetFileTime(handle, lpCreationTime, lpLastAccessTime, lpLastWriteTime)
+                        kernel32.SetFileTime(
+                            h,
+                            ctypes.byref(ft_created) if ft_created else None,
+                            None,  # Access time
+                            ctypes.byref(ft_modified) if ft_modified else None
+                        )
+                        kernel32.CloseHandle(h)
+                        log.debug("set_file_dates: Windows timestamps updated for %s", filepath)
+                    else:
+                        log.warning("set_file_dates: failed to open %s, error %s", filepath, ctypes.get_last_error())
                     
-        except Exception as e:
-            print(f"[set_file_dates] Error: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            log.exception("set_file_dates failed for %s", filepath)
 
@@ -0,0 +1,207 @@
+"""Single-pass Exif/TIFF IFD parser.
+
+Walks 0th -> Exif -> GPS/Interop -> 1st once and returns values in the same shape
+piexif.load() produces, so the result can go straight back into piexif.dump().
+Tag names and types come from tables built once at import.
+"""
+import struct
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+import piexif
+from PIL import ExifTags
+
+EXIF_HEADER = b"Exif\x00\x00"
+
+IFD_ORDER = ("0th", "Exif", "GPS", "Interop", "1st")
+
+# Pointer tags linking the IFDs together
+EXIF_POINTER = 34665
+GPS_POINTER = 34853
+INTEROP_POINTER = 40965
+THUMB_OFFSET = 513
+THUMB_LENGTH = 514
+
+# TIFF field types -> (struct code, item size)
+TYPES = {
+    1: ("B", 1),   # BYTE
+    2: ("s", 1),   # ASCII
+    3: ("H", 2),   # SHORT
+    4: ("L", 4),   # LONG
+    5: ("L", 8),   # RATIONAL
+    6: ("b", 1),   # SBYTE
+    7: ("s", 1),   # UNDEFINED
+    8: ("h", 2),   # SSHORT
+    9: ("l", 4),   # SLONG
+    10: ("l", 8),  # SRATIONAL
+    11: ("f", 4),  # FLOAT
+    12: ("d", 8),  # DOUBLE
+    13: ("L", 4),  # IFD
+}
+
+# IFD entry header (tag, type, count), precompiled per byte order
+_ENTRY = {"<": struct.Struct("<HHL"), ">": struct.Struct(">HHL")}
+
+_PIEXIF_TABLE = {"0th": "Image", "1st": "Image", "Exif": "Exif", "GPS": "GPS", "Interop": "Interop"}
+
+
+def _build_tables() -> Tuple[Dict[Tuple[str, int], Tuple[str, Optional[int]]], Dict[Tuple[str, str], int]]:
+    """(ifd, tag_id) -> (display name, piexif type) and the reverse (ifd, name) -> tag_id.
+    Display names follow PIL's ExifTags (what the editor has always shown); piexif names
+    are accepted as aliases on the reverse table."""
+    by_id = {}
+    by_name = {}
+    for ifd in IFD_ORDER:
+        pil_names = ExifTags.GPSTAGS if ifd == "GPS" else ExifTags.TAGS
+        px = piexif.TAGS[_PIEXIF_TABLE[ifd]]
+        for tag_id in set(px) | set(pil_names):
+            name = pil_names.get(tag_id) or px[tag_id]["name"]
+            tag_type = px[tag_id]["type"] if tag_id in px else None
+            by_id[(ifd, tag_id)] = (name, tag_type)
+        for tag_id, info in px.items():
+            by_name.setdefault((ifd, info["name"]), tag_id)
+        for tag_id in px:
+            by_name[(ifd, by_id[(ifd, tag_id)][0])] = tag_id
+    return by_id, by_name
+
+
+TAGS, TAG_IDS = _build_tables()
+
+
+class ExifResult(NamedTuple):
+    display: Dict[str, str]
+    raw: Dict[str, Any]
+
+
+def tag_name(ifd: str, tag_id: int) -> str:
+    entry = TAGS.get((ifd, tag_id))
+    return entry[0] if entry else f"Unknown_{tag_id}"
+
+
+def tag_id(ifd: str, name: str) -> Optional[int]:
+    return TAG_IDS.get((ifd, name))
+
+
+def is_known(ifd: str, tag: int) -> bool:
+    """True if piexif knows how to serialize the tag."""
+    entry = TAGS.get((ifd, tag))
+    return entry is not None and entry[1] is not None
+
+
+def _read_value(buf, endian: str, base: int, field_type: int, count: int, value_pos: int) -> Any:
+    code, size = TYPES[field_type]
+    total = size * count
+    if total > 4:
+        pos = base + struct.unpack_from(endian + "L", buf, value_pos)[0]
+        if pos + total > len(buf):
+            raise ValueError("Value out of bounds")
+    else:
+        pos = value_pos
+
+    if field_type in (2, 7):
+        data = bytes(buf[pos:pos + count])
+        if field_type == 2 and data.endswith(b"\x00"):
+            data = data[:-1]
+        return data
+    if field_type in (5, 10):
+        flat = struct.unpack_from(f"{endian}{count * 2}{code}", buf, pos)
+        pairs = tuple(zip(flat[0::2], flat[1::2]))
+        return pairs[0] if count == 1 else pairs
+    values = struct.unpack_from(f"{endian}{count}{code}", buf, pos)
+    return values[0] if count == 1 else values
+
+
+def _read_ifd(buf, endian: str, base: int, offset: int) -> Tuple[Dict[int, Any], int]:
+    """Returns ({tag: value}, next IFD offset). Malformed entries are skipped."""
+    start = base + offset
+    count = struct.unpack_from(endian + "H", buf, start)[0]
+    entries = {}
+    entry = _ENTRY[endian]
+    for i in range(count):
+        pos = start + 2 + 12 * i
+        tag, field_type, n = entry.unpack_from(buf, pos)
+        if field_type not in TYPES or n == 0:
+            continue
+        try:
+            entries[tag] = _read_value(buf, endian, base, field_type, n, pos + 8)
+        except (struct.error, ValueError):
+            continue
+    next_pos = start + 2 + 12 * count
+    next_ifd = struct.unpack_from(endian + "L", buf, next_pos)[0] if next_pos + 4 <= len(buf) else 0
+    return entries, next_ifd
+
+
+def parse(buf) -> Dict[str, Any]:
+    """Parses an Exif blob ('Exif\\0\\0' header optional) or a whole TIFF file buffer.
+    Accepts bytes, memoryview or mmap. Returns a piexif-shaped dict (unknown tags included)."""
+    base = 6 if bytes(buf[:6]) == EXIF_HEADER else 0
+    order = bytes(buf[base:base + 2])
+    if order == b"II":
+        endian = "<"
+    elif order == b"MM":
+        endian = ">"
+    else:
+        raise ValueError("Not a TIFF/Exif structure")
+    if struct.unpack_from(endian + "H", buf, base + 2)[0] != 42:
+        raise ValueError("Bad TIFF magic")
+
+    result = {ifd: {} for ifd in IFD_ORDER}
+    result["thumbnail"] = None
+    seen = set()
+
+    def walk(ifd: str, offset: int) -> int:
+        if not offset or offset in seen or base + offset + 2 > len(buf):
+            return 0
+        seen.add(offset)
+        try:
+            entries, next_ifd = _read_ifd(buf, endian, base, offset)
+        except struct.error:
+            return 0
+        result[ifd] = entries
+        return next_ifd
+
+    first = walk("0th", struct.unpack_from(endian + "L", buf, base + 4)[0])
+    zeroth = result["0th"]
+    if isinstance(zeroth.get(EXIF_POINTER), int):
+        walk("Exif", zeroth[EXIF_POINTER])
+    if isinstance(zeroth.get(GPS_POINTER), int):
+        walk("GPS", zeroth[GPS_POINTER])
+    if isinstance(result["Exif"].get(INTEROP_POINTER), int):
+        walk("Interop", result["Exif"][INTEROP_POINTER])
+    walk("1st", first)
+
+    first_ifd = result["1st"]
+    if isinstance(first_ifd.get(THUMB_OFFSET), int) and isinstance(first_ifd.get(THUMB_LENGTH), int):
+        start = base + first_ifd[THUMB_OFFSET]
+        result["thumbnail"] = bytes(buf[start:start + first_ifd[THUMB_LENGTH]]) or None
+    return result
+
+
+def display_value(value: Any) -> str:
+    if isinstance(value, bytes):
+        try: return value.decode().strip('\x00')
+        except UnicodeDecodeError: return f"<Binary {len(value)}>"
+    return str(value)
+
+
+def to_display(raw: Dict[str, Any]) -> Dict[str, str]:
+    """Editor keys: bare names for known 0th tags, '<ifd>:<name>' for everything else.
+    GPS tags are named from ExifTags.GPSTAGS; tags nobody names are '<ifd>:Unknown_<id>'."""
+    data = {}
+    for ifd in IFD_ORDER:
+        for tag, value in raw.get(ifd, {}).items():
+            name = tag_name(ifd, tag)
+            key = name if ifd == "0th" and (ifd, tag) in TAGS else f"{ifd}:{name}"
+            data[key] = display_value(value)
+    return data
+
+
+def to_piexif(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Drops tags piexif cannot serialize so the dict is safe to pass to piexif.dump()."""
+    out = {ifd: {t: v for t, v in raw.get(ifd, {}).items() if is_known(ifd, t)} for ifd in IFD_ORDER}
+    out["thumbnail"] = raw.get("thumbnail")
+    return out
+
+
+def read(buf) -> ExifResult:
+    raw = parse(buf)
+    return ExifResult(to_display(raw), raw)
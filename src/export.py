@@ -0,0 +1,145 @@
+"""Streaming export of load records to JSON Lines or CSV, optionally zstd-compressed.
+
+Records are the dicts produced by cli.load_record:
+    {"path": ..., "ok": True, "metadata": {...}} / {"path": ..., "ok": False, "error": ...}
+Writers take one record at a time and never hold more than a bounded window, so memory
+is flat regardless of how many files are exported.
+
+CSV column union: a CSV header must be fixed before the first row, but the full key union
+is only known at the end. The writer therefore buffers the first `sample` records, uses the
+sorted union of their keys as the header (after path/ok/error), and from then on puts any
+key outside the header into a trailing `extra` column as a JSON object. Passing `columns`
+fixes the header up front, which makes it identical across runs.
+"""
+import csv
+import io
+import json
+import sys
+from typing import Dict, Iterable, List, Optional, TextIO
+
+try:
+    import zstandard
+except ImportError:  # Optional: only needed for compressed output
+    zstandard = None
+
+FORMATS = ("jsonl", "csv")
+
+BASE_COLUMNS = ["path", "ok", "error"]
+EXTRA_COLUMN = "extra"
+DEFAULT_SAMPLE = 1000
+
+
+class ExportError(Exception):
+    pass
+
+
+class JsonlWriter:
+    def __init__(self, out: TextIO):
+        self.out = out
+
+    def write(self, record: Dict):
+        self.out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    def close(self):
+        self.out.flush()
+
+
+class CsvWriter:
+    def __init__(self, out: TextIO, columns: Optional[List[str]] = None, sample: int = DEFAULT_SAMPLE):
+        self.out = out
+        self.sample = max(0, sample)
+        self._csv = csv.writer(out)
+        self._columns = list(columns) if columns is not None else None
+        self._pending: List[Dict] = []
+        if self._columns is not None:
+            self._write_header()
+
+    def write(self, record: Dict):
+        if self._columns is None:
+            self._pending.append(record)
+            if len(self._pending) > self.sample:
+                self._fix_columns()
+            return
+        self._write_row(record)
+
+    def close(self):
+        if self._columns is None:
+            self._fix_columns()
+        self.out.flush()
+
+    def _fix_columns(self):
+        keys = set()
+        for record in self._pending:
+            keys.update(record.get("metadata") or ())
+        self._columns = sorted(keys)
+        self._write_header()
+        for record in self._pending:
+            self._write_row(record)
+        self._pending = []
+
+    def _write_header(self):
+        self._known = set(self._columns)
+        self._csv.writerow(BASE_COLUMNS + self._columns + [EXTRA_COLUMN])
+
+    def _write_row(self, record: Dict):
+        meta = record.get("metadata") or {}
+        extra = {k: v for k, v in meta.items() if k not in self._known}
+        self._csv.writerow(
+            [record.get("path", ""), "1" if record.get("ok") else "0", record.get("error", "")]
+            + [meta.get(c, "") for c in self._columns]
+            + [json.dumps(extra, ensure_ascii=False, default=str) if extra else ""])
+
+
+def make_writer(fmt: str, out: TextIO, columns: Optional[List[str]] = None, sample: int = DEFAULT_SAMPLE):
+    if fmt == "jsonl":
+        return JsonlWriter(out)
+    if fmt == "csv":
+        return CsvWriter(out, columns, sample)
+    raise ExportError(f"Unknown export format: {fmt}")
+
+
+class _Output:
+    """Text stream over a file (or stdout), zstd-compressed if requested. Use as a context manager."""
+
+    def __init__(self, path: Optional[str], compress: bool, level: int):
+        if compress and zstandard is None:
+            raise ExportError("zstd output requires the 'zstandard' package")
+        if not path:
+            sys.stdout.flush()  # Anything already printed goes before our bytes
+        self._raw = open(path, "wb") if path else None
+        self._binary = self._raw or sys.stdout.buffer
+        self._zstd = None
+        if compress:
+            self._zstd = zstandard.ZstdCompressor(level=level).stream_writer(self._binary, closefd=self._raw is not None)
+        # newline="" so the csv module controls line endings
+        self.stream = io.TextIOWrapper(self._zstd or self._binary, encoding="utf-8", newline="")
+
+    def __enter__(self) -> TextIO:
+        return self.stream
+
+    def __exit__(self, *exc):
+        if self._zstd is None and self._raw is None:
+            self.stream.flush()
+            self.stream.detach()  # Leave stdout open
+        else:
+            self.stream.close()  # Ends the zstd frame; closes the file but never stdout
+        if not self._binary.closed:
+            self._binary.flush()
+        return False
+
+
+def open_output(path: Optional[str] = None, compress: Optional[bool] = None, level: int = 3) -> _Output:
+    """Opens path (stdout if None) for text export. compress=None enables zstd for '.zst' paths."""
+    if compress is None:
+        compress = bool(path) and path.lower().endswith(".zst")
+    return _Output(path, compress, level)
+
+
+def export(records: Iterable[Dict], writer) -> int:
+    """Drains records into writer one at a time. Returns the number written."""
+    count = 0
+    for record in records:
+        writer.write(record)
+        count += 1
+    writer.close()
+    return count
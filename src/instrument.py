@@ -0,0 +1,163 @@
+"""Per-stage timing spans for handler I/O.
+
+Handlers wrap each stage of a load or save in span(stage):
+    open    container header / file handle (Image.open, the sniff prefix)
+    parse   decoding the tag structures
+    encode  serializing new tags
+    write   bytes going to disk
+    copy    duplicating a file so an in-place writer can edit the copy (batch commits)
+    rename  moving a temp file over the original
+    utime   file system date sync
+A span records its duration and, where the handler sets them, the bytes the stage read
+and wrote. Recording is off until enable() is called; until then span() hands out a
+shared no-op span, so instrumented code costs one global lookup per stage.
+
+Counters are per process. A parent aggregating worker processes merges their snapshots:
+    counters = instrument.enable()
+    ...
+    worker_snapshot = instrument.drain()        # in the worker, e.g. per batch
+    counters.merge(worker_snapshot)             # in the parent
+    print(instrument.format_table(counters.snapshot()))
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+STAGES = ("open", "parse", "encode", "copy", "write", "rename", "utime")
+
+FIELDS = ("count", "errors", "seconds", "bytes_read", "bytes_written")
+
+
+class Counters:
+    """Thread-safe totals per stage: count, errors, seconds, bytes_read, bytes_written."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, list] = {}
+
+    def record(self, stage: str, seconds: float, bytes_read: int = 0, bytes_written: int = 0,
+               failed: bool = False):
+        with self._lock:
+            row = self._stages.get(stage)
+            if row is None:
+                row = self._stages[stage] = [0, 0, 0.0, 0, 0]
+            row[0] += 1
+            row[1] += failed
+            row[2] += seconds
+            row[3] += bytes_read
+            row[4] += bytes_written
+
+    def merge(self, snapshot: Optional[Dict[str, Dict[str, float]]]):
+        """Adds another Counters' snapshot (e.g. from a worker process) to these totals."""
+        if not snapshot:
+            return
+        with self._lock:
+            for stage, values in snapshot.items():
+                row = self._stages.setdefault(stage, [0, 0, 0.0, 0, 0])
+                for i, field in enumerate(FIELDS):
+                    row[i] += values.get(field, 0)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Plain-dict copy, JSON- and pickle-friendly, in STAGES order."""
+        with self._lock:
+            return self._snapshot()
+
+    def drain(self) -> Dict[str, Dict[str, float]]:
+        """snapshot() and reset() in one step, so no span is lost in between."""
+        with self._lock:
+            out = self._snapshot()
+            self._stages.clear()
+        return out
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+    def _snapshot(self) -> Dict[str, Dict[str, float]]:
+        order = sorted(self._stages, key=lambda s: (STAGES.index(s) if s in STAGES else len(STAGES), s))
+        return {s: dict(zip(FIELDS, self._stages[s])) for s in order}
+
+
+class Span:
+    """Context manager timing one stage. Set bytes_read / bytes_written inside the block."""
+    __slots__ = ("_counters", "stage", "bytes_read", "bytes_written", "_start")
+
+    def __init__(self, counters: Counters, stage: str):
+        self._counters = counters
+        self.stage = stage
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def __bool__(self) -> bool:
+        return True
+
+    def __enter__(self) -> "Span":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._counters.record(self.stage, time.perf_counter() - self._start,
+                              self.bytes_read, self.bytes_written, exc_type is not None)
+        return False
+
+
+class _NullSpan:
+    """Stands in for Span while recording is off. Falsy, so callers can skip work that
+    only feeds the byte counts (`if s: s.bytes_written = os.path.getsize(...)`)."""
+    __slots__ = ()
+
+    def __bool__(self) -> bool:
+        return False
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL = _NullSpan()
+_active: Optional[Counters] = None
+
+
+def enable(counters: Optional[Counters] = None) -> Counters:
+    """Starts recording into counters (a fresh Counters if None) and returns it."""
+    global _active
+    _active = counters if counters is not None else Counters()
+    return _active
+
+
+def disable():
+    global _active
+    _active = None
+
+
+def active() -> Optional[Counters]:
+    return _active
+
+
+def span(stage: str):
+    counters = _active
+    if counters is None:
+        return _NULL
+    return Span(counters, stage)
+
+
+def drain() -> Optional[Dict[str, Dict[str, float]]]:
+    """The active counters' totals since the last drain, or None while recording is off."""
+    counters = _active
+    return counters.drain() if counters is not None else None
+
+
+def format_table(snapshot: Dict[str, Dict[str, float]]) -> str:
+    """Human-readable summary of a snapshot, one line per stage."""
+    lines = [f"{'stage':<8}{'count':>9}{'errors':>8}{'total ms':>12}{'mean ms':>10}{'read MiB':>11}{'written MiB':>13}"]
+    for stage, v in snapshot.items():
+        count = v["count"] or 1
+        lines.append(f"{stage:<8}{v['count']:>9}{v['errors']:>8}{v['seconds'] * 1000:>12.1f}"
+                     f"{v['seconds'] * 1000 / count:>10.3f}{v['bytes_read'] / 2**20:>11.2f}"
+                     f"{v['bytes_written'] / 2**20:>13.2f}")
+    return "\n".join(lines)
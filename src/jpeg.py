@@ -0,0 +1,92 @@
+"""Marker-level JPEG access. Splices metadata segments without touching the scan data."""
+import struct
+from typing import Optional
+
+from . import scan
+from .scan import APP0, APP1, EOI, EXIF_HEADER, SOI, SOS, XMP_HEADER  # noqa: F401  (re-exported)
+
+COPY_CHUNK = 1024 * 1024
+
+
+def is_jpeg(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(2) == SOI
+    except OSError:
+        return False
+
+
+def is_exif_segment(marker: int, payload) -> bool:
+    return marker == APP1 and bytes(payload[:len(EXIF_HEADER)]) == EXIF_HEADER
+
+
+def read_exif(path: str) -> Optional[bytes]:
+    """Returns the raw Exif APP1 payload (including the 'Exif\\0\\0' header), or None.
+    Only the marker headers and the APP1 segment itself are paged in."""
+    with scan.mapped(path) as buf:
+        blob = scan.exif_payload(buf, scan.scan_jpeg(buf))
+        return bytes(blob) if blob is not None else None
+
+
+def _pack_segment(marker: int, payload: bytes) -> bytes:
+    if len(payload) + 2 > 0xFFFF:
+        raise ValueError(f"Segment too large for a JPEG marker ({len(payload)} bytes)")
+    return bytes((0xFF, marker)) + struct.pack(">H", len(payload) + 2) + payload
+
+
+def write_exif(src_path: str, dst_path: str, exif_bytes: Optional[bytes]) -> int:
+    """Copies src to dst with the Exif APP1 replaced by exif_bytes (None removes it).
+    Other segments and the entropy-coded data after SOS are copied byte for byte
+    straight from the mapping. Returns bytes written."""
+    if exif_bytes is not None and not exif_bytes.startswith(EXIF_HEADER):
+        exif_bytes = EXIF_HEADER + exif_bytes
+    return write_segment(src_path, dst_path, APP1, EXIF_HEADER, exif_bytes)
+
+
+def write_xmp(src_path: str, dst_path: str, packet: Optional[bytes]) -> int:
+    """Same as write_exif for the XMP APP1 segment; packet is the bare XMP packet."""
+    return write_segment(src_path, dst_path, APP1, XMP_HEADER,
+                         XMP_HEADER + packet if packet is not None else None)
+
+
+def write_segment(src_path: str, dst_path: str, marker: int, signature: bytes, payload: Optional[bytes]) -> int:
+    """Copies src to dst with the first APPn segment whose payload starts with signature
+    replaced by payload (None removes it); later duplicates are dropped. A new segment
+    goes after the leading APP0 and Exif APP1 segments. Returns bytes written."""
+    new_segment = _pack_segment(marker, payload) if payload is not None else None
+
+    with scan.mapped(src_path) as buf:
+        layout = scan.scan_jpeg(buf)
+
+        insert_at = None
+        kept = []
+        for segment in layout.segments:
+            if segment.marker == marker and bytes(buf[segment.start:segment.start + len(signature)]) == signature:
+                if insert_at is None:
+                    insert_at = len(kept)
+                continue
+            kept.append(segment)
+        if insert_at is None:
+            # JFIF/JFXX APP0 must come first, and Exif readers expect their APP1 right after it
+            def leading(s: scan.Segment) -> bool:
+                return s.marker == APP0 or is_exif_segment(s.marker, scan.payload(buf, s))
+
+            insert_at = 0
+            while insert_at < len(kept) and leading(kept[insert_at]):
+                insert_at += 1
+
+        pieces = [buf[s.offset:s.start + s.length] for s in kept]  # Marker, length and payload as-is
+        if new_segment is not None:
+            pieces.insert(insert_at, new_segment)
+
+        written = 0
+        with open(dst_path, "wb") as dst:
+            dst.write(SOI)
+            written += len(SOI)
+            for piece in pieces:
+                dst.write(piece)
+                written += len(piece)
+            pieces.clear()  # Views into the mapping must be gone before it closes
+            for pos in range(layout.sos, len(buf), COPY_CHUNK):
+                written += dst.write(buf[pos:pos + COPY_CHUNK])
+    return written
@@ -0,0 +1,752 @@
+"""Box-level ISO base media (MP4/MOV) access. The top level is walked box to box by
+seeking, and only moov is ever read, wherever it sits (before or after mdat), so the
+cost of a read doesn't grow with the media.
+
+Tags are the iTunes-style items in moov/udta/meta/ilst. Writes keep the moov size when
+the new ilst fits in the old one plus its free padding (the free box following ilst in
+meta, and a top-level free right after moov): only those bytes are overwritten. When
+moov has to grow it is rewritten with fresh padding; if media data follows it, the rest
+of the file moves and every stco/co64 chunk offset is relocated by the same amount.
+Other udta boxes (QuickTime's XMP_) and top-level uuid boxes are replaced the same way.
+"""
+import datetime
+import os
+import struct
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from mutagen.id3 import TCON
+
+from . import instrument, sniff
+
+COPY_CHUNK = 1024 * 1024
+
+# Boxes holding only other boxes, on the way to what is read or patched
+CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl", b"edts", b"dinf", b"udta", b"mvex"}
+
+# mvhd/tkhd/mdhd times count seconds from 1904-01-01 UTC
+EPOCH = datetime.datetime(1904, 1, 1, tzinfo=datetime.timezone.utc)
+
+# Item atom -> how its data is typed, as mutagen's MP4Tags parses them (keys match its view)
+PAIRS = {b"trkn", b"disk"}
+BOOLS = {b"cpil", b"pgap", b"pcst"}
+INTEGERS = {
+    b"plID": 8, b"cnID": 4, b"geID": 4, b"atID": 4, b"sfID": 4, b"cmID": 4, b"akID": 1,
+    b"tvsn": 4, b"tves": 4, b"tmpo": 2, b"\xa9mvi": 2, b"\xa9mvc": 2, b"shwm": 1, b"stik": 1,
+    b"hdvd": 1, b"rtng": 1,
+}
+TEXTS = {
+    b"\xa9nam", b"\xa9alb", b"\xa9ART", b"aART", b"\xa9wrt", b"\xa9day", b"\xa9cmt", b"desc", b"purd",
+    b"\xa9grp", b"\xa9gen", b"\xa9lyr", b"catg", b"keyw", b"\xa9too", b"cprt", b"soal", b"soaa", b"soar",
+    b"sonm", b"soco", b"sosn", b"tvsh", b"purl", b"egid",
+}
+FREEFORM = b"----"
+
+# data atom type indicators
+IMPLICIT = 0
+UTF8 = 1
+INTEGER = 21
+
+
+class Box(NamedTuple):
+    type: bytes
+    offset: int  # Of the box header
+    start: int   # Of the payload (after the size/type and any 64-bit size)
+    end: int     # One past the last payload byte
+
+    @property
+    def size(self) -> int:
+        return self.end - self.start
+
+
+class Track(NamedTuple):
+    id: int
+    kind: str      # hdlr handler type: "vide", "soun", "text", "meta"...
+    codec: str     # Format of the first sample description ("avc1", "mp4a"...)
+    duration: float  # Seconds, from mdhd
+    width: int
+    height: int
+    language: str  # ISO 639-2/T code, "" for QuickTime's Macintosh codes
+
+
+class Audio(NamedTuple):
+    """Stream info of the first sound track, as mutagen's MP4Info reports it."""
+    length: float
+    channels: int
+    bits_per_sample: int
+    sample_rate: int
+    bitrate: int
+
+
+class Item(NamedTuple):
+    name: bytes          # Item atom type
+    key: Optional[str]   # mutagen-style key; None when the data isn't in a form we model
+    value: Any           # List of values, or a single bool for cpil/pgap/pcst
+    raw: bytes           # The whole item box, written back verbatim when unchanged
+
+
+class Movie(NamedTuple):
+    moov: Box
+    created: Optional[datetime.datetime]
+    modified: Optional[datetime.datetime]
+    duration: Optional[float]  # Seconds, from mvhd
+    tracks: List[Track]
+    audio: Optional[Audio]
+    udta: Dict[str, str]  # QuickTime text entries directly in udta (©day, ©xyz, ©mak...)
+    items: List[Item]     # moov/udta/meta/ilst, in file order
+    has_ilst: bool
+
+    @property
+    def tags(self) -> Dict[str, Any]:
+        """Item values by key, merged the way mutagen merges repeated atoms."""
+        out = {}
+        for item in self.items:
+            if item.key is None:
+                continue
+            if isinstance(item.value, list):
+                out.setdefault(item.key, []).extend(item.value)
+            else:
+                out[item.key] = item.value
+        return out
+
+
+class WriteStats(NamedTuple):
+    in_place: bool      # Only the moov region was rewritten; nothing after it moved
+    bytes_written: int
+    padding: int        # Free bytes left in meta after the write
+
+
+# --- Box walking ----------------------------------------------------------
+
+def iter_boxes(f: BinaryIO, start: int = 0, end: Optional[int] = None) -> Iterator[Box]:
+    """Yields the boxes between start and end (EOF when None), reading only their headers."""
+    if end is None:
+        f.seek(0, 2)
+        end = f.tell()
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, btype = struct.unpack(">I4s", header)
+        body = pos + 8
+        if size == 1:  # 64-bit size follows the type
+            large = f.read(8)
+            if len(large) < 8:
+                return
+            size = struct.unpack(">Q", large)[0]
+            body += 8
+        elif size == 0:  # Box runs to the end of its parent
+            size = end - pos
+        if size < body - pos or pos + size > end:
+            raise ValueError(f"Bad {btype!r} box size at offset {pos}")
+        yield Box(btype, pos, body, pos + size)
+        pos += size
+
+
+def find_uuid(f: BinaryIO, uuid: bytes) -> Optional[Box]:
+    """First top-level uuid box with this 16-byte user type, or None."""
+    for box in iter_boxes(f):
+        if box.type == b"uuid" and box.size >= 16:
+            f.seek(box.start)
+            if f.read(16) == uuid:
+                return box
+    return None
+
+
+def find(f: BinaryIO, path: bytes, start: int = 0, end: Optional[int] = None) -> Optional[Box]:
+    """First box along a slash-separated type path (b"moov/udta"), or None."""
+    box = None
+    for btype in path.split(b"/"):
+        box = next((b for b in iter_boxes(f, start, end) if b.type == btype), None)
+        if box is None:
+            return None
+        start, end = box.start, box.end
+    return box
+
+
+def children(buf: bytes, start: int, end: int) -> Iterator[Box]:
+    """iter_boxes over bytes in memory; offsets are into buf."""
+    pos = start
+    while pos + 8 <= end:
+        size, btype = struct.unpack_from(">I4s", buf, pos)
+        body = pos + 8
+        if size == 1:
+            if pos + 16 > end:
+                raise ValueError(f"Truncated {btype!r} box at offset {pos}")
+            size = struct.unpack_from(">Q", buf, body)[0]
+            body += 8
+        elif size == 0:
+            size = end - pos
+        if size < body - pos or pos + size > end:
+            raise ValueError(f"Bad {btype!r} box size at offset {pos}")
+        yield Box(btype, pos, body, pos + size)
+        pos += size
+
+
+def _child(buf: bytes, parent: Box, btype: bytes) -> Optional[Box]:
+    return next((b for b in children(buf, parent.start, parent.end) if b.type == btype), None)
+
+
+def _path(buf: bytes, parent: Box, *types: bytes) -> Optional[Box]:
+    box = parent
+    for btype in types:
+        box = _child(buf, box, btype)
+        if box is None:
+            return None
+    return box
+
+
+def _content_end(buf: bytes, start: int, end: int) -> int:
+    """End of the last child box: QuickTime udta may close with a 32-bit zero terminator."""
+    last = None
+    for last in children(buf, start, end):
+        pass
+    return last.end if last is not None else start
+
+
+def _meta_start(buf: bytes, meta: Box) -> int:
+    """Where meta's children begin: it is a full box in ISO files, a plain one in some QuickTime files."""
+    return meta.start if buf[meta.start + 4:meta.start + 8] == b"hdlr" else meta.start + 4
+
+
+def pack_box(btype: bytes, payload: bytes) -> bytes:
+    if len(payload) + 8 > 0xFFFFFFFF:
+        return struct.pack(">I4sQ", 1, btype, len(payload) + 16) + payload
+    return struct.pack(">I4s", len(payload) + 8, btype) + payload
+
+
+def _moov(f: BinaryIO) -> Tuple[Box, List[Box]]:
+    """The moov box and the whole top-level box list (headers only)."""
+    top = list(iter_boxes(f))
+    moov = next((b for b in top if b.type == b"moov"), None)
+    if moov is None:
+        raise ValueError("No moov box (not an MP4/MOV file, or a fragment)")
+    return moov, top
+
+
+# --- Reading --------------------------------------------------------------
+
+def _time(seconds: int) -> Optional[datetime.datetime]:
+    if not seconds:
+        return None
+    try:
+        return EPOCH + datetime.timedelta(seconds=seconds)
+    except OverflowError:
+        return None
+
+
+def _language(code: int) -> str:
+    if code < 0x400:
+        return ""
+    return "".join(chr(((code >> shift) & 0x1F) + 0x60) for shift in (10, 5, 0))
+
+
+def _track(buf: bytes, trak: Box) -> Tuple[Track, Optional[Box]]:
+    """(track, its stsd box) from the trak's tkhd, mdhd, hdlr and stsd."""
+    track_id = width = height = 0
+    duration = 0.0
+    language = kind = codec = ""
+    tkhd = _child(buf, trak, b"tkhd")
+    if tkhd is not None:
+        v1 = buf[tkhd.start] == 1
+        track_id = struct.unpack_from(">I", buf, tkhd.start + (20 if v1 else 12))[0]
+        size = tkhd.start + (88 if v1 else 76)
+        if size + 8 <= tkhd.end:
+            width, height = (n >> 16 for n in struct.unpack_from(">II", buf, size))
+    mdhd = _path(buf, trak, b"mdia", b"mdhd")
+    if mdhd is not None:
+        v1 = buf[mdhd.start] == 1
+        timescale, length = struct.unpack_from(">IQ" if v1 else ">II", buf, mdhd.start + (20 if v1 else 12))
+        language = _language(struct.unpack_from(">H", buf, mdhd.start + (32 if v1 else 20))[0])
+        duration = length / timescale if timescale else 0.0
+    hdlr = _path(buf, trak, b"mdia", b"hdlr")
+    if hdlr is not None:
+        kind = buf[hdlr.start + 8:hdlr.start + 12].decode("latin-1")
+    stsd = _path(buf, trak, b"mdia", b"minf", b"stbl", b"stsd")
+    if stsd is not None and stsd.size >= 16:
+        codec = buf[stsd.start + 12:stsd.start + 16].decode("latin-1")
+    return Track(track_id, kind, codec, duration, width, height, language), stsd
+
+
+def _descriptor(buf: bytes, pos: int) -> Tuple[int, int, int]:
+    """(tag, payload start, payload end) of an MPEG-4 descriptor with a 7-bit varint size."""
+    tag = buf[pos]
+    size = 0
+    pos += 1
+    for _ in range(4):
+        b = buf[pos]
+        pos += 1
+        size = size << 7 | b & 0x7F
+        if not b & 0x80:
+            break
+    return tag, pos, pos + size
+
+
+def _esds_bitrate(buf: bytes, esds: Box) -> int:
+    """avgBitrate from the DecoderConfigDescriptor inside an ES_Descriptor."""
+    tag, pos, _ = _descriptor(buf, esds.start + 4)
+    if tag != 0x03:
+        raise ValueError("esds without an ES_Descriptor")
+    flags = buf[pos + 2]
+    pos += 3
+    if flags & 0x80:
+        pos += 2
+    if flags & 0x40:
+        pos += 1 + buf[pos]
+    if flags & 0x20:
+        pos += 2
+    tag, pos, _ = _descriptor(buf, pos)
+    if tag != 0x04:
+        raise ValueError("ES_Descriptor without a DecoderConfigDescriptor")
+    return struct.unpack_from(">I", buf, pos + 9)[0]
+
+
+def _audio(buf: bytes, duration: float, stsd: Optional[Box]) -> Audio:
+    """mutagen's AudioSampleEntry view of the first sample description."""
+    channels = bits_per_sample = sample_rate = bitrate = 0
+    if stsd is not None and struct.unpack_from(">I", buf, stsd.start + 4)[0]:
+        entry = next(children(buf, stsd.start + 8, stsd.end))
+        if entry.size < 28 or struct.unpack_from(">H", buf, entry.start + 8)[0] != 0:
+            raise ValueError("Unsupported sound description version")
+        channels, bits_per_sample = struct.unpack_from(">HH", buf, entry.start + 16)
+        sample_rate = struct.unpack_from(">I", buf, entry.start + 24)[0] >> 16
+        extra = next(children(buf, entry.start + 28, entry.end), None)
+        if extra is None:
+            raise ValueError("Sound description without a codec box")
+        if entry.type == b"mp4a" and extra.type == b"esds":
+            bitrate = _esds_bitrate(buf, extra)
+        elif entry.type == b"alac" and extra.type == b"alac":
+            cookie = extra.start + 4
+            if buf[cookie + 4] == 0:  # compatibleVersion
+                bits_per_sample, channels = buf[cookie + 5], buf[cookie + 9]
+                bitrate, sample_rate = struct.unpack_from(">II", buf, cookie + 16)
+        elif entry.type == b"ac-3" and extra.type == b"dac3":
+            bits = int.from_bytes(buf[extra.start:extra.start + 3], "big")
+            acmod, lfeon, rate_code = bits >> 11 & 7, bits >> 10 & 1, bits >> 5 & 0x1F
+            channels = [2, 1, 2, 3, 3, 4, 4, 5][acmod] + lfeon
+            rates = [32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384, 448, 512, 576, 640]
+            if rate_code < len(rates):
+                bitrate = rates[rate_code] * 1000
+    return Audio(duration, channels, bits_per_sample, sample_rate, bitrate)
+
+
+def _data_atoms(buf: bytes, start: int, end: int) -> Iterator[Tuple[int, int, bytes]]:
+    """(version, type indicator, value) for each data atom of an item."""
+    for box in children(buf, start, end):
+        if box.type != b"data" or box.size < 8:
+            raise ValueError(f"Unexpected {box.type!r} atom in an item")
+        yield buf[box.start], int.from_bytes(buf[box.start + 1:box.start + 4], "big"), buf[box.start + 8:box.end]
+
+
+def _item_value(name: bytes, buf: bytes, box: Box) -> Tuple[str, Any]:
+    """(key, value) of one ilst item the way mutagen parses it; ValueError when it doesn't."""
+    key = name.decode("latin-1")
+    if name == FREEFORM:
+        mean, name_box = list(children(buf, box.start, box.end))[:2]
+        key = "----:" + (buf[mean.start + 4:mean.end] + b":" + buf[name_box.start + 4:name_box.end]).decode("latin-1")
+        return key, [value for _, _, value in _data_atoms(buf, name_box.end, box.end)]
+    if name == b"covr":
+        values = []
+        for b in children(buf, box.start, box.end):
+            if b.type == b"name":
+                continue
+            if b.type != b"data" or b.size < 8:
+                raise ValueError("Unexpected atom in covr")
+            values.append(buf[b.start + 8:b.end])
+        return key, values
+    atoms = list(_data_atoms(buf, box.start, box.end))
+    if name in PAIRS:
+        if any(len(value) < 6 for _, _, value in atoms):
+            raise ValueError("Short track/disc pair")
+        return key, [struct.unpack(">2H", value[2:6]) for _, _, value in atoms]
+    if name == b"gnre":
+        if any(len(value) != 2 for _, _, value in atoms):
+            raise ValueError("Invalid genre")
+        return "\xa9gen", [TCON.GENRES[struct.unpack(">h", value)[0] - 1] for _, _, value in atoms]
+    if name in INTEGERS:
+        values = []
+        for version, flags, value in atoms:
+            if version != 0 or flags not in (IMPLICIT, INTEGER) or len(value) not in (1, 2, 3, 4, 8):
+                raise ValueError("Unsupported integer")
+            values.append(int.from_bytes(value + (b"\x00" if len(value) == 3 else b""), "big", signed=True)
+                          >> (8 if len(value) == 3 else 0))
+        return key, values
+    if name in BOOLS:
+        if any(len(value) != 1 for _, _, value in atoms):
+            raise ValueError("Invalid bool")
+        return key, bool(atoms[-1][2][0]) if atoms else None
+    allowed = (IMPLICIT, UTF8) if name in TEXTS else (UTF8,)  # Unknown atoms only count as text if typed so
+    if any(flags not in allowed for _, flags, _ in atoms):
+        raise ValueError("Not text")
+    return key, [value.decode("utf-8") for _, _, value in atoms]
+
+
+def parse_items(buf: bytes, start: int, end: int) -> List[Item]:
+    items = []
+    for box in children(buf, start, end):
+        try:
+            key, value = _item_value(box.type, buf, box)
+            if value is None:
+                key = None
+        except (ValueError, IndexError, StopIteration, struct.error, UnicodeDecodeError):
+            key, value = None, None  # Kept as-is on writes, like mutagen's failed atoms
+        items.append(Item(box.type, key, value, bytes(buf[box.offset:box.end])))
+    return items
+
+
+def _udta_text(buf: bytes, udta: Box) -> Dict[str, str]:
+    """QuickTime user data text entries: (16-bit size, 16-bit language, text) strings."""
+    out = {}
+    for box in children(buf, udta.start, udta.end):
+        if box.type[0] != 0xA9 or box.size < 4:
+            continue
+        size = struct.unpack_from(">H", buf, box.start)[0]
+        if 4 + size > box.size:
+            continue
+        text = buf[box.start + 4:box.start + 4 + size]
+        try:
+            out[box.type.decode("latin-1")] = text.decode("utf-8")
+        except UnicodeDecodeError:
+            out[box.type.decode("latin-1")] = text.decode("mac_roman")
+    return out
+
+
+def parse_moov(buf: bytes, moov: Box) -> Movie:
+    """Movie view of a moov payload held in buf (whose offset 0 is moov.start in the file)."""
+    root = Box(b"moov", 0, 0, len(buf))
+    created = modified = duration = None
+    mvhd = _child(buf, root, b"mvhd")
+    if mvhd is not None:
+        v1 = buf[mvhd.start] == 1
+        c, m, timescale, length = struct.unpack_from(">QQIQ" if v1 else ">IIII", buf, mvhd.start + 4)
+        created, modified = _time(c), _time(m)
+        duration = length / timescale if timescale else 0.0
+
+    tracks = []
+    audio = None
+    for trak in children(buf, 0, len(buf)):
+        if trak.type != b"trak":
+            continue
+        track, stsd = _track(buf, trak)
+        tracks.append(track)
+        if audio is None and track.kind == "soun":
+            audio = _audio(buf, track.duration, stsd)
+
+    udta = _child(buf, root, b"udta")
+    ilst = None
+    if udta is not None:
+        meta = _child(buf, udta, b"meta")
+        if meta is not None:
+            ilst = next((b for b in children(buf, _meta_start(buf, meta), meta.end) if b.type == b"ilst"), None)
+    items = parse_items(buf, ilst.start, ilst.end) if ilst is not None else []
+    return Movie(moov, created, modified, duration, tracks, audio,
+                 _udta_text(buf, udta) if udta is not None else {}, items, ilst is not None)
+
+
+def read_movie(path: str, prefix: bytes = b"") -> Movie:
+    """Seeks to moov (wherever it is) and reads nothing else. Box headers (and a moov that
+    starts the file) inside prefix, the sniffed first bytes of the file, need no reads."""
+    with open(path, "rb") as raw:
+        f = sniff.PrefixedFile(raw, prefix) if prefix else raw
+        moov = next((b for b in iter_boxes(f) if b.type == b"moov"), None)
+        if moov is None:
+            raise ValueError("No moov box (not an MP4/MOV file, or a fragment)")
+        f.seek(moov.start)
+        buf = f.read(moov.size)
+    if len(buf) < moov.size:
+        raise ValueError("Truncated moov box")
+    return parse_moov(buf, moov)
+
+
+# --- Writing --------------------------------------------------------------
+
+def _data(flags: int, value: bytes) -> bytes:
+    return pack_box(b"data", struct.pack(">2I", flags, 0) + value)
+
+
+def render_item(key: str, text: str) -> bytes:
+    """An ilst item box for an editor value. Types follow the atom, as mutagen renders them;
+    cover art can't be set from text (ValueError)."""
+    if key.startswith("----:"):
+        _, mean, name = key.split(":", 2)
+        return pack_box(FREEFORM, pack_box(b"mean", b"\x00" * 4 + mean.encode("latin-1"))
+                        + pack_box(b"name", b"\x00" * 4 + name.encode("latin-1"))
+                        + _data(UTF8, text.encode("utf-8")))
+    name = key.encode("latin-1")
+    if len(name) != 4:
+        raise ValueError(f"{key!r} is not an MP4 item atom")
+    if name == b"covr":
+        raise ValueError("Cover art can't be set from text")
+    if name in PAIRS:
+        numbers = [int(n) for n in text.strip("() ").replace("/", ",").split(",") if n.strip()]
+        if not 1 <= len(numbers) <= 2:
+            raise ValueError(f"{text!r} is not a number pair")
+        number, total = numbers[0], numbers[1] if len(numbers) > 1 else 0
+        value = struct.pack(">4H", 0, number, total, 0) if name == b"trkn" else struct.pack(">3H", 0, number, total)
+        return pack_box(name, _data(IMPLICIT, value))
+    if name in INTEGERS:
+        size = INTEGERS[name]
+        return pack_box(name, _data(INTEGER, int(text).to_bytes(size, "big", signed=True)))
+    if name in BOOLS:
+        return pack_box(name, _data(INTEGER, b"\x01" if text.strip().lower() in ("true", "1", "yes") else b"\x00"))
+    return pack_box(name, _data(UTF8, text.encode("utf-8")))
+
+
+def _relocate(buf: bytearray, start: int, end: int, after: int, delta: int):
+    """Adds delta to every stco/co64 chunk offset at or past `after`, throughout the tree."""
+    for box in children(buf, start, end):
+        if box.type in CONTAINERS:
+            _relocate(buf, box.start, box.end, after, delta)
+        elif box.type in (b"stco", b"co64"):
+            wide = box.type == b"co64"
+            fmt = ">Q" if wide else ">I"
+            step = 8 if wide else 4
+            count = struct.unpack_from(">I", buf, box.start + 4)[0]
+            pos = box.start + 8
+            if pos + count * step > box.end:
+                raise ValueError(f"Truncated {box.type.decode()} box")
+            for pos in range(pos, pos + count * step, step):
+                offset = struct.unpack_from(fmt, buf, pos)[0]
+                if offset >= after:
+                    offset += delta
+                    if not wide and offset > 0xFFFFFFFF:
+                        raise ValueError("Chunk offsets would overflow stco (needs co64)")
+                    struct.pack_into(fmt, buf, pos, offset)
+
+
+def _fit(assemble: Callable[[int], bytes], room: Optional[int], padding: int) -> Tuple[bytes, int]:
+    """(assemble(free), free). With room set, free is sized so the result is exactly room
+    bytes (ValueError if it can't be); else it is padding (0, or at least a bare free box)."""
+    if room is None:
+        free = max(padding, 8) if padding else 0
+        return assemble(free), free
+    bare = assemble(0)
+    free = room - len(bare)
+    if free != 0 and free < 8:
+        raise ValueError("New data doesn't fit the free space")
+    payload = assemble(free)
+    if len(payload) != room:  # A container crossed the 32-bit size boundary
+        raise ValueError("New data doesn't fit the free space")
+    return payload, free
+
+
+def _free(size: int) -> bytes:
+    return pack_box(b"free", b"\x00" * (size - 8)) if size else b""
+
+
+def _rebuild(buf: bytes, ilst: bytes, room: Optional[int], padding: int) -> Tuple[bytes, int]:
+    """(new moov payload, free bytes left in meta). With room set, meta's padding is sized so
+    the payload is exactly room bytes (ValueError if it can't be); else it gets padding bytes."""
+    root = Box(b"moov", 0, 0, len(buf))
+    udta = _child(buf, root, b"udta")
+    meta = _child(buf, udta, b"meta") if udta is not None else None
+    old_ilst = old_free = None
+    if meta is not None:
+        kids = list(children(buf, _meta_start(buf, meta), meta.end))
+        for i, box in enumerate(kids):
+            if box.type == b"ilst":
+                old_ilst = box
+                if i + 1 < len(kids) and kids[i + 1].type == b"free":
+                    old_free = kids[i + 1]
+                break
+
+    def assemble(free: int) -> bytes:
+        body = ilst + _free(free)
+        if meta is None:
+            hdlr = pack_box(b"hdlr", b"\x00" * 8 + b"mdirappl" + b"\x00" * 9)
+            new_meta = pack_box(b"meta", b"\x00" * 4 + hdlr + body)
+        else:
+            if old_ilst is not None:
+                cut_start, cut_end = old_ilst.offset, (old_free or old_ilst).end
+            else:
+                cut_start = cut_end = _content_end(buf, _meta_start(buf, meta), meta.end)
+            new_meta = pack_box(b"meta", buf[meta.start:cut_start] + body + buf[cut_end:meta.end])
+        if udta is None:
+            return bytes(buf) + pack_box(b"udta", new_meta)
+        end = _content_end(buf, udta.start, udta.end)
+        old = meta or Box(b"meta", end, end, end)
+        new_udta = pack_box(b"udta", buf[udta.start:old.offset] + new_meta + buf[old.end:udta.end])
+        return buf[:udta.offset] + new_udta + buf[udta.end:]
+
+    return _fit(assemble, room, padding)
+
+
+def _rebuild_udta(buf: bytes, btype: bytes, data: bytes, room: Optional[int]) -> Tuple[bytes, int]:
+    """(new moov payload, free bytes left) with udta's btype box holding data, placed like
+    ilst in _rebuild: a free box right after the old one is reused, a new one goes last."""
+    root = Box(b"moov", 0, 0, len(buf))
+    udta = _child(buf, root, b"udta")
+    old = old_free = None
+    if udta is not None:
+        kids = list(children(buf, udta.start, udta.end))
+        for i, box in enumerate(kids):
+            if box.type == btype:
+                old = box
+                if i + 1 < len(kids) and kids[i + 1].type == b"free":
+                    old_free = kids[i + 1]
+                break
+
+    def assemble(free: int) -> bytes:
+        body = pack_box(btype, data) + _free(free)
+        if udta is None:
+            return bytes(buf) + pack_box(b"udta", body)
+        if old is not None:
+            cut_start, cut_end = old.offset, (old_free or old).end
+        else:
+            cut_start = cut_end = _content_end(buf, udta.start, udta.end)
+        new_udta = pack_box(b"udta", buf[udta.start:cut_start] + body + buf[cut_end:udta.end])
+        return buf[:udta.offset] + new_udta + buf[udta.end:]
+
+    return _fit(assemble, room, 0)  # The caller's data carries its own padding
+
+
+def write_items(path: str, items: List[bytes], padding: int = 4096) -> WriteStats:
+    """Replaces moov/udta/meta/ilst with the given item boxes, creating udta/meta/ilst
+    if needed. Fits into existing free space when it can; otherwise moov grows by the new
+    size plus `padding`, and media after moov moves with its chunk offsets relocated."""
+    ilst = pack_box(b"ilst", b"".join(items))
+    return _write_moov(path, lambda buf, room: _rebuild(buf, ilst, room, padding))
+
+
+def write_udta(path: str, btype: bytes, data: bytes) -> WriteStats:
+    """Replaces (or adds) the moov/udta box of this type, moving moov the way write_items does."""
+    return _write_moov(path, lambda buf, room: _rebuild_udta(buf, btype, data, room))
+
+
+def _write_moov(path: str, rebuild: Callable[[bytes, Optional[int]], Tuple[bytes, int]]) -> WriteStats:
+    """Writes the moov payload rebuild(old payload, room) returns: room is the size to fit
+    exactly (the old moov, then moov plus a following free), or None to grow."""
+    with open(path, "rb") as f:
+        moov, top = _moov(f)
+        f.seek(moov.start)
+        buf = f.read(moov.size)
+        if len(buf) < moov.size:
+            raise ValueError("Truncated moov box")
+    index = top.index(moov)
+    header = moov.start - moov.offset
+    following = top[index + 1:]
+    slack = following[0] if following and following[0].type == b"free" else None
+
+    with instrument.span("encode") as s:
+        payload = region_end = free = None
+        for region in ([moov] + ([slack] if slack else [])):
+            region_end = region.end
+            try:
+                payload, free = rebuild(buf, region_end - moov.offset - header)
+                break
+            except ValueError:
+                continue
+        in_place = payload is not None
+        if not in_place:
+            payload, free = rebuild(buf, None)
+            region_end = slack.end if slack else moov.end
+        new_moov = bytearray(pack_box(b"moov", payload) if header == 8 else
+                             struct.pack(">I4sQ", 1, b"moov", len(payload) + 16) + payload)
+        delta = len(new_moov) - (region_end - moov.offset)
+        tail = [b for b in top if b.offset >= region_end]
+        moves_media = delta != 0 and any(b.type not in (b"free", b"skip") for b in tail)
+        if moves_media:
+            if any(b.type in (b"moof", b"mfra", b"sidx") for b in tail):
+                raise ValueError("Fragmented file: moov can't grow without rewriting fragment offsets")
+            h = len(new_moov) - len(payload)
+            _relocate(new_moov, h, len(new_moov), region_end, delta)
+        s.bytes_written = len(new_moov)
+
+    with instrument.span("write") as s:
+        if not moves_media:
+            # Same size, or moov is last: only the moov region is rewritten
+            with open(path, "r+b") as f:
+                f.seek(moov.offset)
+                f.write(new_moov)
+                if delta:
+                    f.truncate()  # Only free/skip boxes followed moov
+            s.bytes_written = len(new_moov)
+            return WriteStats(True, len(new_moov), free)
+        written = s.bytes_written = _shift(path, [(moov.offset, region_end, bytes(new_moov))])
+    return WriteStats(False, written, free)
+
+
+def write_uuid(path: str, uuid: bytes, data: bytes) -> WriteStats:
+    """Replaces the top-level uuid box with this user type, or appends one at the end of
+    the file. The old box and any free boxes right after it are overwritten when the new
+    one fits (the rest becomes a free box); otherwise the file after it moves and chunk
+    offsets past it are relocated in moov."""
+    new = pack_box(b"uuid", uuid + data)
+    with open(path, "rb") as f:
+        moov, top = _moov(f)
+        old = find_uuid(f, uuid)
+        f.seek(top[-1].offset)
+        open_ended = struct.unpack(">I", f.read(4))[0] == 0  # Last box runs to EOF
+        if old is not None:
+            f.seek(moov.offset)
+            buf = bytearray(f.read(moov.end - moov.offset))
+
+    if old is None:
+        last = top[-1]
+        if open_ended and last.size > 0xFFFFFFFF:
+            raise ValueError(f"Last {last.type.decode('latin-1')} box runs to EOF and is too large to close")
+        with instrument.span("write") as s, open(path, "r+b") as f:
+            if open_ended:  # Give it an explicit size, else it would swallow the new box
+                f.seek(last.offset)
+                f.write(struct.pack(">I", last.size))
+            f.seek(last.end)
+            f.write(new)
+            f.truncate()
+            s.bytes_written = len(new)
+        return WriteStats(True, len(new), 0)
+
+    index = top.index(old)
+    region_end = old.end
+    for box in top[index + 1:]:
+        if box.type != b"free":
+            break
+        region_end = box.end
+    room = region_end - old.offset
+    tail = top[index + 1:]
+    slack = room - len(new)
+    if slack == 0 or slack >= 8 or all(b.type in (b"free", b"skip") for b in tail):
+        with instrument.span("write") as s, open(path, "r+b") as f:
+            f.seek(old.offset)
+            if slack >= 8 or slack == 0:
+                f.write(new + _free(slack))
+            else:  # Only free space follows: the file ends with the new box
+                f.write(new)
+                f.truncate()
+                slack = 0
+            s.bytes_written = len(new)
+        return WriteStats(True, len(new), slack)
+
+    if any(b.type in (b"moof", b"mfra", b"sidx") for b in tail):
+        raise ValueError("Fragmented file: boxes after the uuid box can't move")
+    delta = len(new) - room
+    with instrument.span("encode"):
+        _relocate(buf, moov.start - moov.offset, len(buf), region_end, delta)
+    with instrument.span("write") as s:
+        written = s.bytes_written = _shift(path, [(old.offset, region_end, new), (moov.offset, moov.end, bytes(buf))])
+    return WriteStats(False, written, 0)
+
+
+def _shift(path: str, edits: List[Tuple[int, int, bytes]]) -> int:
+    """Rewrites path with each (start, end, data) range [start, end) replaced by data,
+    through a temp file. Ranges must not overlap."""
+    temp_path = path + ".tmp"
+    written = 0
+    try:
+        with open(path, "rb") as src, open(temp_path, "wb") as dst:
+            pos = 0
+            for start, end, data in sorted(edits, key=lambda e: e[0]) + [(None, None, b"")]:
+                src.seek(pos)
+                while start is None or src.tell() < start:
+                    chunk = src.read(COPY_CHUNK if start is None else min(COPY_CHUNK, start - src.tell()))
+                    if not chunk:
+                        break
+                    written += dst.write(chunk)
+                written += dst.write(data)
+                pos = end
+    except:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, path)
+    return written
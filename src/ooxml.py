@@ -0,0 +1,445 @@
+"""Direct access to OOXML (DOCX/XLSX) document properties.
+
+Only the ZIP central directory and the docProps parts are read; the document body
+(word/*, xl/worksheets/*) is never opened. Writes regenerate the docProps XML and
+stream-copy every other member's compressed bytes as-is, through a small record
+writer (zipfile can read raw member offsets but has no public raw-copy path).
+"""
+import copy
+import datetime
+import os
+import struct
+import zipfile
+import zlib
+from typing import Dict, Optional, Tuple
+from xml.etree import ElementTree as ET
+
+from . import instrument
+
+CORE_PART = "docProps/core.xml"
+APP_PART = "docProps/app.xml"
+CUSTOM_PART = "docProps/custom.xml"
+
+NS = {
+    "cp": "http://schemas.openxmlformats.org/package/2006/metadata/core-properties",
+    "dc": "http://purl.org/dc/elements/1.1/",
+    "dcterms": "http://purl.org/dc/terms/",
+    "xsi": "http://www.w3.org/2001/XMLSchema-instance",
+    "ep": "http://schemas.openxmlformats.org/officeDocument/2006/extended-properties",
+    "cup": "http://schemas.openxmlformats.org/officeDocument/2006/custom-properties",
+    "vt": "http://schemas.openxmlformats.org/officeDocument/2006/docPropsVTypes",
+}
+
+# core.xml element -> (python-docx attribute, openpyxl attribute)
+CORE_FIELDS = {
+    "dc:title": ("title", "title"),
+    "dc:subject": ("subject", "subject"),
+    "dc:creator": ("author", "creator"),
+    "cp:keywords": ("keywords", "keywords"),
+    "dc:description": ("comments", "description"),
+    "cp:lastModifiedBy": ("last_modified_by", "lastModifiedBy"),
+    "cp:revision": ("revision", "revision"),
+    "dcterms:created": ("created", "created"),
+    "dcterms:modified": ("modified", "modified"),
+    "cp:lastPrinted": ("last_printed", "lastPrinted"),
+    "cp:category": ("category", "category"),
+    "cp:contentStatus": ("content_status", "contentStatus"),
+    "dc:identifier": ("identifier", "identifier"),
+    "dc:language": ("language", "language"),
+    "cp:version": ("version", "version"),
+}
+
+
+def clark(qname: str) -> str:
+    """'dc:title' -> '{http://purl.org/dc/elements/1.1/}title' (ElementTree's tag form)."""
+    prefix, local = qname.split(":")
+    return f"{{{NS[prefix]}}}{local}"
+
+
+DATE_TAGS = {clark(q) for q in ("dcterms:created", "dcterms:modified", "cp:lastPrinted")}
+
+# Editor key names per handler: {clark name: key}
+DOCX_NAMES = {clark(q): docx for q, (docx, _) in CORE_FIELDS.items()}
+XLSX_NAMES = {clark(q): xlsx for q, (_, xlsx) in CORE_FIELDS.items()}
+
+APP_PREFIX = "App:"
+CUSTOM_PREFIX = "Custom:"
+
+DISPLAY_DATE = "%Y-%m-%d %H:%M:%S"
+
+
+def w3cdtf_to_display(text: str) -> str:
+    """'2013-12-23T23:15:00Z' -> '2013-12-23 23:15:00' (the format the editor has always shown)."""
+    for fmt in ("%Y-%m-%dT%H:%M:%SZ", "%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.datetime.strptime(text, fmt).strftime(DISPLAY_DATE)
+        except ValueError:
+            continue
+    return text
+
+
+def _read_part(zf: zipfile.ZipFile, name: str) -> Optional[ET.Element]:
+    try:
+        raw = zf.read(name)
+    except KeyError:
+        return None
+    return ET.fromstring(raw)
+
+
+def read_properties(path: str, names: Dict[str, str]) -> Dict[str, str]:
+    """Reads core, app and custom properties. `names` maps core elements to editor keys
+    (DOCX_NAMES or XLSX_NAMES); app and custom properties get 'App:'/'Custom:' prefixes."""
+    with zipfile.ZipFile(path) as zf:
+        return _properties(_read_part(zf, CORE_PART), _read_part(zf, APP_PART), _read_part(zf, CUSTOM_PART), names)
+
+
+def _properties(core: Optional[ET.Element], app: Optional[ET.Element], custom: Optional[ET.Element],
+                names: Dict[str, str]) -> Dict[str, str]:
+    data = {}
+    if core is not None:
+        for el in core:
+            key = names.get(el.tag)
+            text = (el.text or "").strip()
+            if key and text:
+                if el.tag in DATE_TAGS:
+                    text = w3cdtf_to_display(text)
+                data[key] = text
+
+    if app is not None:
+        for el in app:
+            # Vector-valued entries (HeadingPairs, TitlesOfParts) are layout bookkeeping
+            if len(el) or not (el.text or "").strip():
+                continue
+            data[APP_PREFIX + el.tag.rsplit("}", 1)[-1]] = el.text.strip()
+
+    if custom is not None:
+        for prop in custom.findall("cup:property", NS):
+            name = prop.get("name")
+            value = prop[0].text if len(prop) else None
+            if name and value is not None:
+                data[CUSTOM_PREFIX + name] = value
+    return data
+
+
+# --- Writing ---------------------------------------------------------------
+
+CONTENT_TYPES_PART = "[Content_Types].xml"
+ROOT_RELS_PART = "_rels/.rels"
+
+CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+# part -> (content type, relationship type), for parts that may need to be created
+PART_TYPES = {
+    CORE_PART: ("application/vnd.openxmlformats-package.core-properties+xml",
+                "http://schemas.openxmlformats.org/package/2006/relationships/metadata/core-properties"),
+    CUSTOM_PART: ("application/vnd.openxmlformats-officedocument.custom-properties+xml",
+                  "http://schemas.openxmlformats.org/officeDocument/2006/relationships/custom-properties"),
+}
+
+CUSTOM_FMTID = "{D5CDD505-2E9C-101B-9397-08002B2CF9AE}"
+
+for _prefix in ("cp", "dc", "dcterms", "xsi", "vt"):
+    ET.register_namespace(_prefix, NS[_prefix])
+
+COPY_CHUNK = 1024 * 1024
+
+
+def display_to_w3cdtf(text: str) -> str:
+    for fmt in (DISPLAY_DATE, "%Y:%m:%d %H:%M:%S", "%Y-%m-%dT%H:%M:%SZ", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.datetime.strptime(text, fmt).strftime("%Y-%m-%dT%H:%M:%SZ")
+        except ValueError:
+            continue
+    return text
+
+
+def _set_text(el: ET.Element, text: str) -> bool:
+    if (el.text or "") == text:
+        return False
+    el.text = text
+    return True
+
+
+def _update_core(root: Optional[ET.Element], names: Dict[str, str], data: Dict[str, str]) -> Optional[ET.Element]:
+    """Applies data to core.xml. Core fields missing from data (or empty) are removed.
+    Returns the updated root, or None if nothing changed."""
+    changed = root is None
+    if root is None:
+        if not any(str(data.get(key, "")).strip() for key in names.values()):
+            return None
+        root = ET.Element(clark("cp:coreProperties"))
+    for tag, key in names.items():
+        value = str(data.get(key, "")).strip()
+        el = root.find(tag)
+        if not value:
+            # Empty elements (python-docx writes <dc:subject/>) read as missing already
+            if el is not None and (el.text or "").strip():
+                root.remove(el)
+                changed = True
+            continue
+        if tag in DATE_TAGS:
+            if el is not None and w3cdtf_to_display((el.text or "").strip()) == value:
+                continue
+            value = display_to_w3cdtf(value)
+        if el is None:
+            el = ET.SubElement(root, tag)
+            if tag in DATE_TAGS:
+                el.set(clark("xsi:type"), "dcterms:W3CDTF")
+        changed |= _set_text(el, value)
+    return root if changed else None
+
+
+def _update_app(root: Optional[ET.Element], data: Dict[str, str]) -> Optional[ET.Element]:
+    """app.xml holds application statistics, so App:* keys only update, never remove."""
+    values = {k[len(APP_PREFIX):]: str(v) for k, v in data.items() if k.startswith(APP_PREFIX)}
+    if root is None or not values:
+        return None
+    changed = False
+    for name, value in values.items():
+        el = root.find(f"{{{NS['ep']}}}{name}")
+        if el is None:
+            el = ET.SubElement(root, f"{{{NS['ep']}}}{name}")
+        elif len(el):
+            continue
+        changed |= _set_text(el, value)
+    return root if changed else None
+
+
+def _update_custom(root: Optional[ET.Element], data: Dict[str, str]) -> Optional[ET.Element]:
+    """Makes custom.xml hold exactly the Custom:* keys in data."""
+    values = {k[len(CUSTOM_PREFIX):]: str(v) for k, v in data.items() if k.startswith(CUSTOM_PREFIX)}
+    if root is None:
+        if not values:
+            return None
+        root = ET.Element(f"{{{NS['cup']}}}Properties")
+    changed = False
+    existing = {}
+    for prop in list(root.findall("cup:property", NS)):
+        name = prop.get("name")
+        if name not in values:
+            root.remove(prop)
+            changed = True
+        else:
+            existing[name] = prop
+    next_pid = max([int(p.get("pid", 1)) for p in existing.values()] + [1]) + 1
+    for name, value in values.items():
+        prop = existing.get(name)
+        if prop is None:
+            prop = ET.SubElement(root, f"{{{NS['cup']}}}property",
+                                 {"fmtid": CUSTOM_FMTID, "pid": str(next_pid), "name": name})
+            next_pid += 1
+            ET.SubElement(prop, f"{{{NS['vt']}}}lpwstr")
+            changed = True
+        if not len(prop):
+            ET.SubElement(prop, f"{{{NS['vt']}}}lpwstr")
+        changed |= _set_text(prop[0], value)
+    return root if changed else None
+
+
+def _register_part(zf: zipfile.ZipFile, part: str, updates: Dict[str, bytes]):
+    """Adds the content-type override and package relationship a newly created part needs."""
+    content_type, rel_type = PART_TYPES[part]
+
+    types = ET.fromstring(updates.get(CONTENT_TYPES_PART) or zf.read(CONTENT_TYPES_PART))
+    if not any(o.get("PartName") == "/" + part for o in types.findall(f"{{{CT_NS}}}Override")):
+        ET.SubElement(types, f"{{{CT_NS}}}Override", {"PartName": "/" + part, "ContentType": content_type})
+    updates[CONTENT_TYPES_PART] = _serialize(types, CT_NS)
+
+    try:
+        rels = ET.fromstring(updates.get(ROOT_RELS_PART) or zf.read(ROOT_RELS_PART))
+    except KeyError:
+        rels = ET.Element(f"{{{REL_NS}}}Relationships")
+    ids = {r.get("Id") for r in rels}
+    n = len(ids) + 1
+    while f"rId{n}" in ids:
+        n += 1
+    if not any(r.get("Target") in (part, "/" + part) for r in rels):
+        ET.SubElement(rels, f"{{{REL_NS}}}Relationship", {"Id": f"rId{n}", "Type": rel_type, "Target": part})
+    updates[ROOT_RELS_PART] = _serialize(rels, REL_NS)
+
+
+def _serialize(root: ET.Element, default_ns: Optional[str] = None) -> bytes:
+    """ElementTree's default_namespace option rejects unqualified attributes (vt:vector size=...),
+    so default-namespace parts are unqualified on a copy and get an explicit xmlns instead."""
+    if default_ns:
+        root = copy.deepcopy(root)
+        prefix = f"{{{default_ns}}}"
+        for el in root.iter():
+            if el.tag.startswith(prefix):
+                el.tag = el.tag[len(prefix):]
+        root.set("xmlns", default_ns)
+    return ET.tostring(root, encoding="UTF-8", xml_declaration=True)
+
+
+def _strip_zip64_extra(extra: bytes) -> bytes:
+    """Drops the Zip64 extra field; zipfile re-adds it when the copied entry needs one."""
+    out = bytearray()
+    i = 0
+    while i + 4 <= len(extra):
+        tag, size = struct.unpack_from("<HH", extra, i)
+        if tag != 0x0001:
+            out += extra[i:i + 4 + size]
+        i += 4 + size
+    return bytes(out)
+
+
+ZIP64_LIMIT = 0xFFFFFFFF
+UTF8_FLAG = 0x800
+DESCRIPTOR_FLAG = 0x08
+
+
+def _dos_time(date_time) -> Tuple[int, int]:
+    year, month, day, hour, minute, second = date_time[:6]
+    return (hour << 11 | minute << 5 | second // 2), ((year - 1980) << 9 | month << 5 | day)
+
+
+class _ZipWriter:
+    """Writes a ZIP archive record by record with struct, so existing members can be
+    copied with their compressed bytes untouched. zipfile has no public way to do that.
+    Local headers always carry the sizes (no data descriptors); Zip64 fields are added
+    only where a size, offset or count needs them."""
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.offset = 0
+        self.central = []
+
+    def _emit(self, data: bytes):
+        self.fp.write(data)
+        self.offset += len(data)
+
+    def _add(self, info: zipfile.ZipInfo, crc: int, compress_size: int, file_size: int,
+             flag_bits: int, body):
+        """Writes the local header and body (bytes, or a callable that writes and returns
+        its length), then queues the central directory record."""
+        name = info.filename.encode("utf-8" if flag_bits & UTF8_FLAG else "cp437")
+        extra = _strip_zip64_extra(info.extra)
+        zip64 = file_size >= ZIP64_LIMIT or compress_size >= ZIP64_LIMIT
+        local_extra = extra + (struct.pack("<HHQQ", 0x0001, 16, file_size, compress_size) if zip64 else b"")
+        version = max(info.extract_version, 45 if zip64 else 20)
+        dostime, dosdate = _dos_time(info.date_time)
+        header_offset = self.offset
+        self._emit(struct.pack("<4sHHHHHIIIHH", b"PK\x03\x04", version, flag_bits, info.compress_type,
+                               dostime, dosdate, crc, ZIP64_LIMIT if zip64 else compress_size,
+                               ZIP64_LIMIT if zip64 else file_size, len(name), len(local_extra)))
+        self._emit(name + local_extra)
+        if callable(body):
+            self.offset += body()
+        else:
+            self._emit(body)
+
+        # Central record: Zip64 holds exactly the fields that overflow, in spec order
+        big = [v for v in (file_size, compress_size, header_offset) if v >= ZIP64_LIMIT]
+        central_extra = extra + (struct.pack(f"<HH{len(big)}Q", 0x0001, 8 * len(big), *big) if big else b"")
+        comment = info.comment or b""
+        self.central.append(
+            struct.pack("<4sBBHHHHHIIIHHHHHII", b"PK\x01\x02", info.create_version, info.create_system,
+                        max(version, 45 if big else 20), flag_bits, info.compress_type, dostime, dosdate, crc,
+                        min(compress_size, ZIP64_LIMIT), min(file_size, ZIP64_LIMIT), len(name),
+                        len(central_extra), len(comment), 0, info.internal_attr, info.external_attr,
+                        min(header_offset, ZIP64_LIMIT))
+            + name + central_extra + comment)
+
+    def copy_raw(self, src, info: zipfile.ZipInfo):
+        """Copies one member's compressed bytes verbatim (no decompress/recompress)."""
+        src.seek(info.header_offset)
+        header = src.read(30)
+        if header[:4] != b"PK\x03\x04":
+            raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+        name_len, extra_len = struct.unpack("<HH", header[26:30])
+        src.seek(info.header_offset + 30 + name_len + extra_len)
+
+        def body() -> int:
+            remaining = info.compress_size
+            while remaining:
+                buf = src.read(min(COPY_CHUNK, remaining))
+                if not buf:
+                    raise zipfile.BadZipFile(f"Truncated data for {info.filename}")
+                self.fp.write(buf)
+                remaining -= len(buf)
+            return info.compress_size
+
+        # Sizes go in the local header, so no data descriptor
+        self._add(info, info.CRC, info.compress_size, info.file_size, info.flag_bits & ~DESCRIPTOR_FLAG, body)
+
+    def write(self, info: zipfile.ZipInfo, data: bytes):
+        """Adds a new member, deflated the way zipfile's ZIP_DEFLATED does it."""
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        packed = compressor.compress(data) + compressor.flush()
+        info.compress_type = zipfile.ZIP_DEFLATED
+        try:
+            info.filename.encode("ascii")
+            flag_bits = 0
+        except UnicodeEncodeError:
+            flag_bits = UTF8_FLAG
+        self._add(info, zlib.crc32(data), len(packed), len(data), flag_bits, packed)
+
+    def close(self, comment: bytes = b""):
+        """Writes the central directory and end records."""
+        start, count = self.offset, len(self.central)
+        for record in self.central:
+            self._emit(record)
+        size = self.offset - start
+        if count >= 0xFFFF or size >= ZIP64_LIMIT or start >= ZIP64_LIMIT:
+            end64 = self.offset
+            self._emit(struct.pack("<4sQHHIIQQQQ", b"PK\x06\x06", 44, 45, 45, 0, 0, count, count, size, start))
+            self._emit(struct.pack("<4sIQI", b"PK\x06\x07", 0, end64, 1))
+        self._emit(struct.pack("<4sHHHHIIH", b"PK\x05\x06", 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                               min(size, ZIP64_LIMIT), min(start, ZIP64_LIMIT), len(comment)) + comment)
+
+
+def write_properties(path: str, names: Dict[str, str], data: Dict[str, str],
+                     dest: Optional[str] = None) -> Tuple[bool, Dict[str, str]]:
+    """Rewrites only the docProps parts; every other member is stream-copied without
+    recompression, so the document body stays byte-identical. Writes to a temp file and
+    atomically replaces the original, or with dest set writes there and leaves path alone.
+
+    Returns (written, properties): written is False (and nothing is written) if nothing
+    changed; properties is what read_properties() returns for the file afterwards."""
+    updates = {}
+    with zipfile.ZipFile(path) as zf:
+        core_root, app_root, custom_root = (_read_part(zf, p) for p in (CORE_PART, APP_PART, CUSTOM_PART))
+        # The updaters edit the trees in place; they only return a root when something changed
+        core = _update_core(core_root, names, data)
+        app = _update_app(app_root, data)
+        custom = _update_custom(custom_root, data)
+        properties = _properties(core if core is not None else core_root, app_root,
+                                 custom if custom is not None else custom_root, names)
+        existing = set(zf.NameToInfo)
+
+        if core is not None:
+            updates[CORE_PART] = _serialize(core)
+        if app is not None:
+            updates[APP_PART] = _serialize(app, NS["ep"])
+        if custom is not None:
+            updates[CUSTOM_PART] = _serialize(custom, NS["cup"])
+        if not updates:
+            return False, properties
+        for part in (CORE_PART, CUSTOM_PART):
+            if part in updates and part not in existing:
+                _register_part(zf, part, updates)
+
+        temp_path = dest or path + ".tmp"
+        try:
+            with instrument.span("write") as s, open(path, "rb") as src, open(temp_path, "wb") as dst:
+                zout = _ZipWriter(dst)
+                for info in zf.infolist():
+                    if info.filename in updates:
+                        new = zipfile.ZipInfo(info.filename, info.date_time)
+                        new.external_attr = info.external_attr
+                        zout.write(new, updates.pop(info.filename))
+                    else:
+                        zout.copy_raw(src, info)
+                for name, payload in updates.items():  # Newly created parts
+                    zout.write(zipfile.ZipInfo(name, datetime.datetime.now().timetuple()[:6]), payload)
+                zout.close(zf.comment)
+                s.bytes_written = zout.offset
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    if dest is None:
+        with instrument.span("rename"):
+            os.replace(temp_path, path)
+    return True, properties
@@ -0,0 +1,683 @@
+"""Minimal PDF object layer: lazy metadata reads and incremental-update writes.
+
+Only the pieces metadata editing needs are implemented (trailer, xref lookup, Info,
+page count, XMP stream). Objects are located through the xref and read on demand;
+the page tree is never walked and the original bytes are never rewritten.
+"""
+import os
+import re
+import zlib
+from typing import Any, BinaryIO, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+WHITESPACE = b"\x00\t\n\x0c\r "
+DELIMITERS = b"()<>[]{}/%"
+
+TAIL_WINDOW = 2048
+READ_WINDOW = 16 * 1024
+
+
+class PdfError(ValueError):
+    pass
+
+
+class _Truncated(PdfError):
+    """Raised when the parse window ends mid-object; caller retries with a larger window."""
+
+
+class Name(str):
+    """A PDF name, stored without the leading slash."""
+
+
+class Ref(NamedTuple):
+    num: int
+    gen: int
+
+
+class Keyword(str):
+    """A bare PDF keyword (obj, endobj, stream, xref, trailer, ...)."""
+
+
+_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f",
+            b"(": b"(", b")": b")", b"\\": b"\\"}
+
+_NUMBER = re.compile(rb"[+-]?(?:\d+\.?\d*|\.\d+)")
+_HEX = re.compile(rb"[0-9A-Fa-f]*")
+_OCTAL = frozenset(b"01234567")
+
+
+class Parser:
+    """Tokenizer + object parser over a bytes window."""
+
+    def __init__(self, buf: bytes, pos: int = 0, final: bool = True):
+        self.buf = buf
+        self.pos = pos
+        self.final = final  # True if buf reaches EOF, so running out is a real error
+
+    def _need(self, n: int = 1):
+        if self.pos + n > len(self.buf):
+            raise PdfError("Unexpected end of file") if self.final else _Truncated()
+
+    def skip_ws(self):
+        buf = self.buf
+        while True:
+            while self.pos < len(buf) and buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(buf) and buf[self.pos] == 0x25:  # % comment
+                while self.pos < len(buf) and buf[self.pos] not in b"\r\n":
+                    self.pos += 1
+                continue
+            if self.pos >= len(buf):
+                self._need()
+            return
+
+    def _regular(self) -> bytes:
+        start = self.pos
+        buf = self.buf
+        while self.pos < len(buf) and buf[self.pos] not in WHITESPACE and buf[self.pos] not in DELIMITERS:
+            self.pos += 1
+        if self.pos >= len(buf) and not self.final:
+            raise _Truncated()
+        return buf[start:self.pos]
+
+    def _literal_string(self) -> bytes:
+        self.pos += 1
+        out = bytearray()
+        depth = 1
+        buf = self.buf
+        while True:
+            self._need()
+            c = buf[self.pos:self.pos + 1]
+            self.pos += 1
+            if c == b"\\":
+                self._need()
+                e = buf[self.pos:self.pos + 1]
+                self.pos += 1
+                if e in _ESCAPES:
+                    out += _ESCAPES[e]
+                elif e[0] in _OCTAL:
+                    digits = e
+                    while len(digits) < 3 and self.pos < len(buf) and buf[self.pos] in _OCTAL:
+                        digits += buf[self.pos:self.pos + 1]
+                        self.pos += 1
+                    out.append(int(digits, 8) & 0xFF)
+                elif e == b"\r":
+                    if buf[self.pos:self.pos + 1] == b"\n":
+                        self.pos += 1
+                elif e != b"\n":
+                    out += e
+            elif c == b"(":
+                depth += 1
+                out += c
+            elif c == b")":
+                depth -= 1
+                if depth == 0:
+                    return bytes(out)
+                out += c
+            else:
+                out += c
+
+    def _hex_string(self) -> bytes:
+        end = self.buf.find(b">", self.pos)
+        if end < 0:
+            self._need(len(self.buf))
+        digits = re.sub(rb"\s", b"", self.buf[self.pos + 1:end])
+        self.pos = end + 1
+        if not _HEX.fullmatch(digits):
+            raise PdfError("Malformed hex string")
+        if len(digits) % 2:
+            digits += b"0"
+        return bytes.fromhex(digits.decode("ascii"))
+
+    def _name(self) -> Name:
+        self.pos += 1
+        raw = self._regular()
+        return Name(re.sub(rb"#([0-9A-Fa-f]{2})", lambda m: bytes.fromhex(m.group(1).decode()), raw).decode("latin-1"))
+
+    def parse(self) -> Any:
+        self.skip_ws()
+        buf = self.buf
+        c = buf[self.pos]
+        if c == 0x2F:  # /
+            return self._name()
+        if c == 0x28:  # (
+            return self._literal_string()
+        if c == 0x3C:  # <
+            self._need(2)
+            if buf[self.pos + 1] == 0x3C:
+                self.pos += 2
+                return self._dict()
+            return self._hex_string()
+        if c == 0x5B:  # [
+            self.pos += 1
+            items = []
+            while True:
+                self.skip_ws()
+                if buf[self.pos] == 0x5D:
+                    self.pos += 1
+                    return items
+                items.append(self.parse())
+        token = self._regular()
+        if not token:
+            raise PdfError(f"Unexpected delimiter {chr(c)!r}")
+        if _NUMBER.fullmatch(token):
+            if b"." in token:
+                return float(token)
+            value = int(token)
+            # Look ahead for an indirect reference "num gen R"
+            save = self.pos
+            try:
+                self.skip_ws()
+                gen = self._regular()
+                self.skip_ws()
+                if gen.isdigit() and self._regular() == b"R":
+                    return Ref(value, int(gen))
+            except PdfError as e:
+                if isinstance(e, _Truncated):
+                    raise
+            self.pos = save
+            return value
+        if token == b"true":
+            return True
+        if token == b"false":
+            return False
+        if token == b"null":
+            return None
+        return Keyword(token.decode("latin-1"))
+
+    def _dict(self) -> Dict[Name, Any]:
+        out = {}
+        while True:
+            self.skip_ws()
+            self._need(2)
+            if self.buf[self.pos:self.pos + 2] == b">>":
+                self.pos += 2
+                return out
+            key = self.parse()
+            if not isinstance(key, Name):
+                raise PdfError("Dictionary key is not a name")
+            out[key] = self.parse()
+
+
+# --- Serialization ---------------------------------------------------------
+
+def _name_bytes(name: str) -> bytes:
+    out = bytearray(b"/")
+    for b in name.encode("utf-8"):
+        if b < 0x21 or b > 0x7E or b in DELIMITERS or b == 0x23:
+            out += b"#%02X" % b
+        else:
+            out.append(b)
+    return bytes(out)
+
+
+def encode_text(text: str) -> bytes:
+    """PDF text string: escaped literal for printable ASCII, UTF-16BE hex otherwise."""
+    if all(0x20 <= ord(ch) < 0x7F for ch in text):
+        escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        return b"(" + escaped.encode("ascii") + b")"
+    return b"<FEFF" + text.encode("utf-16-be").hex().upper().encode("ascii") + b">"
+
+
+def decode_text(raw: bytes) -> str:
+    if raw.startswith(b"\xfe\xff"):
+        return raw[2:].decode("utf-16-be", errors="replace")
+    if raw.startswith(b"\xef\xbb\xbf"):
+        return raw[3:].decode("utf-8", errors="replace")
+    return raw.decode("latin-1")
+
+
+def serialize(obj: Any) -> bytes:
+    if isinstance(obj, Name):
+        return _name_bytes(obj)
+    if isinstance(obj, Ref):
+        return b"%d %d R" % (obj.num, obj.gen)
+    if isinstance(obj, bool):
+        return b"true" if obj else b"false"
+    if obj is None:
+        return b"null"
+    if isinstance(obj, int):
+        return b"%d" % obj
+    if isinstance(obj, float):
+        return (b"%.6f" % obj).rstrip(b"0").rstrip(b".")
+    if isinstance(obj, bytes):
+        return b"<" + obj.hex().upper().encode("ascii") + b">"
+    if isinstance(obj, str):
+        return encode_text(obj)
+    if isinstance(obj, (list, tuple)):
+        return b"[" + b" ".join(serialize(x) for x in obj) + b"]"
+    if isinstance(obj, dict):
+        return b"<<" + b"".join(_name_bytes(k) + b" " + serialize(v) for k, v in obj.items()) + b">>"
+    raise PdfError(f"Cannot serialize {type(obj).__name__}")
+
+
+# --- Trailer access --------------------------------------------------------
+
+class PdfFile:
+    """Seek-based view of a PDF: reads only the windows it parses."""
+
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.size = os.fstat(f.fileno()).st_size
+        self._sections = {}      # xref offset -> (trailer, is_stream)
+        self._subsections = {}   # classic xref offset -> (subsections, trailer offset)
+        self._stream_xrefs = {}  # xref stream offset -> {num: (type, field2, field3)}
+        self._objects = {}       # Ref -> parsed object
+        self._objstms = {}       # object stream number -> (decoded data, {num: offset})
+
+    def read(self, offset: int, size: int) -> bytes:
+        self.f.seek(offset)
+        return self.f.read(size)
+
+    def parse_at(self, offset: int, parse_fn=None) -> Tuple[Any, int]:
+        """Parses at a file offset, growing the read window until the object fits.
+        Returns (value, absolute end offset)."""
+        window = READ_WINDOW
+        while True:
+            buf = self.read(offset, window)
+            final = offset + len(buf) >= self.size
+            p = Parser(buf, 0, final)
+            try:
+                value = parse_fn(p) if parse_fn else p.parse()
+                return value, offset + p.pos
+            except _Truncated:
+                if final:
+                    raise PdfError("Unexpected end of file")
+                window *= 4
+
+    def startxref(self) -> int:
+        tail_start = max(0, self.size - TAIL_WINDOW)
+        tail = self.read(tail_start, TAIL_WINDOW)
+        idx = tail.rfind(b"startxref")
+        if idx < 0:
+            raise PdfError("startxref not found")
+        m = re.match(rb"startxref\s+(\d+)", tail[idx:])
+        if not m:
+            raise PdfError("Malformed startxref")
+        return int(m.group(1))
+
+    def _classic_trailer(self, offset: int) -> Dict[Name, Any]:
+        _, trailer_pos = self._classic_subsections(offset)
+        trailer, _ = self.parse_at(trailer_pos)
+        if not isinstance(trailer, dict):
+            raise PdfError("Malformed trailer")
+        return trailer
+
+    def section_at(self, offset: int) -> Tuple[Dict[Name, Any], bool]:
+        """Returns (trailer dict, is_xref_stream) for the xref section at offset."""
+        if offset not in self._sections:
+            self._sections[offset] = self._read_section(offset)
+        return self._sections[offset]
+
+    def _read_section(self, offset: int) -> Tuple[Dict[Name, Any], bool]:
+        head = self.read(offset, 4)
+        if head == b"xref":
+            return self._classic_trailer(offset), False
+
+        trailer, _ = self.parse_at(offset, self._object_header)
+        if not isinstance(trailer, dict) or trailer.get("Type") != "XRef":
+            raise PdfError("startxref does not point to an xref section")
+        return trailer, True
+
+    def trailer(self) -> Tuple[Dict[Name, Any], bool, int]:
+        """Returns (latest trailer, is_xref_stream, its offset)."""
+        offset = self.startxref()
+        trailer, is_stream = self.section_at(offset)
+        return trailer, is_stream, offset
+
+    # --- Object lookup -----------------------------------------------------
+
+    def _classic_subsections(self, offset: int) -> Tuple[List[Tuple[int, int, int]], int]:
+        """Returns ([(start, count, entries offset)], trailer dict offset) for a classic table.
+        Entries are fixed 20-byte records, so subsections are skipped with a seek, not read."""
+        if offset not in self._subsections:
+            subs = []
+            pos = offset + 4
+            while True:
+                buf = self.read(pos, 256)
+                p = Parser(buf, 0, True)
+                p.skip_ws()
+                if buf[p.pos:p.pos + 7] == b"trailer":
+                    break
+                m = re.match(rb"(\d+)\s+(\d+)\s*", buf[p.pos:])
+                if not m:
+                    raise PdfError("Malformed xref subsection")
+                start, count = int(m.group(1)), int(m.group(2))
+                entries = pos + p.pos + m.end()
+                subs.append((start, count, entries))
+                pos = entries + 20 * count
+            self._subsections[offset] = (subs, pos + p.pos + 7)
+        return self._subsections[offset]
+
+    def _classic_lookup(self, offset: int, num: int) -> Optional[Tuple[int, int, int]]:
+        for start, count, entries in self._classic_subsections(offset)[0]:
+            if start <= num < start + count:
+                m = re.match(rb"(\d{10}) (\d{5}) ([nf])", self.read(entries + 20 * (num - start), 20))
+                if not m:
+                    raise PdfError(f"Malformed xref entry for object {num}")
+                return (1 if m.group(3) == b"n" else 0), int(m.group(1)), int(m.group(2))
+        return None
+
+    def _stream_lookup(self, offset: int, num: int) -> Optional[Tuple[int, int, int]]:
+        if offset not in self._stream_xrefs:
+            xref, data = self._stream_at(offset)
+            widths = xref.get("W")
+            if not isinstance(widths, list) or len(widths) != 3:
+                raise PdfError("Xref stream has a bad /W")
+            index = xref.get("Index") or [0, xref.get("Size", 0)]
+            row = sum(widths)
+            entries = {}
+            pos = 0
+            for start, count in zip(index[0::2], index[1::2]):
+                for n in range(start, start + count):
+                    fields = []
+                    for w in widths:
+                        fields.append(int.from_bytes(data[pos:pos + w], "big"))
+                        pos += w
+                    if widths[0] == 0:
+                        fields[0] = 1
+                    entries.setdefault(n, tuple(fields))
+                if pos > len(data):
+                    raise PdfError("Xref stream is shorter than its /Index")
+            self._stream_xrefs[offset] = entries
+        return self._stream_xrefs[offset].get(num)
+
+    def locate(self, num: int) -> Optional[Tuple[int, int, int]]:
+        """Newest xref entry for an object: (1, offset, gen), (2, objstm num, index) or None."""
+        offset = self.startxref()
+        seen = set()
+        while isinstance(offset, int) and offset not in seen:
+            seen.add(offset)
+            trailer, is_stream = self.section_at(offset)
+            if is_stream:
+                entry = self._stream_lookup(offset, num)
+            else:
+                entry = self._classic_lookup(offset, num)
+                if entry is None and isinstance(trailer.get("XRefStm"), int):
+                    entry = self._stream_lookup(trailer["XRefStm"], num)
+            if entry is not None:
+                return entry if entry[0] in (1, 2) else None
+            offset = trailer.get("Prev")
+        return None
+
+    def _object_header(self, p: Parser):
+        p.parse(), p.parse()
+        if p.parse() != "obj":
+            raise PdfError("Expected 'obj'")
+        return p.parse()
+
+    def _stream_span(self, offset: int) -> Tuple[Dict[Name, Any], int, int]:
+        """For the stream object at offset: (dict, file offset of the raw data, raw length)."""
+        def header(p: Parser):
+            d = self._object_header(p)
+            if not isinstance(d, dict) or p.parse() != "stream":
+                raise PdfError("Expected a stream object")
+            return d
+
+        d, pos = self.parse_at(offset, header)
+        eol = self.read(pos, 2)
+        pos += 2 if eol == b"\r\n" else 1 if eol[:1] in (b"\r", b"\n") else 0
+        length = self.resolve(d.get("Length"))
+        if not isinstance(length, int):
+            raise PdfError("Stream has no usable /Length")
+        return d, pos, length
+
+    def _stream_at(self, offset: int) -> Tuple[Dict[Name, Any], bytes]:
+        """Reads the stream object at offset and returns (dict, decoded data)."""
+        d, pos, length = self._stream_span(offset)
+        return d, decode_stream(d, self.read(pos, length))
+
+    def get(self, ref: Ref) -> Any:
+        if ref in self._objects:
+            return self._objects[ref]
+        entry = self.locate(ref.num)
+        if entry is None:
+            value = None
+        elif entry[0] == 1:
+            value, _ = self.parse_at(entry[1], self._object_header)
+        else:
+            value = self._from_objstm(entry[1], entry[2], ref.num)
+        self._objects[ref] = value
+        return value
+
+    def _from_objstm(self, stm_num: int, index: int, num: int) -> Any:
+        if stm_num not in self._objstms:
+            entry = self.locate(stm_num)
+            if entry is None or entry[0] != 1:
+                raise PdfError(f"Object stream {stm_num} not found")
+            d, data = self._stream_at(entry[1])
+            p = Parser(data, 0, True)
+            pairs = [p.parse() for _ in range(2 * d.get("N", 0))]
+            first = d.get("First", 0)
+            self._objstms[stm_num] = (data, {n: first + off for n, off in zip(pairs[0::2], pairs[1::2])})
+        data, offsets = self._objstms[stm_num]
+        if num not in offsets:
+            raise PdfError(f"Object {num} missing from object stream {stm_num}")
+        return Parser(data, offsets[num], True).parse()
+
+    def resolve(self, obj: Any) -> Any:
+        while isinstance(obj, Ref):
+            obj = self.get(obj)
+        return obj
+
+    def stream(self, ref: Any) -> Optional[bytes]:
+        if not isinstance(ref, Ref):
+            return None
+        entry = self.locate(ref.num)
+        if entry is None or entry[0] != 1:
+            return None
+        return self._stream_at(entry[1])[1]
+
+    def stream_span(self, ref: Any) -> Optional[Tuple[Dict[Name, Any], int, int]]:
+        """(dict, raw data offset, raw length) of a stream object, or None. Nothing is decoded."""
+        if not isinstance(ref, Ref):
+            return None
+        entry = self.locate(ref.num)
+        if entry is None or entry[0] != 1:
+            return None
+        return self._stream_span(entry[1])
+
+    # --- Metadata ----------------------------------------------------------
+
+    def _checked_trailer(self) -> Dict[Name, Any]:
+        trailer, _, _ = self.trailer()
+        if "Encrypt" in trailer:
+            raise PdfError("Encrypted PDF")
+        return trailer
+
+    def root(self) -> Dict[Name, Any]:
+        root = self.resolve(self._checked_trailer().get("Root"))
+        if not isinstance(root, dict):
+            raise PdfError("Document catalog not found")
+        return root
+
+    def info(self) -> Dict[str, str]:
+        """The document Info dictionary as display strings, keyed without the slash."""
+        info = self.resolve(self._checked_trailer().get("Info"))
+        if not isinstance(info, dict):
+            return {}
+        out = {}
+        for k, v in info.items():
+            v = self.resolve(v)
+            if isinstance(v, bytes):
+                out[str(k)] = decode_text(v)
+            elif isinstance(v, Name):
+                out[str(k)] = f"/{v}"
+            elif v is not None:
+                out[str(k)] = str(v)
+        return out
+
+    def page_count(self) -> int:
+        """/Root/Pages/Count only; the page tree itself is not walked."""
+        pages = self.resolve(self.root().get("Pages"))
+        count = self.resolve(pages.get("Count")) if isinstance(pages, dict) else None
+        if not isinstance(count, int):
+            raise PdfError("Page count not found")
+        return count
+
+    def xmp(self) -> Optional[bytes]:
+        """The raw XMP packet from the catalog's /Metadata stream, if any."""
+        return self.stream(self.root().get("Metadata"))
+
+
+def _png_unpredict(data: bytes, columns: int, bpp: int) -> bytes:
+    out = bytearray()
+    prev = bytearray(columns)
+    stride = columns + 1
+    for i in range(0, len(data) - stride + 1, stride):
+        ftype, row = data[i], bytearray(data[i + 1:i + stride])
+        for x in range(columns):
+            left = row[x - bpp] if x >= bpp else 0
+            up = prev[x]
+            if ftype == 1:
+                row[x] = (row[x] + left) & 0xFF
+            elif ftype == 2:
+                row[x] = (row[x] + up) & 0xFF
+            elif ftype == 3:
+                row[x] = (row[x] + ((left + up) >> 1)) & 0xFF
+            elif ftype == 4:
+                ul = prev[x - bpp] if x >= bpp else 0
+                pa, pb, pc = abs(up - ul), abs(left - ul), abs(left + up - 2 * ul)
+                row[x] = (row[x] + (left if pa <= pb and pa <= pc else up if pb <= pc else ul)) & 0xFF
+        out += row
+        prev = row
+    return bytes(out)
+
+
+def decode_stream(d: Dict[Name, Any], raw: bytes) -> bytes:
+    """Applies /Filter (FlateDecode only, with PNG predictors) to raw stream data."""
+    filters = d.get("Filter")
+    params = d.get("DecodeParms")
+    if filters is None:
+        return raw
+    if not isinstance(filters, list):
+        filters, params = [filters], [params]
+    elif not isinstance(params, list):
+        params = [params] * len(filters)
+    data = raw
+    for name, parm in zip(filters, params):
+        if name not in ("FlateDecode", "Fl"):
+            raise PdfError(f"Unsupported stream filter /{name}")
+        try:
+            data = zlib.decompress(data)
+        except zlib.error as e:
+            raise PdfError(f"Corrupt stream: {e}") from e
+        parm = parm if isinstance(parm, dict) else {}
+        if parm.get("Predictor", 1) >= 10:
+            colors = parm.get("Colors", 1)
+            bpp = max(1, colors * parm.get("BitsPerComponent", 8) // 8)
+            data = _png_unpredict(data, parm.get("Columns", 1) * bpp, bpp)
+    return data
+
+
+# Info entries whose value is a name, not a text string
+NAME_KEYS = {"Trapped"}
+
+
+def info_dict(data: Dict[str, str], names: Iterable[str] = ()) -> Dict[Name, Any]:
+    """Info dictionary entries for editor values. Keys in NAME_KEYS or `names` (entries
+    that held a name before) get a name object when their value is written as "/Name"."""
+    names = NAME_KEYS.union(names)
+    out = {}
+    for k, v in data.items():
+        key, value = Name(k.lstrip("/")), str(v)
+        out[key] = Name(value[1:]) if key in names and value.startswith("/") and len(value) > 1 else value
+    return out
+
+
+def write_info_incremental(path: str, data: Dict[str, str]) -> int:
+    """Appends a new Info dictionary, an xref section and a trailer to the end of the file.
+    The existing bytes stay untouched. Returns the number of bytes appended, which is 0
+    when the current Info dictionary already holds exactly these values."""
+    with open(path, "r+b") as f:
+        pdf = PdfFile(f)
+        trailer = _updatable_trailer(pdf)
+        if pdf.info() == {k.lstrip("/"): str(v) for k, v in data.items()}:
+            return 0
+
+        old_info = trailer.get("Info")
+        old = pdf.resolve(old_info)
+        names = [k for k, v in old.items() if isinstance(pdf.resolve(v), Name)] if isinstance(old, dict) else []
+        # Redefine the existing Info object when there is one, so /Size only grows when needed
+        info = old_info if isinstance(old_info, Ref) else Ref(trailer["Size"], 0)
+        return _append_update(f, pdf, [(info, serialize(info_dict(data, names)))], {Name("Info"): info})
+
+
+def xmp_stream(packet: bytes) -> bytes:
+    """An uncompressed /Metadata stream object body for an XMP packet."""
+    d = {Name("Type"): Name("Metadata"), Name("Subtype"): Name("XML"), Name("Length"): len(packet)}
+    return serialize(d) + b"\nstream\n" + packet + b"\nendstream"
+
+
+def write_xmp_incremental(path: str, packet: bytes) -> int:
+    """Appends a new /Metadata stream holding packet in an update section. An existing
+    Metadata object is redefined in place of the old one; otherwise the catalog is
+    redefined to point at a new object. Returns the number of bytes appended."""
+    with open(path, "r+b") as f:
+        pdf = PdfFile(f)
+        trailer = _updatable_trailer(pdf)
+        root = pdf.root()
+        current = root.get("Metadata")
+        if isinstance(current, Ref):
+            return _append_update(f, pdf, [(current, xmp_stream(packet))])
+        meta = Ref(trailer["Size"], 0)
+        catalog = dict(root)
+        catalog[Name("Metadata")] = meta
+        return _append_update(f, pdf, [(meta, xmp_stream(packet)), (trailer["Root"], serialize(catalog))])
+
+
+def _updatable_trailer(pdf: PdfFile) -> Dict[Name, Any]:
+    trailer = pdf.trailer()[0]
+    if "Encrypt" in trailer:
+        raise PdfError("Encrypted PDFs cannot be updated incrementally")
+    if not isinstance(trailer.get("Root"), Ref) or not isinstance(trailer.get("Size"), int):
+        raise PdfError("Trailer is missing /Root or /Size")
+    return trailer
+
+
+def _append_update(f: BinaryIO, pdf: PdfFile, objects: List[Tuple[Ref, bytes]],
+                   trailer_entries: Optional[Dict[Name, Any]] = None) -> int:
+    """Appends (re)definitions of objects, an xref section indexing them and a trailer
+    chained to the previous one. objects holds (ref, serialized body). Returns bytes appended."""
+    trailer, is_stream, prev = pdf.trailer()
+    size = max([trailer["Size"]] + [ref.num + 1 for ref, _ in objects])
+
+    f.seek(0, os.SEEK_END)
+    out = bytearray(b"\n")
+    base = pdf.size
+    offsets = []
+    for ref, body in objects:
+        offsets.append((ref, base + len(out)))
+        out += b"%d %d obj\n" % (ref.num, ref.gen) + body + b"\nendobj\n"
+
+    new_trailer = {Name("Size"): size, Name("Root"): trailer["Root"]}
+    if isinstance(trailer.get("Info"), Ref):
+        new_trailer[Name("Info")] = trailer["Info"]
+    new_trailer.update(trailer_entries or {})
+    new_trailer[Name("Prev")] = prev
+    if "ID" in trailer:
+        new_trailer[Name("ID")] = trailer["ID"]
+
+    xref_offset = base + len(out)
+    if not is_stream:
+        # Readers such as pypdf expect every section to open with the object 0 free-list head
+        out += b"xref\n0 1\n0000000000 65535 f\r\n"
+        for ref, offset in sorted(offsets):
+            out += b"%d 1\n%010d %05d n\r\n" % (ref.num, offset, ref.gen)
+        out += b"trailer\n" + serialize(new_trailer) + b"\n"
+    else:
+        # Files indexed by xref streams get an (uncompressed) xref stream update
+        xs_num = size
+        new_trailer[Name("Size")] = xs_num + 1
+        width = 4 if xref_offset < 0xFFFFFFFF else 8
+        rows = b""
+        index = []
+        for ref, offset in sorted(offsets) + [(Ref(xs_num, 0), xref_offset)]:
+            rows += b"\x01" + offset.to_bytes(width, "big") + ref.gen.to_bytes(2, "big")
+            index += [ref.num, 1]
+        new_trailer.update({Name("Type"): Name("XRef"), Name("W"): [1, width, 2],
+                            Name("Index"): index, Name("Length"): len(rows)})
+        out += b"%d 0 obj\n" % xs_num + serialize(new_trailer) + b"\nstream\n" + rows + b"\nendstream\nendobj\n"
+    out += b"startxref\n%d\n%%%%EOF\n" % xref_offset
+
+    f.write(out)
+    return len(out)
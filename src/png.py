@@ -0,0 +1,171 @@
+"""Chunk-level PNG access. Walks the chunk list by seeking, so IDAT data is never read
+(and, on writes, only ever copied verbatim)."""
+import struct
+import zlib
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+TEXT_CHUNKS = (b"tEXt", b"zTXt", b"iTXt")
+
+# iTXt keyword the XMP packet is stored under
+XMP_KEYWORD = "XML:com.adobe.xmp"
+
+# img.info names PIL fills from non-text chunks; Info: keys with these names are not text
+RESERVED_INFO = {"exif", "xmp", "icc_profile", "gamma", "chromaticity", "srgb", "dpi", "aspect",
+                 "transparency", "interlace", "default_image", "loop", "bbox", "duration", "disposal", "blend"}
+
+COPY_CHUNK = 1024 * 1024
+
+
+def iter_chunks(f: BinaryIO) -> Iterator[Tuple[bytes, int, int]]:
+    """Yields (chunk type, data offset, data length) for every chunk up to IEND."""
+    f.seek(0)
+    if f.read(8) != PNG_SIGNATURE:
+        raise ValueError("Not a PNG file")
+    pos = 8
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        length, ctype = struct.unpack(">I4s", header)
+        yield ctype, pos + 8, length
+        if ctype == b"IEND":
+            return
+        pos += 12 + length
+        f.seek(pos)
+
+
+def decode_text_chunk(ctype: bytes, body: bytes) -> Tuple[str, str]:
+    """Decodes a tEXt/zTXt/iTXt body into (keyword, text)."""
+    key, _, rest = body.partition(b"\x00")
+    keyword = key.decode("latin-1")
+    if ctype == b"tEXt":
+        return keyword, rest.decode("latin-1")
+    if ctype == b"zTXt":
+        return keyword, zlib.decompress(rest[1:]).decode("latin-1")
+    # iTXt: flag, method, language\0, translated keyword\0, text
+    compressed = rest[0]
+    _, _, rest = rest[2:].partition(b"\x00")
+    _, _, text = rest.partition(b"\x00")
+    if compressed:
+        text = zlib.decompress(text)
+    return keyword, text.decode("utf-8")
+
+
+def read_text(path: str) -> Dict[str, str]:
+    """Returns every text chunk in the file, including the ones stored after IDAT."""
+    out = {}
+    with open(path, "rb") as f:
+        for ctype, offset, length in list(iter_chunks(f)):
+            if ctype not in TEXT_CHUNKS:
+                continue
+            f.seek(offset)
+            try:
+                k, v = decode_text_chunk(ctype, f.read(length))
+            except (ValueError, IndexError, zlib.error, UnicodeDecodeError):
+                continue
+            out.setdefault(k, v)
+    return out
+
+
+def read_exif(path: str) -> Optional[bytes]:
+    """Returns the first eXIf chunk's data (a bare TIFF structure, no 'Exif\\0\\0' header), or None."""
+    with open(path, "rb") as f:
+        for ctype, offset, length in iter_chunks(f):
+            if ctype == b"eXIf":
+                f.seek(offset)
+                return f.read(length)
+    return None
+
+
+def is_valid_keyword(keyword: str) -> bool:
+    """1-79 printable Latin-1 characters, no leading, trailing or consecutive spaces."""
+    if not 1 <= len(keyword) <= 79 or keyword != keyword.strip() or "  " in keyword:
+        return False
+    return all(32 <= ord(c) <= 126 or 161 <= ord(c) <= 255 for c in keyword)
+
+
+def pack_chunk(ctype: bytes, data: bytes) -> bytes:
+    crc = zlib.crc32(data, zlib.crc32(ctype))
+    return struct.pack(">I", len(data)) + ctype + data + struct.pack(">I", crc)
+
+
+def text_chunk(keyword: str, text: str) -> bytes:
+    """tEXt when the text is Latin-1, else an uncompressed iTXt (UTF-8)."""
+    key = keyword.encode("latin-1")
+    try:
+        return pack_chunk(b"tEXt", key + b"\x00" + text.encode("latin-1"))
+    except UnicodeEncodeError:
+        # keyword, compression flag + method, empty language tag and translated keyword
+        return pack_chunk(b"iTXt", key + b"\x00\x00\x00\x00\x00" + text.encode("utf-8"))
+
+
+def xmp_chunk(packet: bytes) -> bytes:
+    """Uncompressed iTXt holding an XMP packet, as the XMP spec requires for PNG."""
+    return pack_chunk(b"iTXt", XMP_KEYWORD.encode("latin-1") + b"\x00\x00\x00\x00\x00" + packet)
+
+
+def _copy_range(src: BinaryIO, dst: BinaryIO, start: int, end: Optional[int] = None) -> int:
+    """Copies src[start:end] (to EOF when end is None) to dst. Returns bytes copied."""
+    src.seek(start)
+    copied = 0
+    while end is None or start + copied < end:
+        size = COPY_CHUNK if end is None else min(COPY_CHUNK, end - start - copied)
+        buf = src.read(size)
+        if not buf:
+            break
+        dst.write(buf)
+        copied += len(buf)
+    return copied
+
+
+def write_chunks(src_path: str, dst_path: str, exif_bytes: Optional[bytes] = None,
+                 texts: Optional[Dict[str, str]] = None, xmp_bytes: Optional[bytes] = None) -> int:
+    """Copies src to dst with the eXIf chunk replaced by exif_bytes (None leaves it alone)
+    and a text chunk per keyword in texts, replacing any tEXt/zTXt/iTXt of that keyword.
+    xmp_bytes replaces the XMP packet the same way. Replacements keep the old chunk's
+    position; new chunks go just before the first IDAT. Every other chunk, IDAT included,
+    is copied byte for byte. Returns bytes written."""
+    # Keyword -> replacement chunk
+    texts = {k: text_chunk(k, v) for k, v in (texts or {}).items()}
+    if xmp_bytes is not None:
+        texts[XMP_KEYWORD] = xmp_chunk(xmp_bytes)
+    if exif_bytes is not None and exif_bytes.startswith(b"Exif\x00\x00"):
+        exif_bytes = exif_bytes[6:]
+
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        chunks = list(iter_chunks(src))
+        pending_exif = exif_bytes is not None
+        done = set()  # Keywords already written
+        written = 0
+        copy_from = 0  # Start of the run of untouched bytes not yet copied
+
+        def emit(data: bytes, upto: int):
+            nonlocal written
+            written += _copy_range(src, dst, copy_from, upto)
+            dst.write(data)
+            written += len(data)
+
+        for ctype, offset, length in chunks:
+            start, end = offset - 8, offset + length + 4
+            if ctype == b"eXIf" and exif_bytes is not None:
+                emit(pack_chunk(b"eXIf", exif_bytes) if pending_exif else b"", start)
+                pending_exif = False
+                copy_from = end
+            elif ctype in TEXT_CHUNKS and texts:
+                src.seek(offset)
+                keyword = src.read(min(length, 80)).partition(b"\x00")[0].decode("latin-1")
+                if keyword in texts:
+                    emit(texts[keyword] if keyword not in done else b"", start)
+                    done.add(keyword)
+                    copy_from = end
+            elif ctype in (b"IDAT", b"IEND") and (pending_exif or len(done) < len(texts)):
+                new = [pack_chunk(b"eXIf", exif_bytes)] if pending_exif else []
+                new += [chunk for k, chunk in texts.items() if k not in done]
+                emit(b"".join(new), start)
+                pending_exif = False
+                done.update(texts)
+                copy_from = start
+        written += _copy_range(src, dst, copy_from)  # Through IEND and anything after it
+    return written
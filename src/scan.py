@@ -0,0 +1,278 @@
+"""Zero-copy metadata locators for JPEG and TIFF.
+
+Files are memory-mapped and walked through memoryview, so only the pages holding
+marker headers and IFDs are ever read: a few KB per file even for large images. JPEG
+scan data and TIFF strips/tiles are never touched.
+
+Slices handed out by the scanners (payload(), exif_payload(), ...) are views into the
+mapping. They are valid inside the mapped() block only; parsers copy what they keep.
+"""
+import contextlib
+import mmap
+import struct
+from typing import Iterator, List, NamedTuple, Optional
+
+SOI = b"\xff\xd8"
+EXIF_HEADER = b"Exif\x00\x00"
+XMP_HEADER = b"http://ns.adobe.com/xap/1.0/\x00"
+PHOTOSHOP_HEADER = b"Photoshop 3.0\x00"
+
+APP0 = 0xE0
+APP1 = 0xE1
+APP2 = 0xE2
+APP13 = 0xED
+APP14 = 0xEE
+COM = 0xFE
+SOS = 0xDA
+EOI = 0xD9
+
+# Start-of-frame markers (DHT 0xC4, JPG 0xC8 and DAC 0xCC share the range but are not frames)
+SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+PROGRESSIVE_SOF = frozenset((0xC2, 0xC6, 0xCA, 0xCE))
+
+# Markers that carry no length field (TEM, RSTn)
+_STANDALONE = {0x01} | set(range(0xD0, 0xD8))
+
+# TIFF sub-IFD pointers: tag -> IFD name
+SUB_IFDS = {34665: "Exif", 34853: "GPS"}
+INTEROP_POINTER = 40965
+
+# TIFF field type -> item size
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4}
+
+
+class ScanError(ValueError):
+    pass
+
+
+@contextlib.contextmanager
+def mapped(path: str) -> Iterator[memoryview]:
+    """Read-only memoryview over the whole file, backed by mmap."""
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file: nothing to map
+            yield memoryview(b"")
+            return
+        view = memoryview(mm)
+        try:
+            yield view
+        finally:
+            view.release()
+            try:
+                mm.close()
+            except BufferError:
+                pass  # A caller kept a slice; the mapping goes away with it
+
+
+# --- JPEG -----------------------------------------------------------------
+
+class Segment(NamedTuple):
+    marker: int
+    offset: int  # Of the 0xFF marker byte
+    start: int   # Of the payload (after the length field)
+    length: int  # Payload length
+
+
+class JpegLayout(NamedTuple):
+    segments: List[Segment]  # Every header segment before the first SOS, in file order
+    sos: int                 # Offset of the SOS marker: scan data starts here
+    sof: Optional[Segment]   # The frame header, if one came before SOS
+
+    def find(self, marker: int) -> List[Segment]:
+        return [s for s in self.segments if s.marker == marker]
+
+
+def scan_jpeg(buf) -> JpegLayout:
+    """Walks the markers up to the first SOS (or EOI). buf is anything sliceable as bytes
+    (memoryview, mmap, bytes). Raises ScanError on anything malformed."""
+    if bytes(buf[:2]) != SOI:
+        raise ScanError("Not a JPEG file (missing SOI)")
+    size = len(buf)
+    segments = []
+    sof = None
+    pos = 2
+    while True:
+        if pos + 2 > size:
+            raise ScanError("Truncated JPEG header")
+        if buf[pos] != 0xFF:
+            raise ScanError(f"Bad marker byte at offset {pos}")
+        offset = pos
+        pos += 1
+        while pos < size and buf[pos] == 0xFF:  # Fill bytes
+            offset = pos
+            pos += 1
+        if pos >= size:
+            raise ScanError("Truncated JPEG header")
+        marker = buf[pos]
+        pos += 1
+
+        if marker == SOS or marker == EOI:
+            return JpegLayout(segments, offset, sof)
+        if marker in _STANDALONE:
+            segments.append(Segment(marker, offset, pos, 0))
+            continue
+        if pos + 2 > size:
+            raise ScanError("Truncated JPEG segment")
+        length = (buf[pos] << 8 | buf[pos + 1]) - 2
+        if length < 0 or pos + 2 + length > size:
+            raise ScanError("Truncated JPEG segment")
+        segment = Segment(marker, offset, pos + 2, length)
+        segments.append(segment)
+        if marker in SOF_MARKERS and sof is None:
+            sof = segment
+        pos += 2 + length
+
+
+def payload(buf, segment: Segment):
+    return buf[segment.start:segment.start + segment.length]
+
+
+def app_payload(buf, layout: JpegLayout, marker: int, signature: bytes):
+    """Payload (signature included) of the first APPn segment starting with signature, or None."""
+    for segment in layout.segments:
+        if segment.marker == marker and segment.length >= len(signature) \
+                and bytes(buf[segment.start:segment.start + len(signature)]) == signature:
+            return payload(buf, segment)
+    return None
+
+
+def exif_payload(buf, layout: JpegLayout):
+    """APP1 Exif payload including the 'Exif\\0\\0' header."""
+    return app_payload(buf, layout, APP1, EXIF_HEADER)
+
+
+def xmp_payload(buf, layout: JpegLayout):
+    """The XMP packet from the APP1 XMP segment (namespace header stripped)."""
+    data = app_payload(buf, layout, APP1, XMP_HEADER)
+    return data[len(XMP_HEADER):] if data is not None else None
+
+
+def photoshop_payload(buf, layout: JpegLayout):
+    """APP13 Photoshop image resource blocks (IPTC lives in resource 0x0404)."""
+    data = app_payload(buf, layout, APP13, PHOTOSHOP_HEADER)
+    return data[len(PHOTOSHOP_HEADER):] if data is not None else None
+
+
+class Frame(NamedTuple):
+    width: int
+    height: int
+    bits: int
+    components: int
+    progressive: bool
+
+
+def frame(buf, layout: JpegLayout) -> Optional[Frame]:
+    sof = layout.sof
+    if sof is None or sof.length < 6:
+        return None
+    bits, height, width, components = struct.unpack_from(">BHHB", buf, sof.start)
+    return Frame(width, height, bits, components, sof.marker in PROGRESSIVE_SOF)
+
+
+# --- TIFF -----------------------------------------------------------------
+
+class IfdEntry(NamedTuple):
+    tag: int
+    type: int
+    count: int
+    offset: int        # Of the 12-byte entry
+    value_offset: int  # Absolute offset of the value (entry offset + 8 when stored inline)
+
+    @property
+    def size(self) -> int:
+        return TYPE_SIZES.get(self.type, 0) * self.count
+
+    @property
+    def inline(self) -> bool:
+        return self.size <= 4
+
+
+class Ifd(NamedTuple):
+    name: str  # "0th", "1st", "2nd"... for the main chain; "Exif", "GPS", "Interop" for sub-IFDs
+    offset: int  # Absolute offset of the entry count
+    entries: List[IfdEntry]
+    next_pos: int  # Absolute offset of the next-IFD pointer
+
+    def get(self, tag: int) -> Optional[IfdEntry]:
+        for entry in self.entries:
+            if entry.tag == tag:
+                return entry
+        return None
+
+
+class TiffLayout(NamedTuple):
+    endian: str  # "<" or ">"
+    base: int    # Offset of the TIFF header; IFD offsets are relative to it
+    ifds: List[Ifd]
+
+    def ifd(self, name: str) -> Optional[Ifd]:
+        for ifd in self.ifds:
+            if ifd.name == name:
+                return ifd
+        return None
+
+
+def _chain_name(index: int) -> str:
+    return {0: "0th", 1: "1st", 2: "2nd", 3: "3rd"}.get(index, f"{index}th")
+
+
+def scan_tiff(buf, base: int = 0, max_ifds: int = 64) -> TiffLayout:
+    """Walks the main IFD chain plus the Exif, GPS and Interop sub-IFDs, reading only the
+    IFD tables. base is where the TIFF header starts (6 for an Exif APP1 payload)."""
+    order = bytes(buf[base:base + 2])
+    if order == b"II":
+        endian = "<"
+    elif order == b"MM":
+        endian = ">"
+    else:
+        raise ScanError("Not a TIFF structure")
+    size = len(buf)
+    if base + 8 > size or struct.unpack_from(endian + "H", buf, base + 2)[0] != 42:
+        raise ScanError("Bad TIFF magic")
+    entry_struct = struct.Struct(endian + "HHLL")
+    seen = set()
+
+    def read_ifd(name: str, rel: int) -> Optional[Ifd]:
+        start = base + rel
+        if not rel or rel in seen or start + 2 > size:
+            return None
+        seen.add(rel)
+        count = struct.unpack_from(endian + "H", buf, start)[0]
+        next_pos = start + 2 + 12 * count
+        if next_pos + 4 > size:
+            raise ScanError(f"Truncated IFD at offset {start}")
+        entries = []
+        for i in range(count):
+            pos = start + 2 + 12 * i
+            tag, field_type, n, value = entry_struct.unpack_from(buf, pos)
+            item = TYPE_SIZES.get(field_type, 0)
+            entries.append(IfdEntry(tag, field_type, n, pos, pos + 8 if item * n <= 4 else base + value))
+        return Ifd(name, start, entries, next_pos)
+
+    def pointer(ifd: Ifd, tag: int) -> int:
+        entry = ifd.get(tag)
+        if entry is None or entry.type not in (4, 13) or entry.count != 1:
+            return 0
+        return struct.unpack_from(endian + "L", buf, entry.offset + 8)[0]
+
+    ifds = []
+    rel = struct.unpack_from(endian + "L", buf, base + 4)[0]
+    while rel and len(ifds) < max_ifds:
+        ifd = read_ifd(_chain_name(len(ifds)), rel)
+        if ifd is None:
+            break
+        ifds.append(ifd)
+        rel = struct.unpack_from(endian + "L", buf, ifd.next_pos)[0]
+
+    zeroth = ifds[0] if ifds else None
+    if zeroth is not None:
+        for tag, name in SUB_IFDS.items():
+            sub = read_ifd(name, pointer(zeroth, tag))
+            if sub is not None:
+                ifds.append(sub)
+                if name == "Exif":
+                    interop = read_ifd("Interop", pointer(sub, INTEROP_POINTER))
+                    if interop is not None:
+                        ifds.append(interop)
+    return TiffLayout(endian, base, ifds)
@@ -0,0 +1,169 @@
+"""Content sniffing: identifies a file from its first few KB instead of its extension."""
+import os
+from typing import BinaryIO, NamedTuple, Optional
+
+PREFIX_SIZE = 4096
+
+IMAGE_KINDS = {"jpeg", "png", "gif", "bmp", "tiff", "webp", "heic"}
+AUDIO_KINDS = {"mp3", "aac", "flac", "ogg_vorbis", "ogg_opus", "ogg_flac", "ogg_speex", "ogg_theora",
+               "wav", "aiff", "mp4", "asf"}
+
+# ftyp major brands that are still images rather than movies
+_HEIF_BRANDS = {b"heic", b"heix", b"heim", b"heis", b"hevc", b"hevx", b"mif1", b"msf1", b"avif"}
+
+# First packet signature of an Ogg logical stream -> kind
+_OGG_CODECS = (
+    (b"\x01vorbis", "ogg_vorbis"),
+    (b"OpusHead", "ogg_opus"),
+    (b"\x7fFLAC", "ogg_flac"),
+    (b"Speex   ", "ogg_speex"),
+    (b"\x80theora", "ogg_theora"),
+)
+
+_ASF_GUID = bytes.fromhex("3026B2758E66CF11A6D900AA0062CE6C")
+
+
+class Sniffed(NamedTuple):
+    """Result of sniffing: the detected kind (None if unknown) and the bytes that were read,
+    so handlers can reuse them instead of reading the header again. The prefix describes the
+    file as it was sniffed: handlers only read through it in load(), and a load after a
+    write passes the hint with an empty prefix."""
+    kind: Optional[str]
+    prefix: bytes
+
+
+class PrefixedFile:
+    """Read-only file wrapper that answers reads inside the sniffed prefix from memory, so a
+    parser's header reads (mutagen, PIL) cost no I/O. Provides read/readline/seek/tell."""
+    def __init__(self, f: BinaryIO, prefix: bytes):
+        self._f = f
+        self._prefix = prefix
+        self._pos = 0
+
+    @property
+    def name(self):
+        return getattr(self._f, "name", None)
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        pos = self._pos
+        if size is None or size < 0:
+            out = self._prefix[pos:]
+            self._f.seek(max(pos, len(self._prefix)))
+            out += self._f.read()
+        else:
+            out = self._prefix[pos:pos + size]
+            if len(out) < size:
+                self._f.seek(max(pos, len(self._prefix)))
+                out += self._f.read(size - len(out))
+        self._pos = pos + len(out)
+        return out
+
+    def readline(self, size: Optional[int] = -1) -> bytes:
+        line = b""
+        while size is None or size < 0 or len(line) < size:
+            chunk = self.read(1024 if size is None or size < 0 else min(1024, size - len(line)))
+            if not chunk:
+                break
+            cut = chunk.find(b"\n")
+            if cut >= 0:
+                self.seek(cut + 1 - len(chunk), 1)
+                return line + chunk[:cut + 1]
+            line += chunk
+        return line
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += self._f.seek(0, 2)
+        if offset < 0:
+            raise OSError(22, "Invalid argument")  # What the file itself raises (mutagen relies on it)
+        self._pos = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._pos
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+
+def read_prefix(path: str, size: int = PREFIX_SIZE) -> bytes:
+    try:
+        with open(path, "rb") as f:
+            return f.read(size)
+    except OSError:
+        return b""
+
+
+def _ogg_kind(prefix: bytes) -> Optional[str]:
+    if len(prefix) < 27:
+        return None
+    start = 27 + prefix[26]  # Page header + segment table
+    packet = prefix[start:start + 8]
+    for magic, kind in _OGG_CODECS:
+        if packet.startswith(magic):
+            return kind
+    return None
+
+
+def _is_mpeg_audio_sync(b: bytes) -> bool:
+    # 11-bit sync, valid version, layer III/II/I, bitrate index not 'bad'
+    return (len(b) >= 3 and b[0] == 0xFF and (b[1] & 0xE0) == 0xE0
+            and (b[1] & 0x18) != 0x08 and (b[1] & 0x06) != 0 and (b[2] & 0xF0) != 0xF0)
+
+
+def detect(prefix: bytes, ext: str = "") -> Optional[str]:
+    """Returns a kind string for the magic signature in prefix, or None.
+    ext is only consulted where the signature itself is ambiguous (ID3-prefixed AAC, ZIP)."""
+    p = prefix
+    if p[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if p[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if p[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if p[:4] in (b"II*\x00", b"MM\x00*"):
+        return "tiff"
+    if p[:4] == b"RIFF" and len(p) >= 12:
+        return {b"WEBP": "webp", b"WAVE": "wav"}.get(p[8:12])
+    if p[:4] == b"FORM" and p[8:12] in (b"AIFF", b"AIFC"):
+        return "aiff"
+    if p[:4] == b"fLaC":
+        return "flac"
+    if p[:4] == b"OggS":
+        return _ogg_kind(p)
+    if p[:3] == b"ID3":
+        return "aac" if ext == ".aac" else "mp3"
+    if p[4:8] == b"ftyp":
+        return "heic" if p[8:12] in _HEIF_BRANDS else "mp4"
+    if p[4:8] in (b"moov", b"mdat", b"wide", b"free", b"skip"):
+        return "mp4"  # Pre-ftyp QuickTime
+    if p[:4] == b"\x1aE\xdf\xa3":
+        return "matroska"
+    if p[:16] == _ASF_GUID:
+        return "asf"
+    if p[:4] == b"PK\x03\x04":
+        if b"word/" in p or ext == ".docx":
+            return "docx"
+        if b"xl/" in p or ext == ".xlsx":
+            return "xlsx"
+        return "zip"
+    if b"%PDF-" in p[:1024]:
+        return "pdf"
+    if p[:2] == b"BM" and len(p) >= 18 and int.from_bytes(p[14:18], "little") in (12, 40, 52, 56, 64, 108, 124):
+        return "bmp"
+    if p[:2] in (b"\xff\xf1", b"\xff\xf9"):
+        return "aac"  # ADTS
+    if _is_mpeg_audio_sync(p):
+        return "mp3"
+    return None
+
+
+def sniff(path: str) -> Sniffed:
+    ext = os.path.splitext(path)[1].lower()
+    prefix = read_prefix(path)
+    return Sniffed(detect(prefix, ext), prefix)
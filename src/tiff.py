@@ -0,0 +1,214 @@
+"""IFD-level TIFF writes. Patches tag values in place; strips and tiles are never read or moved.
+
+A tag whose new value fits where the old one was is overwritten there (inline in its
+entry, or over its old value block). Larger values go to the end of the file and the
+entry is repointed. A new tag changes the size of its IFD, so a copy of the IFD with the
+new entries is appended and linked in place of the old one (which stays behind as dead
+bytes). Missing Exif/GPS/Interop IFDs are created the same way.
+
+Appended data is written and flushed before any pointer to it, so an interrupted save
+never leaves a pointer to a block that isn't there. Memory use is bounded by the IFD
+tables and the new values, whatever the size of the raster.
+"""
+import os
+import struct
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from . import exif, instrument, scan
+
+MAX_OFFSET = 0xFFFFFFFF  # Classic TIFF offsets are 32-bit
+
+# Sub-IFD -> (parent IFD, pointer tag)
+PARENTS = {
+    "Exif": ("0th", exif.EXIF_POINTER),
+    "GPS": ("0th", exif.GPS_POINTER),
+    "Interop": ("Exif", exif.INTEROP_POINTER),
+}
+
+
+class PatchStats(NamedTuple):
+    patched: int   # Bytes overwritten inside the existing file
+    appended: int  # Bytes added at the end (values and relocated IFDs)
+
+
+def is_tiff(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(4) in (b"II*\x00", b"MM\x00*")
+    except OSError:
+        return False
+
+
+def field_type(ifd: str, tag: int, value: Any) -> int:
+    """TIFF type for a tag the IFD doesn't have yet: piexif's type if known, else from the value."""
+    known = exif.TAGS.get((ifd, tag))
+    if known and known[1]:
+        return known[1]
+    if isinstance(value, (bytes, str)):
+        return 2
+    if isinstance(value, tuple) and len(value) == 2 and all(isinstance(v, int) for v in value):
+        return 5
+    values = value if isinstance(value, tuple) else (value,)
+    if all(isinstance(v, tuple) for v in values):
+        return 5
+    if all(isinstance(v, int) and 0 <= v <= 0xFFFF for v in values):
+        return 3
+    return 4
+
+
+def encode_value(value: Any, ftype: int, endian: str) -> Tuple[int, bytes]:
+    """(count, bytes) for value stored as TIFF type ftype. value is shaped as exif.parse
+    returns it: bytes for ASCII/UNDEFINED, a number or tuple of numbers, (num, den) or a
+    tuple of them for rationals."""
+    if ftype not in exif.TYPES:
+        raise ValueError(f"Unsupported TIFF field type {ftype}")
+    if ftype in (2, 7) or (ftype == 1 and isinstance(value, (bytes, str))):
+        data = value.encode("utf-8") if isinstance(value, str) else bytes(value)
+        if ftype == 2 and not data.endswith(b"\x00"):
+            data += b"\x00"
+        return len(data), data
+    code, _ = exif.TYPES[ftype]
+    if ftype in (5, 10):
+        if isinstance(value, (bytes, str)):
+            raise ValueError(f"{value!r} is not a rational")
+        pairs = (value,) if isinstance(value, tuple) and value and isinstance(value[0], int) else value
+        flat = [n for pair in pairs for n in pair]
+        return len(pairs), struct.pack(f"{endian}{len(flat)}{code}", *flat)
+    values = _numbers(value, ftype)
+    return len(values), struct.pack(f"{endian}{len(values)}{code}", *values)
+
+
+def _numbers(value: Any, ftype: int) -> tuple:
+    if isinstance(value, (bytes, str)):  # Editor text for a numeric tag
+        text = value.decode() if isinstance(value, bytes) else value
+        cast = float if ftype in (11, 12) else int
+        try:
+            return tuple(cast(v) for v in text.strip("() ").split(","))
+        except ValueError:
+            raise ValueError(f"{text!r} is not a number")
+    return tuple(value) if isinstance(value, (tuple, list)) else (value,)
+
+
+class _Plan:
+    """Byte-level edits against a mapped TIFF: a tail to append and in-place patches."""
+
+    def __init__(self, buf, layout: scan.TiffLayout):
+        self.buf = buf
+        self.layout = layout
+        self.endian = layout.endian
+        self.end = len(buf)
+        self.tail = bytearray()
+        self.patches: List[Tuple[int, bytes]] = []
+
+    def append(self, data: bytes) -> int:
+        """Queues data at the end of the file; returns its offset relative to the TIFF header."""
+        if (self.end + len(self.tail)) & 1:
+            self.tail += b"\x00"  # Offsets must be word-aligned
+        pos = self.end + len(self.tail)
+        if pos + len(data) > MAX_OFFSET:
+            raise ValueError("Appending would push the file past 4 GB (not a BigTIFF)")
+        self.tail += data
+        return pos - self.layout.base
+
+    def patch(self, pos: int, data: bytes):
+        self.patches.append((pos, data))
+
+    def entry(self, tag: int, ftype: int, count: int, data: bytes) -> bytes:
+        """12-byte IFD entry, with data inline or appended."""
+        if len(data) <= 4:
+            value = data.ljust(4, b"\x00")
+        else:
+            value = struct.pack(self.endian + "L", self.append(data))
+        return struct.pack(self.endian + "HHL", tag, ftype, count) + value
+
+    def set_in_place(self, ifd_name: str, entry: scan.IfdEntry, value: Any):
+        ftype = entry.type if entry.type in exif.TYPES else field_type(ifd_name, entry.tag, value)
+        count, data = encode_value(value, ftype, self.endian)
+        if len(data) > 4 and not entry.inline and len(data) <= entry.size \
+                and entry.value_offset + entry.size <= self.end:
+            self.patch(entry.value_offset, data)  # Over the old value block
+            self.patch(entry.offset + 2, struct.pack(self.endian + "HL", ftype, count))
+        else:
+            self.patch(entry.offset, self.entry(entry.tag, ftype, count, data))
+
+    def build_ifd(self, ifd_name: str, ifd: Optional[scan.Ifd], values: Dict[int, Any], next_rel: int) -> int:
+        """Appends a copy of ifd (or a new IFD) with values set; returns its relative offset."""
+        entries = {}
+        if ifd is not None:
+            for e in ifd.entries:  # Kept as-is: their value offsets stay valid
+                entries[e.tag] = bytes(self.buf[e.offset:e.offset + 12])
+        for tag, value in values.items():
+            current = ifd.get(tag) if ifd is not None else None
+            ftype = current.type if current is not None and current.type in exif.TYPES \
+                else field_type(ifd_name, tag, value)
+            count, data = encode_value(value, ftype, self.endian)
+            entries[tag] = self.entry(tag, ftype, count, data)
+        if len(entries) > 0xFFFF:
+            raise ValueError(f"Too many entries for the {ifd_name} IFD")
+        table = struct.pack(self.endian + "H", len(entries)) + b"".join(entries[t] for t in sorted(entries))
+        return self.append(table + struct.pack(self.endian + "L", next_rel))
+
+
+def write_tags(path: str, edits: Dict[str, Dict[int, Any]]) -> PatchStats:
+    """Sets tags in the TIFF at path, in place. edits maps an IFD name as exif.parse uses
+    it ("0th", "Exif", "GPS", "Interop", "1st") to {tag id: value}."""
+    with scan.mapped(path) as buf:
+        layout = scan.scan_tiff(buf)
+        with instrument.span("encode") as s:
+            plan = _plan(buf, layout, {k: dict(v) for k, v in edits.items() if v})
+            s.bytes_written = len(plan.tail)
+        end, tail, patches = plan.end, bytes(plan.tail), plan.patches
+        del plan
+
+    with instrument.span("write") as s, open(path, "r+b") as f:
+        if tail:
+            f.seek(end)
+            f.write(tail)
+            f.flush()
+            os.fsync(f.fileno())  # New blocks are on disk before anything points at them
+        for pos, data in patches:
+            f.seek(pos)
+            f.write(data)
+        patched = sum(len(d) for _, d in patches)
+        s.bytes_written = patched + len(tail)
+    return PatchStats(patched, len(tail))
+
+
+def _plan(buf, layout: scan.TiffLayout, edits: Dict[str, Dict[int, Any]]) -> _Plan:
+    plan = _Plan(buf, layout)
+    endian, base = layout.endian, layout.base
+    chain = [ifd.name for ifd in layout.ifds if ifd.name not in PARENTS]
+    next_rel = {ifd.name: struct.unpack_from(endian + "L", buf, ifd.next_pos)[0] for ifd in layout.ifds}
+    for name in edits:
+        if name not in PARENTS and name not in chain:
+            raise ValueError(f"The file has no {name} IFD")
+
+    # Children before parents, so a relocated IFD's new offset can still be written into its parent
+    for name in ["Interop", "Exif", "GPS"] + chain[::-1]:
+        values = edits.get(name)
+        if not values:
+            continue
+        ifd = layout.ifd(name)
+        if ifd is None:
+            parent, pointer = PARENTS[name]
+            rel = plan.build_ifd(name, None, values, 0)
+            edits.setdefault(parent, {})[pointer] = rel
+            continue
+        if all(ifd.get(tag) is not None for tag in values):
+            for tag, value in values.items():
+                plan.set_in_place(name, ifd.get(tag), value)
+            continue
+
+        rel = plan.build_ifd(name, ifd, values, next_rel.get(name, 0))
+        if name in PARENTS:
+            parent, pointer = PARENTS[name]
+            edits.setdefault(parent, {})[pointer] = rel
+        else:
+            index = chain.index(name)
+            if index == 0:
+                plan.patch(base + 4, struct.pack(endian + "L", rel))
+            else:
+                previous = chain[index - 1]
+                next_rel[previous] = rel  # Used if the previous IFD is itself rebuilt
+                plan.patch(layout.ifd(previous).next_pos, struct.pack(endian + "L", rel))
+    return plan
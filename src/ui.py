@@ -1,7 +1,28 @@
 import os
+import logging
+import queue
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
+from .cli import iter_files
 from .core import MetadataManager
+from .widgets import FileListModel, FileListView, TagGrid
+
+log = logging.getLogger(__name__)
+
+IO_WORKERS = 4          # Background threads for load/save/prefetch
+POLL_MS = 25            # How often the Tk loop drains finished background jobs
+PREFETCH_RADIUS = 1     # Files above/below the selection to load ahead
+PREFETCH_LIMIT = 16     # Prefetched results kept in memory
+FOLDER_BATCH = 500      # Paths per sidebar update while a folder is being scanned
+
+# Fields that can't be changed by metadata editing (shown disabled)
+READONLY_KEYS = {"File:Size", "@Resolution", "@Format", "@Mode", "@Frames", "@Duration", "@Bitrate", "@SampleRate", "@Channels", "@Encoder", "@Pages"}
+
+
+def is_readonly_key(key):
+    return key.startswith("@") or key in READONLY_KEYS
 
 class App(ctk.CTk):
     def __init__(self):
@@ -20,10 +41,91 @@ class App(ctk.CTk):
             except Exception:
                 pass # Linux/Mac often handle icons differently or fail on .ico bitmaps
 
-        self.files = []
+        self.files = FileListModel()
         self.current_idx = None
 
+        # Background I/O: jobs run on the pool and post callbacks to _done, which
+        # _drain_done runs on the Tk thread (Tk is not thread-safe).
+        self._pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="metaexif-io")
+        self._done = queue.SimpleQueue()
+        self._closing = False
+        self._load_token = 0     # Bumped per selection; older load results are dropped
+        self._generation = 0     # Bumped per save; prefetches started before it are dropped
+        self._prefetched = OrderedDict()  # path -> (identity, meta)
+        self._prefetching = set()
+        self._saving = False
+
         self._setup_ui()
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        self._poll_id = self.after(POLL_MS, self._drain_done)
+
+    # --- Background jobs ---
+
+    def _submit(self, callback, fn, *args):
+        """Runs fn(*args) on the pool; callback(future) runs later on the Tk thread."""
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(lambda f: self._done.put(lambda: callback(f)))
+        return future
+
+    def _drain_done(self):
+        try:
+            while True:
+                job = self._done.get_nowait()
+                try:
+                    job()
+                except Exception:
+                    log.exception("Background callback failed")
+        except queue.Empty:
+            pass
+        self._poll_id = self.after(POLL_MS, self._drain_done)
+
+    def _on_close(self):
+        # Drop queued prefetches and stop folder scans, but let a running save finish
+        self._closing = True
+        self.after_cancel(self._poll_id)
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self.destroy()
+
+    @staticmethod
+    def _identity(path):
+        try:
+            st = os.stat(path)
+            return st.st_size, st.st_mtime_ns
+        except OSError:
+            return None
+
+    def _take_prefetched(self, path):
+        entry = self._prefetched.pop(path, None)
+        if entry and entry[0] == self._identity(path):
+            return entry[1]
+        return None
+
+    def _prefetch_neighbours(self, path):
+        idx = self.files.get_index(path)
+        if idx is None:
+            return
+        for i in range(idx - PREFETCH_RADIUS, idx + PREFETCH_RADIUS + 1):
+            if i == idx or not 0 <= i < len(self.files):
+                continue
+            p = self.files[i]
+            if p in self._prefetched or p in self._prefetching:
+                continue
+            self._prefetching.add(p)
+            generation = self._generation
+            self._submit(lambda f, p=p, g=generation: self._on_prefetched(p, g, f),
+                         self._load_with_identity, p)
+
+    def _load_with_identity(self, path):
+        identity = self._identity(path)  # Taken first: a later change makes the entry stale
+        return identity, MetadataManager.load(path)
+
+    def _on_prefetched(self, path, generation, future):
+        self._prefetching.discard(path)
+        if generation != self._generation or path not in self.files or future.exception():
+            return
+        self._prefetched[path] = future.result()
+        while len(self._prefetched) > PREFETCH_LIMIT:
+            self._prefetched.popitem(last=False)
 
     def _setup_ui(self):
         # Layout: Grid 1x2
@@ -33,17 +135,20 @@ class App(ctk.CTk):
         # LEFT SIDEBAR
         self.sidebar = ctk.CTkFrame(self, width=250, corner_radius=0)
         self.sidebar.grid(row=0, column=0, sticky="nsew")
-        self.sidebar.grid_rowconfigure(2, weight=1)
+        self.sidebar.grid_rowconfigure(3, weight=1)
 
         self.logo_label = ctk.CTkLabel(self.sidebar, text="MetaExif Pro", font=ctk.CTkFont(size=20, weight="bold"))
         self.logo_label.grid(row=0, column=0, padx=20, pady=(20, 10))
 
         self.btn_add_files = ctk.CTkButton(self.sidebar, text="Add Files", command=self.add_files)
-        self.btn_add_files.grid(row=1, column=0, padx=20, pady=10)
+        self.btn_add_files.grid(row=1, column=0, padx=20, pady=(10, 5))
+
+        self.btn_add_folder = ctk.CTkButton(self.sidebar, text="Add Folder", command=self.add_folder)
+        self.btn_add_folder.grid(row=2, column=0, padx=20, pady=(5, 10))
 
-        # File List
-        self.scroll_files = ctk.CTkScrollableFrame(self.sidebar, label_text="Files")
-        self.scroll_files.grid(row=2, column=0, padx=20, pady=10, sticky="nsew")
+        # File List (virtualized: only the visible rows have widgets)
+        self.file_list = FileListView(self.sidebar, self.files, command=self.load_file)
+        self.file_list.grid(row=3, column=0, padx=20, pady=10, sticky="nsew")
 
         # RIGHT EDITOR
         self.editor = ctk.CTkFrame(self)
@@ -52,11 +157,9 @@ class App(ctk.CTk):
         self.lbl_info = ctk.CTkLabel(self.editor, text="Select a file to edit", font=ctk.CTkFont(size=16))
         self.lbl_info.pack(pady=10)
 
-        # Dynamic Fields Area
-        self.fields_container = ctk.CTkScrollableFrame(self.editor, label_text="Metadata Tags")
-        self.fields_container.pack(fill="both", expand=True, padx=20, pady=10)
-
-        self.rows = [] # List of (key_entry, value_entry, frame) tuples
+        # Dynamic Fields Area (virtualized: row widgets are recycled, not rebuilt per file)
+        self.tag_grid = TagGrid(self.editor, is_readonly=is_readonly_key)
+        self.tag_grid.pack(fill="both", expand=True, padx=20, pady=10)
 
         # Controls
         self.controls = ctk.CTkFrame(self.editor, fg_color="transparent")
@@ -77,78 +180,89 @@ class App(ctk.CTk):
 
     def add_files(self):
         paths = filedialog.askopenfilenames()
-        new_files = []
-        for p in paths:
-            if p not in self.files:
-                self.files.append(p)
-                self._add_file_item(p)
-                new_files.append(p)
+        self._add_paths(paths)
+
+    def add_folder(self):
+        folder = filedialog.askdirectory()
+        if not folder:
+            return
+        self.status.configure(text=f"Scanning {folder}...")
+        self._pool.submit(self._scan_folder, folder)
+
+    def _scan_folder(self, folder):
+        """Runs on the pool: streams the tree into the sidebar in batches."""
+        batch = []
+        for path in iter_files([folder]):
+            if self._closing:
+                return
+            batch.append(os.path.normpath(path))
+            if len(batch) >= FOLDER_BATCH:
+                self._done.put(lambda b=batch: self._add_paths(b))
+                batch = []
+        self._done.put(lambda: self._finish_scan(folder, batch))
+
+    def _finish_scan(self, folder, batch):
+        self._add_paths(batch)
+        self.status.configure(text=f"Added {folder} ({len(self.files)} files)")
+
+    def _add_paths(self, paths):
+        new_files = self.files.extend(paths)
+        if new_files:
+            self.file_list.refresh()
         
         # Auto-select the first file if nothing is selected
         if new_files and self.current_idx is None:
             self.load_file(new_files[0])
 
-    def _add_file_item(self, path):
-        name = os.path.basename(path)
-        btn = ctk.CTkButton(self.scroll_files, text=name, fg_color="transparent", border_width=1,
-                            command=lambda p=path: self.load_file(p))
-        btn.pack(fill="x", pady=2)
+    def _rename_file(self, old_path, new_path):
+        """Points the sidebar row and selection at a renamed file."""
+        self.files.replace(old_path, new_path)
+        if self.current_idx == old_path:
+            self.current_idx = new_path
+        self.file_list.select(self.current_idx)
 
     def load_file(self, path):
         self.current_idx = path
+        self._load_token += 1
+        self.file_list.select(path)
         self.lbl_info.configure(text=os.path.basename(path))
         
         # Clear existing rows
-        for r in self.rows:
-            r[2].destroy()
-        self.rows.clear()
+        self.tag_grid.clear()
         
-        meta = MetadataManager.load(path)
-        
-        # Sort keys for better UX
-        sorted_keys = sorted(meta.keys())
-        for k in sorted_keys:
-            self.add_row(k, meta[k])
+        meta = self._take_prefetched(path)
+        if meta is not None:
+            self._show_meta(path, meta)
+            return
 
-        if not sorted_keys:
+        self.status.configure(text=f"Loading {os.path.basename(path)}...")
+        token = self._load_token
+        self._submit(lambda f: self._on_loaded(path, token, f), MetadataManager.load, path)
+
+    def _on_loaded(self, path, token, future):
+        if token != self._load_token:
+            return  # Selection changed while loading
+        if future.exception():
+            self.status.configure(text=f"Load failed: {future.exception()}")
+            return
+        self._show_meta(path, future.result())
+
+    def _show_meta(self, path, meta):
+        # Sorted by key for better UX
+        self.tag_grid.set_tags(meta)
+
+        if not meta:
              self.status.configure(text=f"Loaded {os.path.basename(path)} (No tags found)")
         else:
              self.status.configure(text=f"Loaded {os.path.basename(path)}")
 
+        self._prefetch_neighbours(path)
+
     def add_empty_row(self):
         self.add_row("", "")
 
     def add_row(self, key, value):
-        row_frame = ctk.CTkFrame(self.fields_container, fg_color="transparent")
-        row_frame.pack(fill="x", pady=2)
-        
-        # Key Entry
-        k_entry = ctk.CTkEntry(row_frame, width=150, placeholder_text="Key")
-        k_entry.insert(0, str(key))
-        k_entry.pack(side="left", padx=(0, 5))
-        
-        # Value Entry
-        v_entry = ctk.CTkEntry(row_frame, placeholder_text="Value")
-        v_entry.insert(0, str(value))
-        v_entry.pack(side="left", fill="x", expand=True, padx=5)
-        
-        # Mark read-only fields as disabled (can't be changed by metadata editing)
-        readonly_keys = ["File:Size", "@Resolution", "@Format", "@Mode", "@Frames", "@Duration", "@Bitrate", "@SampleRate", "@Channels", "@Encoder", "@Pages"]
-        if key.startswith("@") or key in readonly_keys:
-            v_entry.configure(state="disabled", fg_color="#1a1a1a", text_color="gray")
-            k_entry.configure(state="disabled", fg_color="#1a1a1a", text_color="gray")
-        
-        # Delete Button
-        btn_del = ctk.CTkButton(row_frame, text="X", width=30, fg_color="red", 
-                                command=lambda f=row_frame: self.delete_row(f))
-        btn_del.pack(side="right")
-        
-        self.rows.append((k_entry, v_entry, row_frame))
-
-    def delete_row(self, frame):
-        # Remove from list
-        self.rows = [r for r in self.rows if r[2] != frame]
-        frame.destroy()
+        self.tag_grid.add_tag(str(key), str(value))
 
     def open_preset_dialog(self):
         from .presets import PRESETS
@@ -177,7 +291,7 @@ class App(ctk.CTk):
             zone_id_path = self.current_idx + ":Zone.Identifier"
             if os.path.exists(zone_id_path):
                 os.remove(zone_id_path)
-                print("[Mimicry] Removed Zone.Identifier (download trace)")
+                log.debug("Removed Zone.Identifier (download trace)")
         except:
             pass  # Not all systems support ADS removal this way
         
@@ -198,19 +312,8 @@ class App(ctk.CTk):
 
             os.rename(current_path, new_path)
             
-            # Update Internal State
-            if current_path in self.files:
-                self.files[self.files.index(current_path)] = new_path
-            self.current_idx = new_path
-            
-            # Update UI List
-            for widget in self.scroll_files.winfo_children():
-                 # Finding the button by checking its command bound value is hard with lambda
-                 # Relying on text match (unsafe if duplicates) or just reloading list completely
-                 # Simplest: Update text if it matches old name
-                 if widget.cget("text") == os.path.basename(current_path):
-                     widget.configure(text=os.path.basename(new_path))
-                     widget.configure(command=lambda p=new_path: self.load_file(p))
+            # Update Internal State and UI List
+            self._rename_file(current_path, new_path)
             
             self.lbl_info.configure(text=os.path.basename(new_path))
 
@@ -220,38 +323,30 @@ class App(ctk.CTk):
 
         # 2. Apply Metadata
         new_data = PRESETS[preset_name]()
-        existing_keys = {}
-        for idx, (k_entry, v_entry, _) in enumerate(self.rows):
-             existing_keys[k_entry.get().strip()] = v_entry
-        
         for k, v in new_data.items():
-            if k in existing_keys:
-                existing_keys[k].delete(0, "end")
-                existing_keys[k].insert(0, str(v))
-                existing_keys[k].configure(fg_color="#2B2B2B") # Highlight change
-            else:
-                self.add_row(k, v)
+            self.tag_grid.set_value(k, str(v), highlight=True) # Highlight change
         
         # Update File:Path display if present
-        if "File:Path" in existing_keys:
-            existing_keys["File:Path"].delete(0, "end")
-            existing_keys["File:Path"].insert(0, new_path)
+        if self.tag_grid.has_key("File:Path"):
+            self.tag_grid.set_value("File:Path", new_path)
 
         self.status.configure(text=f"Applying {preset_name}...")
         
         # AUTO-SAVE immediately after applying preset
-        self.save_metadata()
-        
-        messagebox.showinfo("Mimicry Complete", f"File: {os.path.basename(new_path)}\nDevice: {preset_name}\nAll metadata written to disk!")
+        self.save_metadata(on_saved=lambda: messagebox.showinfo(
+            "Mimicry Complete", f"File: {os.path.basename(new_path)}\nDevice: {preset_name}\nAll metadata written to disk!"))
 
-    def save_metadata(self):
+    def save_metadata(self, on_saved=None):
         if not self.current_idx:
             return
+        if self._saving:
+            self.status.configure(text="A save is already in progress")
+            return
 
         data = {}
-        for k_entry, v_entry, _ in self.rows:
-            k = k_entry.get().strip()
-            v = v_entry.get().strip()
+        for k, v in self.tag_grid.items():
+            k = k.strip()
+            v = v.strip()
             if k:
                 data[k] = v
         
@@ -263,38 +358,41 @@ class App(ctk.CTk):
             try:
                 # Rename/Move the file
                 os.rename(current_path, new_path)
-                print(f"[UI] File renamed: {current_path} -> {new_path}")
+                log.info("File renamed: %s -> %s", current_path, new_path)
                 
-                # Update internal state
-                if current_path in self.files:
-                    self.files[self.files.index(current_path)] = new_path
-                self.current_idx = new_path
+                # Update internal state and sidebar row
+                self._rename_file(current_path, new_path)
                 current_path = new_path
-                
-                # Update sidebar button
-                for widget in self.scroll_files.winfo_children():
-                    if hasattr(widget, 'cget') and widget.cget("text") == os.path.basename(self.current_idx):
-                        pass  # Already correct
-                    elif hasattr(widget, 'cget'):
-                        # Try to find and update
-                        try:
-                            widget.configure(text=os.path.basename(new_path))
-                            widget.configure(command=lambda p=new_path: self.load_file(p))
-                        except:
-                            pass
                             
             except Exception as e:
                 messagebox.showerror("Rename Failed", f"Could not rename file: {e}")
                 return
         
-        # Save metadata to the (possibly new) file
-        MetadataManager.save(current_path, data)
-        
-        # Reload file to show ACTUAL saved data
-        self.load_file(current_path)
-        
-        self.status.configure(text=f"Saved & Reloaded: {os.path.basename(current_path)}")
-        messagebox.showinfo("Success", "Metadata saved! Reloaded from disk.")
+        # Save metadata to the (possibly new) file in the background. The save returns the
+        # file's metadata as now on disk, which repaints the editor if it is still selected.
+        self._saving = True
+        self._generation += 1
+        self._prefetched.pop(current_path, None)
+        self.btn_save.configure(state="disabled")
+        self.status.configure(text=f"Saving {os.path.basename(current_path)}...")
+        token = self._load_token
+        self._submit(lambda f: self._on_saved(current_path, token, f, on_saved),
+                     MetadataManager.save, current_path, data)
+
+    def _on_saved(self, path, token, future, on_saved):
+        self._saving = False
+        self.btn_save.configure(state="normal")
+        if future.exception():
+            self.status.configure(text=f"Save failed: {os.path.basename(path)}")
+            messagebox.showerror("Save Failed", f"Could not save metadata: {future.exception()}")
+            return
+        if token == self._load_token and path == self.current_idx:
+            self._show_meta(path, future.result())
+        self.status.configure(text=f"Saved: {os.path.basename(path)}")
+        if on_saved:
+            on_saved()
+        else:
+            messagebox.showinfo("Success", "Metadata saved!")
 
 if __name__ == "__main__":
     app = App()
@@ -0,0 +1,147 @@
+"""Chunk-level WebP (RIFF) access. Walks the chunk list by seeking, so the image bitstream
+(VP8/VP8L/ALPH/ANMF) is never read, and on writes only ever copied verbatim."""
+import struct
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+RIFF = b"RIFF"
+WEBP = b"WEBP"
+
+VP8X = b"VP8X"
+EXIF = b"EXIF"
+XMP = b"XMP "
+
+# VP8X feature flags
+ICC_FLAG = 0x20
+ALPHA_FLAG = 0x10
+EXIF_FLAG = 0x08
+XMP_FLAG = 0x04
+ANIMATION_FLAG = 0x02
+
+COPY_CHUNK = 1024 * 1024
+
+
+def is_webp(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            header = f.read(12)
+    except OSError:
+        return False
+    return header[:4] == RIFF and header[8:12] == WEBP
+
+
+def iter_chunks(f: BinaryIO) -> Iterator[Tuple[bytes, int, int]]:
+    """Yields (fourcc, data offset, data length) for every chunk inside the RIFF."""
+    f.seek(0)
+    header = f.read(12)
+    if len(header) < 12 or header[:4] != RIFF or header[8:12] != WEBP:
+        raise ValueError("Not a WebP file")
+    end = 8 + struct.unpack("<I", header[4:8])[0]
+    pos = 12
+    while pos + 8 <= end:
+        f.seek(pos)
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return
+        fourcc, length = struct.unpack("<4sI", chunk)
+        yield fourcc, pos + 8, length
+        pos += 8 + length + (length & 1)
+
+
+def read_chunk(path: str, fourcc: bytes) -> Optional[bytes]:
+    """Returns the data of the first chunk with this fourcc, or None."""
+    with open(path, "rb") as f:
+        for ctype, offset, length in iter_chunks(f):
+            if ctype == fourcc:
+                f.seek(offset)
+                return f.read(length)
+    return None
+
+
+def pack_chunk(fourcc: bytes, data: bytes) -> bytes:
+    return fourcc + struct.pack("<I", len(data)) + data + (b"\x00" if len(data) & 1 else b"")
+
+
+def _canvas(f: BinaryIO, fourcc: bytes, offset: int) -> Tuple[int, int, bool]:
+    """(width, height, has alpha) from a simple-format VP8/VP8L bitstream header."""
+    f.seek(offset)
+    head = f.read(10)
+    if fourcc == b"VP8 " and len(head) == 10 and head[3:6] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", head[6:10])
+        return width & 0x3FFF, height & 0x3FFF, False
+    if fourcc == b"VP8L" and len(head) >= 5 and head[0] == 0x2F:
+        bits = struct.unpack("<I", head[1:5])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1, bool(bits >> 28 & 1)
+    raise ValueError(f"Unrecognized WebP bitstream ({fourcc!r})")
+
+
+def _vp8x(flags: int, width: int, height: int) -> bytes:
+    return bytes((flags, 0, 0, 0)) + (width - 1).to_bytes(3, "little") + (height - 1).to_bytes(3, "little")
+
+
+def write_chunks(src_path: str, dst_path: str, exif_bytes: Optional[bytes] = None,
+                 xmp_bytes: Optional[bytes] = None) -> int:
+    """Copies src to dst with the EXIF and/or XMP chunk replaced (None leaves one alone).
+    A replaced chunk keeps its position; a new one goes at the end, EXIF before XMP, as
+    the container spec orders them. A simple (VP8/VP8L only) file gets a VP8X header so it
+    can carry metadata; an existing VP8X has its EXIF/XMP flags updated. Every other chunk
+    is copied byte for byte. Returns bytes written."""
+    if exif_bytes is not None and exif_bytes.startswith(b"Exif\x00\x00"):
+        exif_bytes = exif_bytes[6:]  # The chunk holds the bare TIFF structure
+    new = {fourcc: data for fourcc, data in ((EXIF, exif_bytes), (XMP, xmp_bytes)) if data is not None}
+
+    with open(src_path, "rb") as src:
+        chunks = list(iter_chunks(src))
+        fourccs = [c[0] for c in chunks]
+        # Output plan: (fourcc, bytes to write) or (fourcc, (start, end) range of src to copy)
+        plan: List[Tuple[bytes, object]] = []
+        for fourcc, offset, length in chunks:
+            if fourcc not in new:
+                plan.append((fourcc, (offset - 8, offset + length + (length & 1))))
+            elif fourcc not in (p[0] for p in plan):  # Later duplicates are dropped
+                plan.append((fourcc, pack_chunk(fourcc, new[fourcc])))
+        kinds = [p[0] for p in plan]
+        if EXIF in new and EXIF not in kinds:
+            plan.insert(kinds.index(XMP) if XMP in kinds else len(plan), (EXIF, pack_chunk(EXIF, new[EXIF])))
+        if XMP in new and XMP not in kinds:
+            plan.append((XMP, pack_chunk(XMP, new[XMP])))
+
+        kinds = [p[0] for p in plan]
+        flags = (EXIF_FLAG if EXIF in kinds else 0) | (XMP_FLAG if XMP in kinds else 0)
+        if VP8X in fourccs:
+            src.seek(chunks[fourccs.index(VP8X)][1])
+            header = bytearray(src.read(10))
+            header[0] = header[0] & ~(EXIF_FLAG | XMP_FLAG) & 0xFF | flags
+            plan[kinds.index(VP8X)] = (VP8X, pack_chunk(VP8X, bytes(header)))
+        elif new:
+            bitstream = next((c for c in chunks if c[0] in (b"VP8 ", b"VP8L")), None)
+            if bitstream is None:
+                raise ValueError("WebP file has neither VP8X nor a VP8/VP8L bitstream")
+            width, height, alpha = _canvas(src, bitstream[0], bitstream[1])
+            flags |= ALPHA_FLAG if alpha else 0
+            plan.insert(0, (VP8X, pack_chunk(VP8X, _vp8x(flags, width, height))))
+
+        body = sum(len(p) if isinstance(p, bytes) else p[1] - p[0] for _, p in plan)
+        if body + 4 > 0xFFFFFFFF:
+            raise ValueError("WebP file would exceed the 4 GB RIFF limit")
+        with open(dst_path, "wb") as dst:
+            dst.write(RIFF + struct.pack("<I", body + 4) + WEBP)
+            written = 12
+            for _, piece in plan:
+                if isinstance(piece, bytes):
+                    dst.write(piece)
+                    written += len(piece)
+                else:
+                    written += _copy_range(src, dst, *piece)
+    return written
+
+
+def _copy_range(src: BinaryIO, dst: BinaryIO, start: int, end: int) -> int:
+    src.seek(start)
+    copied = 0
+    while start + copied < end:
+        buf = src.read(min(COPY_CHUNK, end - start - copied))
+        if not buf:
+            raise ValueError("Truncated WebP chunk")
+        dst.write(buf)
+        copied += len(buf)
+    return copied
@@ -0,0 +1,390 @@
+"""Virtualized widgets: a fixed pool of row widgets is rebound to a backing model on
+scroll, so the widget count depends on the viewport height, not on the number of items."""
+import os
+
+import customtkinter as ctk
+
+READONLY_FG = "#1a1a1a"
+HIGHLIGHT_FG = "#2B2B2B"
+WHEEL_ROWS = 3  # Rows scrolled per mouse wheel notch
+
+
+def wheel_steps(event) -> int:
+    """Normalizes a wheel event to -1 (up) / +1 (down) across X11, Windows and macOS."""
+    if getattr(event, "num", None) == 4:
+        return -1
+    if getattr(event, "num", None) == 5:
+        return 1
+    return -1 if event.delta > 0 else 1
+
+
+class VirtualList(ctk.CTkFrame):
+    """Scrollable column of recycled row widgets ("slots").
+
+    Subclasses provide the items (_item_count/_item) and how to build and fill a slot
+    (_make_slot/_bind_slot). Every slot has .frame and .row (the item it shows, or None).
+    Row 0 of the grid is free for a header widget; the list itself lives in row 1."""
+
+    ROW_HEIGHT = 32
+
+    def __init__(self, master, **kwargs):
+        super().__init__(master, **kwargs)
+        self._first = 0    # Index of the top visible item
+        self._slots = []
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        self.body = ctk.CTkFrame(self, fg_color="transparent")
+        self.body.grid(row=1, column=0, sticky="nsew", padx=(5, 0), pady=5)
+        self.body.grid_propagate(False)
+        self.body.grid_columnconfigure(0, weight=1)
+        self.body.bind("<Configure>", lambda e: self._render())
+
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=1, column=1, sticky="ns", pady=5)
+
+        self._bind_wheel(self.body)
+
+    def _item_count(self) -> int:
+        raise NotImplementedError
+
+    def _item(self, index: int):
+        raise NotImplementedError
+
+    def _make_slot(self):
+        raise NotImplementedError
+
+    def _bind_slot(self, slot, item):
+        raise NotImplementedError
+
+    def _before_rebind(self):
+        """Called before slots may be bound to other items (TagGrid saves edits here)."""
+
+    def scroll_to(self, first: int):
+        self._before_rebind()
+        self._first = max(0, min(first, self._item_count() - self._visible_count()))
+        self._render()
+
+    def ensure_visible(self, index: int):
+        visible = self._visible_count()
+        if index < self._first:
+            self.scroll_to(index)
+        elif index >= self._first + visible:
+            self.scroll_to(index - visible + 1)
+
+    def _visible_count(self) -> int:
+        return max(1, self.body.winfo_height() // self.ROW_HEIGHT)
+
+    def _render(self, force: bool = False):
+        visible = self._visible_count()
+        total = self._item_count()
+        while len(self._slots) < visible:
+            slot = self._make_slot()
+            self._bind_wheel(slot.frame)
+            self._slots.append(slot)
+        self._first = max(0, min(self._first, total - visible))
+        for i, slot in enumerate(self._slots):
+            idx = self._first + i
+            if i < visible and idx < total:
+                item = self._item(idx)
+                if force or slot.row is None or slot.row != item:
+                    self._bind_slot(slot, item)
+                if not slot.frame.winfo_ismapped():
+                    slot.frame.grid(row=i, column=0, sticky="ew", pady=2)
+            elif slot.row is not None or slot.frame.winfo_ismapped():
+                slot.row = None
+                slot.frame.grid_remove()
+        if total > visible:
+            self.scrollbar.set(self._first / total, (self._first + visible) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _unbind_all(self):
+        for slot in self._slots:
+            slot.row = None
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self._item_count()))
+        else:
+            step = self._visible_count() if unit == "pages" else 1
+            self.scroll_to(self._first + int(amount) * step)
+
+    def _on_wheel(self, event):
+        self.scroll_to(self._first + wheel_steps(event) * WHEEL_ROWS)
+        return "break"
+
+    def _bind_wheel(self, widget):
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            widget.bind(sequence, self._on_wheel, add="+")
+
+
+class TagRow:
+    __slots__ = ("key", "value", "highlight")
+
+    def __init__(self, key: str, value: str, highlight: bool = False):
+        self.key = key
+        self.value = value
+        self.highlight = highlight
+
+
+class _TagSlot:
+    """One recycled row of widgets and the model row it currently shows (or None)."""
+    __slots__ = ("frame", "key_entry", "value_entry", "btn_del", "row")
+
+    def __init__(self, frame, key_entry, value_entry, btn_del):
+        self.frame = frame
+        self.key_entry = key_entry
+        self.value_entry = value_entry
+        self.btn_del = btn_del
+        self.row = None
+
+
+class TagGrid(VirtualList):
+    """Key/value editor over a list of TagRow.
+
+    Only as many rows are built as fit in the viewport; scrolling and filtering rebind them
+    to other TagRows. Edits live in the widgets until the row is unbound (scroll, filter,
+    delete) or items() is called, at which point they are synced back into the model."""
+
+    def __init__(self, master, is_readonly=lambda key: False, **kwargs):
+        super().__init__(master, **kwargs)
+        self.is_readonly = is_readonly
+        self._rows = []    # All TagRows, in display order
+        self._view = []    # The TagRows matching the filter
+        self._entry_fg = ctk.ThemeManager.theme["CTkEntry"]["fg_color"]
+        self._entry_text = ctk.ThemeManager.theme["CTkEntry"]["text_color"]
+
+        self.filter_entry = ctk.CTkEntry(self, placeholder_text="Filter tags...")
+        self.filter_entry.grid(row=0, column=0, columnspan=2, sticky="ew", padx=5, pady=(5, 2))
+        self.filter_entry.bind("<KeyRelease>", lambda e: self._apply_filter())
+
+    # --- Model API ---
+
+    def set_tags(self, tags):
+        """Replaces the model with (key, value) pairs from a dict, sorted by key."""
+        self._rows = [TagRow(str(k), str(tags[k])) for k in sorted(tags)]
+        self._unbind_all()
+        self._first = 0
+        self._apply_filter(sync=False)
+
+    def clear(self):
+        self.set_tags({})
+
+    def add_tag(self, key: str = "", value: str = "", highlight: bool = False):
+        """Appends a row and scrolls to it. Clears the filter so the new row is visible."""
+        self._sync()
+        row = TagRow(key, value, highlight)
+        self._rows.append(row)
+        if self.filter_entry.get():
+            self.filter_entry.delete(0, "end")
+        self._apply_filter(sync=False)
+        self.scroll_to(len(self._view))
+        return row
+
+    def set_value(self, key: str, value: str, highlight: bool = False):
+        """Updates the first row with this key, or appends one."""
+        self._sync()
+        for row in self._rows:
+            if row.key == key:
+                row.value = str(value)
+                row.highlight = row.highlight or highlight
+                self._render(force=True)
+                return
+        self.add_tag(key, str(value), highlight)
+
+    def has_key(self, key: str) -> bool:
+        self._sync()
+        return any(row.key == key for row in self._rows)
+
+    def items(self):
+        """Current (key, value) pairs, including unsynced edits in the visible rows."""
+        self._sync()
+        return [(row.key, row.value) for row in self._rows]
+
+    def __len__(self):
+        return len(self._rows)
+
+    # --- Viewport ---
+
+    def _item_count(self) -> int:
+        return len(self._view)
+
+    def _item(self, index: int) -> TagRow:
+        return self._view[index]
+
+    def _before_rebind(self):
+        self._sync()
+
+    def _apply_filter(self, sync: bool = True):
+        if sync:
+            self._sync()
+        needle = self.filter_entry.get().strip().lower()
+        if needle:
+            self._view = [r for r in self._rows if needle in r.key.lower() or needle in r.value.lower()]
+        else:
+            self._view = list(self._rows)
+        self._first = 0
+        self._render()
+
+    # --- Slots ---
+
+    def _make_slot(self) -> _TagSlot:
+        frame = ctk.CTkFrame(self.body, fg_color="transparent")
+        frame.grid_columnconfigure(1, weight=1)
+
+        # Key Entry
+        k_entry = ctk.CTkEntry(frame, width=150, placeholder_text="Key")
+        k_entry.grid(row=0, column=0, padx=(0, 5))
+
+        # Value Entry
+        v_entry = ctk.CTkEntry(frame, placeholder_text="Value")
+        v_entry.grid(row=0, column=1, sticky="ew", padx=5)
+
+        # Delete Button
+        btn_del = ctk.CTkButton(frame, text="X", width=30, fg_color="red")
+        btn_del.grid(row=0, column=2)
+
+        slot = _TagSlot(frame, k_entry, v_entry, btn_del)
+        btn_del.configure(command=lambda s=slot: self._delete_slot(s))
+        for widget in (k_entry, v_entry, btn_del):
+            self._bind_wheel(widget)
+        return slot
+
+    def _bind_slot(self, slot: _TagSlot, row: TagRow):
+        slot.row = row
+        readonly = self.is_readonly(row.key)
+        for entry, text in ((slot.key_entry, row.key), (slot.value_entry, row.value)):
+            entry.configure(state="normal")
+            entry.delete(0, "end")
+            if text:
+                entry.insert(0, text)
+            if readonly:
+                entry.configure(state="disabled", fg_color=READONLY_FG, text_color="gray")
+            else:
+                entry.configure(fg_color=self._entry_fg, text_color=self._entry_text)
+        if row.highlight and not readonly:
+            slot.value_entry.configure(fg_color=HIGHLIGHT_FG)
+
+    def _sync(self):
+        """Copies edits from bound, editable slots back into their TagRows."""
+        for slot in self._slots:
+            row = slot.row
+            if row is not None and not self.is_readonly(row.key):
+                row.key = slot.key_entry.get()
+                row.value = slot.value_entry.get()
+
+    def _delete_slot(self, slot: _TagSlot):
+        row = slot.row
+        if row is None:
+            return
+        self._sync()
+        self._rows.remove(row)
+        self._view.remove(row)
+        self._render()
+
+
+class FileListModel:
+    """Ordered list of paths with O(1) membership and path -> row lookup."""
+
+    def __init__(self):
+        self._paths = []
+        self._rows = {}
+
+    def add(self, path: str) -> bool:
+        """Appends path unless already present. Returns True if it was added."""
+        if path in self._rows:
+            return False
+        self._rows[path] = len(self._paths)
+        self._paths.append(path)
+        return True
+
+    def extend(self, paths):
+        """Adds paths in order, skipping duplicates. Returns the ones actually added."""
+        return [p for p in paths if self.add(p)]
+
+    def replace(self, old: str, new: str) -> bool:
+        """Renames an entry in place, keeping its row."""
+        row = self._rows.pop(old, None)
+        if row is None:
+            return False
+        self._paths[row] = new
+        self._rows[new] = row
+        return True
+
+    def index(self, path: str) -> int:
+        return self._rows[path]
+
+    def get_index(self, path: str):
+        return self._rows.get(path)
+
+    def __contains__(self, path) -> bool:
+        return path in self._rows
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def __getitem__(self, row: int) -> str:
+        return self._paths[row]
+
+    def __iter__(self):
+        return iter(self._paths)
+
+
+class _FileSlot:
+    __slots__ = ("frame", "button", "row")
+
+    def __init__(self, frame, button):
+        self.frame = frame
+        self.button = button
+        self.row = None
+
+
+class FileListView(VirtualList):
+    """Virtualized sidebar list over a FileListModel. command(path) runs on click."""
+
+    ROW_HEIGHT = 32  # CTkButton height + vertical padding
+
+    def __init__(self, master, model: FileListModel, command, label_text: str = "Files", **kwargs):
+        super().__init__(master, **kwargs)
+        self.model = model
+        self.command = command
+        self.selected = None
+        self._button_fg = ctk.ThemeManager.theme["CTkButton"]["fg_color"]
+
+        self.label = ctk.CTkLabel(self, text=label_text)
+        self.label.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(5, 0))
+
+    def refresh(self):
+        """Re-renders after the model changed (items added or renamed)."""
+        self.label.configure(text=f"Files ({len(self.model)})")
+        self._render(force=True)
+
+    def select(self, path: str):
+        self.selected = path
+        row = self.model.get_index(path)
+        if row is not None:
+            self.ensure_visible(row)
+        self._render(force=True)
+
+    def _item_count(self) -> int:
+        return len(self.model)
+
+    def _item(self, index: int) -> str:
+        return self.model[index]
+
+    def _make_slot(self) -> _FileSlot:
+        frame = ctk.CTkFrame(self.body, fg_color="transparent")
+        frame.grid_columnconfigure(0, weight=1)
+        button = ctk.CTkButton(frame, text="", fg_color="transparent", border_width=1, anchor="w")
+        button.grid(row=0, column=0, sticky="ew")
+        slot = _FileSlot(frame, button)
+        button.configure(command=lambda s=slot: s.row is not None and self.command(s.row))
+        self._bind_wheel(button)
+        return slot
+
+    def _bind_slot(self, slot: _FileSlot, path: str):
+        slot.row = path
+        fg = self._button_fg if path == self.selected else "transparent"
+        slot.button.configure(text=os.path.basename(path), fg_color=fg)
@@ -0,0 +1,482 @@
+"""XMP packets: locating them in each container, flattening them into XMP:prefix:name
+keys, and writing them back.
+
+Locators read only what leads to the packet (JPEG marker headers, PNG/RIFF chunk
+headers, TIFF IFD 0, the PDF catalog, MP4 top-level and moov/udta box headers), never
+the image or media data. Packets are parsed with iterparse, one top-level property at a
+time, so memory stays bounded by the largest property rather than the whole tree.
+
+A packet carries whitespace padding before its <?xpacket end="w"?> trailer so editors
+can rewrite it in place. Writes use it: when the edited packet fits in the old one's
+bytes, only those bytes (plus a PNG chunk CRC) are overwritten. Otherwise the container
+is rewritten through its own module and the new packet gets fresh padding (for MP4/MOV,
+the box writer in mp4, which moves media and relocates chunk offsets only when it must).
+"""
+import io
+import logging
+import os
+import re
+import struct
+import xml.etree.ElementTree as ET
+import zlib
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from . import instrument, jpeg, mp4, pdf, png, scan, sniff, tiff, webp
+
+log = logging.getLogger(__name__)
+
+PREFIX = "XMP:"
+
+X_NS = "adobe:ns:meta/"
+RDF_NS = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+XML_LANG = "{http://www.w3.org/XML/1998/namespace}lang"
+
+# Preferred prefix -> namespace URI. Keys use these prefixes whatever the packet declares.
+NAMESPACES = {
+    "dc": "http://purl.org/dc/elements/1.1/",
+    "xmp": "http://ns.adobe.com/xap/1.0/",
+    "xmpMM": "http://ns.adobe.com/xap/1.0/mm/",
+    "xmpRights": "http://ns.adobe.com/xap/1.0/rights/",
+    "xmpDM": "http://ns.adobe.com/xmp/1.0/DynamicMedia/",
+    "stEvt": "http://ns.adobe.com/xap/1.0/sType/ResourceEvent#",
+    "stRef": "http://ns.adobe.com/xap/1.0/sType/ResourceRef#",
+    "photoshop": "http://ns.adobe.com/photoshop/1.0/",
+    "tiff": "http://ns.adobe.com/tiff/1.0/",
+    "exif": "http://ns.adobe.com/exif/1.0/",
+    "exifEX": "http://cipa.jp/exif/1.0/",
+    "aux": "http://ns.adobe.com/exif/1.0/aux/",
+    "crs": "http://ns.adobe.com/camera-raw-settings/1.0/",
+    "lr": "http://ns.adobe.com/lightroom/1.0/",
+    "pdf": "http://ns.adobe.com/pdf/1.3/",
+    "pdfx": "http://ns.adobe.com/pdfx/1.3/",
+    "pdfaid": "http://www.aiim.org/pdfa/ns/id/",
+    "Iptc4xmpCore": "http://iptc.org/std/Iptc4xmpCore/1.0/xmlns/",
+    "Iptc4xmpExt": "http://iptc.org/std/Iptc4xmpExt/2008-02-29/",
+}
+_PREFIXES = {uri: prefix for prefix, uri in NAMESPACES.items()}
+
+# Array type of standard properties, used when a new one is added (others become simple values)
+ARRAYS = {
+    "dc:title": "Alt", "dc:description": "Alt", "dc:rights": "Alt",
+    "dc:creator": "Seq", "dc:date": "Seq", "dc:contributor": "Bag", "dc:language": "Bag",
+    "dc:publisher": "Bag", "dc:subject": "Bag", "dc:type": "Bag", "dc:relation": "Bag",
+    "xmp:Identifier": "Bag", "xmpRights:Owner": "Bag", "xmpRights:UsageTerms": "Alt",
+    "photoshop:SupplementalCategories": "Bag", "lr:hierarchicalSubject": "Bag",
+}
+LIST_SEPARATOR = "; "
+
+# MP4/MOV: top-level uuid box holding XMP, and QuickTime's moov/udta/XMP_
+MP4_UUID = bytes.fromhex("BE7ACFCB97A942E89C71999491E3AFAC")
+
+# TIFF tag holding the packet in IFD 0
+TIFF_TAG = 700
+
+PACKET_ID = "W5M0MpCehiHzreSzNTczkc9d"
+PACKET_HEADER = f'<?xpacket begin="\ufeff" id="{PACKET_ID}"?>\n'
+PACKET_TRAILER = '<?xpacket end="w"?>'
+PADDING = 2048
+_READ_ONLY = re.compile(rb"<\?xpacket\s+end=['\"]r['\"]")
+
+_EMPTY = (f'<x:xmpmeta xmlns:x="{X_NS}"><rdf:RDF xmlns:rdf="{RDF_NS}">'
+          f'<rdf:Description rdf:about=""/></rdf:RDF></x:xmpmeta>').encode()
+
+
+class Packet(NamedTuple):
+    data: bytes
+    offset: Optional[int]  # File offset of data; None when it can't be overwritten in place
+    chunk: Optional[Tuple[int, int]] = None  # PNG: (data offset, length) of the iTXt, for its CRC
+
+    @property
+    def writable(self) -> bool:
+        return self.offset is not None and not _READ_ONLY.search(self.data)
+
+
+class WriteStats(NamedTuple):
+    in_place: bool
+    bytes_written: int
+
+
+# --- Locating -------------------------------------------------------------
+
+def kind_of(path: str) -> Optional[str]:
+    return sniff.detect(sniff.read_prefix(path), os.path.splitext(path)[1].lower())
+
+
+def locate(path: str, kind: Optional[str] = None) -> Optional[Packet]:
+    """The file's XMP packet, or None if it has none (or the container isn't supported)."""
+    kind = kind or kind_of(path)
+    locator = _LOCATORS.get(kind)
+    return locator(path) if locator is not None else None
+
+
+def _locate_jpeg(path: str) -> Optional[Packet]:
+    with scan.mapped(path) as buf:
+        layout = scan.scan_jpeg(buf)
+        for s in layout.find(scan.APP1):
+            if bytes(buf[s.start:s.start + len(scan.XMP_HEADER)]) == scan.XMP_HEADER:
+                start = s.start + len(scan.XMP_HEADER)
+                return Packet(bytes(buf[start:s.start + s.length]), start)
+    return None
+
+
+def _locate_png(path: str) -> Optional[Packet]:
+    keyword = png.XMP_KEYWORD.encode("latin-1") + b"\x00"
+    with open(path, "rb") as f:
+        for ctype, offset, length in png.iter_chunks(f):
+            if ctype != b"iTXt" or length < len(keyword):
+                continue
+            f.seek(offset)
+            if f.read(len(keyword)) != keyword:
+                continue
+            f.seek(offset)
+            body = f.read(length)
+            rest = body[len(keyword):]
+            compressed = rest[:1] == b"\x01"
+            _, _, rest = rest[2:].partition(b"\x00")  # Language tag
+            _, _, text = rest.partition(b"\x00")  # Translated keyword
+            if compressed:
+                return Packet(zlib.decompress(text), None)
+            return Packet(text, offset + length - len(text), (offset, length))
+    return None
+
+
+def _locate_webp(path: str) -> Optional[Packet]:
+    with open(path, "rb") as f:
+        for fourcc, offset, length in webp.iter_chunks(f):
+            if fourcc == webp.XMP:
+                f.seek(offset)
+                return Packet(f.read(length), offset)
+    return None
+
+
+def _locate_tiff(path: str) -> Optional[Packet]:
+    with scan.mapped(path) as buf:
+        layout = scan.scan_tiff(buf)
+        zeroth = layout.ifd("0th")
+        entry = zeroth.get(TIFF_TAG) if zeroth is not None else None
+        if entry is None or entry.inline or entry.value_offset + entry.size > len(buf):
+            return None
+        return Packet(bytes(buf[entry.value_offset:entry.value_offset + entry.size]), entry.value_offset)
+
+
+def _locate_pdf(path: str) -> Optional[Packet]:
+    with open(path, "rb") as f:
+        doc = pdf.PdfFile(f)
+        ref = doc.root().get("Metadata")
+        span = doc.stream_span(ref)
+        if span is None:
+            return None
+        d, offset, length = span
+        if "Filter" in d:  # Compressed: readable, but only replaceable as a whole
+            return Packet(doc.stream(ref), None)
+        return Packet(doc.read(offset, length), offset)
+
+
+def _locate_mp4(path: str) -> Optional[Packet]:
+    with open(path, "rb") as f:
+        box = mp4.find_uuid(f, MP4_UUID)
+        if box is not None:
+            f.seek(box.start + 16)
+            return Packet(f.read(box.size - 16), box.start + 16)
+        box = mp4.find(f, b"moov/udta/XMP_")
+        if box is not None:
+            f.seek(box.start)
+            return Packet(f.read(box.size), box.start)
+    return None
+
+
+_LOCATORS = {
+    "jpeg": _locate_jpeg, "png": _locate_png, "webp": _locate_webp, "tiff": _locate_tiff,
+    "pdf": _locate_pdf, "mp4": _locate_mp4,
+}
+
+
+# --- Reading --------------------------------------------------------------
+
+def _strip(data: bytes) -> bytes:
+    """Packet bytes an XML parser accepts: without NUL padding some writers use."""
+    return data.rstrip(b"\x00 \t\r\n")
+
+
+def _name(tag: str, declared: Dict[str, str]) -> str:
+    """prefix:local for a Clark-notation tag, preferring the standard prefix."""
+    if not tag.startswith("{"):
+        return tag
+    uri, _, local = tag[1:].partition("}")
+    prefix = _PREFIXES.get(uri) or declared.get(uri) or "ns"
+    return f"{prefix}:{local}"
+
+
+def _values(elem: ET.Element, key: str, declared: Dict[str, str], out: Dict[str, str]):
+    """Flattens one property element into out: simple values as text, Alt as its x-default
+    (else first) item, Bag/Seq as their items joined by LIST_SEPARATOR, struct fields as
+    key/field."""
+    resource = elem.get(f"{{{RDF_NS}}}resource")
+    if resource is not None:
+        out[key] = resource
+        return
+    children = list(elem)
+    if elem.get(f"{{{RDF_NS}}}parseType") == "Resource":
+        for child in children:
+            _values(child, f"{key}/{_name(child.tag, declared)}", declared, out)
+        return
+    if not children:
+        out[key] = (elem.text or "").strip()
+        return
+    inner = children[0]
+    if inner.tag == f"{{{RDF_NS}}}Description":
+        for attr, value in inner.attrib.items():
+            if not attr.startswith(f"{{{RDF_NS}}}"):
+                out[f"{key}/{_name(attr, declared)}"] = value
+        for child in inner:
+            _values(child, f"{key}/{_name(child.tag, declared)}", declared, out)
+        return
+    if inner.tag not in (f"{{{RDF_NS}}}Alt", f"{{{RDF_NS}}}Bag", f"{{{RDF_NS}}}Seq"):
+        return  # Qualified values and other RDF forms are not flattened
+    items = [li for li in inner if li.tag == f"{{{RDF_NS}}}li"]
+    if inner.tag == f"{{{RDF_NS}}}Alt":
+        chosen = next((li for li in items if li.get(XML_LANG) == "x-default"), items[0] if items else None)
+        items = [chosen] if chosen is not None else []
+    texts = []
+    for i, li in enumerate(items, 1):
+        if len(li) or li.get(f"{{{RDF_NS}}}parseType") == "Resource":
+            _values(li, f"{key}[{i}]", declared, out)  # Array of structs
+        else:
+            texts.append((li.text or "").strip())
+    if texts or not items:
+        out[key] = LIST_SEPARATOR.join(texts)
+
+
+def parse(data: bytes) -> Dict[str, str]:
+    """Flat XMP:prefix:name -> value view of a packet. Raises ValueError if it isn't XML."""
+    out = {}
+    declared = {}  # URI -> prefix as the packet declares it
+    desc_tag = f"{{{RDF_NS}}}Description"
+    rdf_tag = f"{{{RDF_NS}}}RDF"
+    stack: List[str] = []
+    try:
+        for event, elem in ET.iterparse(io.BytesIO(_strip(data)), events=("start-ns", "start", "end")):
+            if event == "start-ns":
+                declared.setdefault(elem[1], elem[0])
+            elif event == "start":
+                stack.append(elem.tag)
+                if elem.tag == desc_tag and len(stack) > 1 and stack[-2] == rdf_tag:
+                    for attr, value in elem.attrib.items():  # Simple properties in attribute form
+                        if not attr.startswith(f"{{{RDF_NS}}}"):
+                            out[PREFIX + _name(attr, declared)] = value
+            else:
+                stack.pop()
+                if len(stack) >= 2 and stack[-1] == desc_tag and stack[-2] == rdf_tag:
+                    _values(elem, PREFIX + _name(elem.tag, declared), declared, out)
+                    elem.clear()  # Done with this property: drop its subtree
+    except ET.ParseError as e:
+        raise ValueError(f"Malformed XMP packet: {e}")
+    return out
+
+
+def read(path: str, kind: Optional[str] = None) -> Dict[str, str]:
+    """XMP keys of the file at path ({} when there is no packet or it can't be read)."""
+    try:
+        packet = locate(path, kind)
+        return parse(packet.data) if packet is not None else {}
+    except (OSError, ValueError, struct.error, pdf.PdfError) as e:
+        log.debug("XMP read failed for %s: %s", path, e)
+        return {}
+
+
+# --- Writing --------------------------------------------------------------
+
+def _register(data: bytes) -> Dict[str, str]:
+    """Prefix -> URI for every namespace the packet declares plus the standard ones,
+    registered with ElementTree so serializing keeps the prefixes."""
+    known = dict(NAMESPACES)
+    for _, (prefix, uri) in ET.iterparse(io.BytesIO(_strip(data)), events=("start-ns",)):
+        if prefix and uri not in _PREFIXES:
+            known.setdefault(prefix, uri)
+    for prefix, uri in list(known.items()) + [("x", X_NS), ("rdf", RDF_NS)]:
+        try:
+            ET.register_namespace(prefix, uri)
+        except ValueError:  # ElementTree reserves ns0, ns1... for itself
+            pass
+    return known
+
+
+def _set(prop: ET.Element, value: str) -> bool:
+    """Stores value in an existing property element. False for structs, which aren't edited."""
+    children = list(prop)
+    if not children:
+        prop.text = value
+        return True
+    container = children[0]
+    kind = container.tag.partition("}")[2]
+    if kind not in ("Alt", "Bag", "Seq"):
+        return False
+    items = [li for li in container if li.tag == f"{{{RDF_NS}}}li"]
+    if any(len(li) for li in items):
+        return False
+    if kind == "Alt":
+        li = next((li for li in items if li.get(XML_LANG) == "x-default"), items[0] if items else None)
+        if li is None:
+            li = ET.SubElement(container, f"{{{RDF_NS}}}li", {XML_LANG: "x-default"})
+        li.text = value
+        return True
+    for li in items:
+        container.remove(li)
+    for text in value.split(LIST_SEPARATOR) if value else []:
+        ET.SubElement(container, f"{{{RDF_NS}}}li").text = text
+    return True
+
+
+def _add(desc: ET.Element, tag: str, qname: str, value: str):
+    prop = ET.SubElement(desc, tag)
+    kind = ARRAYS.get(qname)
+    if kind is None:
+        prop.text = value
+        return
+    container = ET.SubElement(prop, f"{{{RDF_NS}}}{kind}")
+    if kind == "Alt":
+        ET.SubElement(container, f"{{{RDF_NS}}}li", {XML_LANG: "x-default"}).text = value
+    else:
+        for text in value.split(LIST_SEPARATOR) if value else []:
+            ET.SubElement(container, f"{{{RDF_NS}}}li").text = text
+
+
+def update(data: Optional[bytes], edits: Dict[str, str]) -> bytes:
+    """The packet body (without xpacket wrapper) with edits applied. edits holds
+    XMP:prefix:name keys; a property is changed where it is, new ones go in the first
+    rdf:Description. Struct fields (keys with '/' or '[') are left alone."""
+    data = data or _EMPTY
+    known = _register(data)
+    try:
+        root = ET.fromstring(_strip(data))
+    except ET.ParseError as e:
+        raise ValueError(f"Malformed XMP packet: {e}")
+    rdf = root if root.tag == f"{{{RDF_NS}}}RDF" else root.find(f"{{{RDF_NS}}}RDF")
+    if rdf is None:
+        raise ValueError("XMP packet has no rdf:RDF element")
+    descriptions = rdf.findall(f"{{{RDF_NS}}}Description")
+    if not descriptions:
+        descriptions = [ET.SubElement(rdf, f"{{{RDF_NS}}}Description", {f"{{{RDF_NS}}}about": ""})]
+
+    for key, value in edits.items():
+        qname = key[len(PREFIX):]
+        prefix, _, local = qname.partition(":")
+        uri = known.get(prefix)
+        if uri is None or not local or "/" in local or "[" in local:
+            log.debug("  [SKIP] '%s' -> unknown namespace or struct field", key)
+            continue
+        tag = f"{{{uri}}}{local}"
+        for desc in descriptions:
+            if tag in desc.attrib:
+                desc.set(tag, value)
+                break
+            prop = desc.find(tag)
+            if prop is not None:
+                if not _set(prop, value):
+                    log.debug("  [SKIP] '%s' -> struct property", key)
+                break
+        else:
+            _add(descriptions[0], tag, qname, value)
+    return ET.tostring(root, encoding="unicode").encode("utf-8")
+
+
+def wrap(body: bytes, size: Optional[int] = None) -> Optional[bytes]:
+    """body inside an xpacket wrapper with whitespace padding: PADDING bytes of it, or
+    exactly enough to make the packet size bytes long (None if body doesn't fit)."""
+    head = PACKET_HEADER.encode("utf-8") + body + b"\n"
+    tail = PACKET_TRAILER.encode("ascii")
+    pad = PADDING if size is None else size - len(head) - len(tail)
+    if pad < 0:
+        return None
+    # Lines of spaces, as the XMP spec suggests, so text tools don't choke on one huge line
+    line = b" " * 99 + b"\n"
+    padding = line * (pad // 100) + b" " * (pad % 100)
+    return head + padding + tail
+
+
+def _unchanged(current: Dict[str, str], edits: Dict[str, str]) -> bool:
+    return all(current.get(k) == v for k, v in edits.items())
+
+
+def write(path: str, edits: Dict[str, str], kind: Optional[str] = None) -> Optional[WriteStats]:
+    """Applies XMP:prefix:name edits to the file's packet, creating one if needed.
+    Returns None when the packet already holds the values."""
+    kind = kind or kind_of(path)
+    if kind not in _LOCATORS:
+        raise ValueError(f"XMP is not supported for {kind or 'this'} files")
+    with instrument.span("parse") as s:
+        packet = locate(path, kind)
+        current = parse(packet.data) if packet is not None else {}
+        s.bytes_read = len(packet.data) if packet is not None else 0
+    if _unchanged(current, edits):
+        return None
+
+    with instrument.span("encode") as s:
+        body = update(packet.data if packet is not None else None, edits)
+        fitted = wrap(body, len(packet.data)) if packet is not None and packet.writable else None
+        s.bytes_written = len(body)
+
+    if fitted is not None:
+        with instrument.span("write") as s, open(path, "r+b") as f:
+            f.seek(packet.offset)
+            f.write(fitted)
+            if packet.chunk is not None:
+                offset, length = packet.chunk
+                f.seek(offset)
+                crc = zlib.crc32(f.read(length), zlib.crc32(b"iTXt"))
+                f.seek(offset + length)
+                f.write(struct.pack(">I", crc))
+            s.bytes_written = len(fitted)
+        return WriteStats(True, len(fitted))
+
+    data = wrap(body)
+    if kind == "mp4":
+        # The box writer keeps to the moov region or the packet's box when it can
+        stats = _rewrite_mp4(path, data)
+        return WriteStats(stats.in_place, stats.bytes_written)
+    with instrument.span("write") as s:
+        written = s.bytes_written = _rewrite(path, kind, data)
+    return WriteStats(False, written)
+
+
+def _rewrite_mp4(path: str, data: bytes) -> mp4.WriteStats:
+    """An existing packet stays in its box. A new one goes where each family's readers
+    look: moov/udta/XMP_ in QuickTime movies, a top-level uuid box in ISO files."""
+    with open(path, "rb") as f:
+        in_uuid = mp4.find_uuid(f, MP4_UUID) is not None
+        in_udta = not in_uuid and mp4.find(f, b"moov/udta/XMP_") is not None
+        ftyp = mp4.find(f, b"ftyp")
+        if ftyp is not None:
+            f.seek(ftyp.start)
+        quicktime = ftyp is None or f.read(4) == b"qt  "
+    if in_udta or (not in_uuid and quicktime):
+        return mp4.write_udta(path, b"XMP_", data)
+    return mp4.write_uuid(path, MP4_UUID, data)
+
+
+def _rewrite(path: str, kind: str, data: bytes) -> int:
+    """Replaces the packet through the container writer. Returns bytes written."""
+    if kind == "tiff":
+        stats = tiff.write_tags(path, {"0th": {TIFF_TAG: data}})
+        return stats.patched + stats.appended
+    if kind == "pdf":
+        return pdf.write_xmp_incremental(path, data)
+    writers = {"jpeg": jpeg.write_xmp, "png": lambda src, dst, packet: png.write_chunks(src, dst, xmp_bytes=packet),
+               "webp": lambda src, dst, packet: webp.write_chunks(src, dst, xmp_bytes=packet)}
+    if kind not in writers:
+        raise ValueError("The XMP packet has no room for this edit and the container can't be rewritten")
+    temp_path = path + ".tmp"
+    try:
+        written = writers[kind](path, temp_path, data)
+    except:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, path)
+    return written
+
+
+def split(data: Dict[str, str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """(everything else, XMP keys) of an editor data dict."""
+    rest = {k: v for k, v in data.items() if not k.startswith(PREFIX)}
+    return rest, {k: v for k, v in data.items() if k.startswith(PREFIX)}
@@ -0,0 +1,16 @@
+from collections import OrderedDict
+
+import pytest
+
+from src import cache
+from src.core import MetadataManager
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    """Each test gets its own metadata cache file and an empty snapshot table."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.delenv("LOCALAPPDATA", raising=False)
+    monkeypatch.setattr(cache, "_default", None)
+    monkeypatch.setattr(cache, "_default_pid", None)
+    monkeypatch.setattr(MetadataManager, "_snapshots", OrderedDict())
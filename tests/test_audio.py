@@ -0,0 +1,125 @@
+"""AudioHandler saves: padding reuse, write-cost reports and ID3 frame construction."""
+import struct
+
+from mutagen.flac import FLAC
+from mutagen.id3 import APIC, COMM, ID3, TIT2, TXXX
+from mutagen.mp4 import MP4
+import pytest
+
+from src import mp4
+from src.core import AudioHandler
+from tests.test_mp4 import PAYLOAD, build, check_media
+
+MP3_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413  # MPEG-1 Layer III, 128 kbps, 44.1 kHz
+
+
+def make_mp3(path):
+    path.write_bytes(MP3_FRAME * 200)
+    tags = ID3()
+    tags.add(TIT2(encoding=3, text=["Title"]))
+    tags.save(str(path))
+    return path
+
+
+def make_flac(path):
+    info = struct.pack(">HH", 4096, 4096) + b"\x00" * 6
+    info += ((44100 << 44) | (1 << 41) | (15 << 36) | 44100 * 10).to_bytes(8, "big") + b"\x00" * 16
+    path.write_bytes(b"fLaC" + bytes([0x80]) + len(info).to_bytes(3, "big") + info + b"\xff\xf8" + b"\x00" * 20000)
+    audio = FLAC(str(path))
+    audio["title"] = "Title"
+    audio.save()
+    return path
+
+
+def make_m4a(path):
+    build(path)
+    audio = MP4(str(path))
+    audio.add_tags()
+    audio["\xa9nam"] = ["Title"]
+    audio.save()
+    return path
+
+
+def audio_start(path):
+    """Offset where the tag region ends and the audio data begins."""
+    data = path.read_bytes()
+    if data.startswith(b"ID3"):
+        return 10 + sum((b & 0x7F) << (7 * (3 - i)) for i, b in enumerate(data[6:10]))
+    if data.startswith(b"fLaC"):
+        return data.index(b"\xff\xf8")
+    return data.index(PAYLOAD)
+
+
+FORMATS = {"mp3": (make_mp3, "TIT2"), "flac": (make_flac, "title"), "m4a": (make_m4a, "\xa9nam")}
+
+
+@pytest.fixture(params=sorted(FORMATS))
+def sample(request, tmp_path):
+    make, key = FORMATS[request.param]
+    return make(tmp_path / f"sample.{request.param}"), key
+
+
+def test_small_edit_reuses_padding(sample):
+    path, key = sample
+    handler = AudioHandler()
+    before = path.read_bytes()
+    start = audio_start(path)
+
+    result = handler.write(str(path), {**handler.load(str(path)), key: "New"})
+
+    after = path.read_bytes()
+    assert result.written and result.report.in_place
+    assert len(after) == len(before) and after[start:] == before[start:]
+    changed = [i for i, (a, b) in enumerate(zip(before, after)) if a != b]
+    assert changed[-1] - changed[0] < result.report.bytes_written <= start
+    assert handler.load(str(path))[key] == "New"
+
+
+def test_reported_bytes_match_the_tag_region(sample):
+    path, key = sample
+    handler = AudioHandler()
+
+    result = handler.write(str(path), {**handler.load(str(path)), key: "New"})
+
+    if path.suffix == ".m4a":
+        moov = mp4.read_movie(str(path)).moov
+        assert result.report.bytes_written == moov.end - moov.offset  # The box walker rewrites moov whole
+    else:
+        assert result.report.bytes_written == audio_start(path)  # mutagen rewrites the tag region whole
+
+
+def test_growing_tag_reserves_padding(sample):
+    path, key = sample
+    handler = AudioHandler(padding=4096)
+    audio = path.read_bytes()[audio_start(path):]
+
+    result = handler.write(str(path), {**handler.load(str(path)), key: "x" * 20000})
+
+    assert result.written and not result.report.in_place
+    assert result.report.padding >= 4096
+    assert path.read_bytes()[audio_start(path):] == audio
+    if path.suffix == ".m4a":
+        check_media(path)
+
+    # The reserved padding takes the next edit in place
+    assert handler.write(str(path), {**handler.load(str(path)), key: "y" * 20000}).report.in_place
+
+
+def test_id3_frames(tmp_path):
+    path = make_mp3(tmp_path / "tags.mp3")
+    tags = ID3(str(path))
+    tags.add(APIC(encoding=3, mime="image/png", type=3, desc="cover", data=b"png"))
+    tags.save()
+    handler = AudioHandler()
+    data = handler.load(str(path))
+
+    handler.write(str(path), {**data, "TXXX:Mood": "calm", "COMM:note:deu": "Hallo", "COMM": "plain", "TPE1": "Artist"})
+
+    tags = ID3(str(path))
+    assert isinstance(tags["TXXX:Mood"], TXXX) and tags["TXXX:Mood"].desc == "Mood"
+    assert tags["TXXX:Mood"].text == ["calm"]
+    comment = tags["COMM:note:deu"]
+    assert isinstance(comment, COMM) and (comment.desc, comment.lang, comment.text) == ("note", "deu", ["Hallo"])
+    assert tags["COMM::eng"].text == ["plain"]
+    assert tags["TPE1"].text == ["Artist"] and tags["TIT2"].text == ["Title"]
+    assert tags["APIC:cover"].data == b"png"  # Binary frames are left alone
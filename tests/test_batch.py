@@ -0,0 +1,119 @@
+"""Batch commits: temp file + os.replace, the identity check, and journal resume."""
+import json
+import os
+
+from PIL import Image
+import pypdf
+import pytest
+
+from src import batch
+from src.core import ImageHandler, MetadataManager, PDFHandler
+
+ARTIST = 315
+EDITS = {"Artist": "Batch artist"}
+
+
+def photo(path, artist="Old artist"):
+    exif = Image.Exif()
+    exif[ARTIST] = artist
+    Image.new("RGB", (16, 16), (1, 2, 3)).save(str(path), exif=exif.tobytes())
+    os.utime(path, ns=(1_000_000_000_000_000_000, 1_000_000_000_000_000_000))
+    return path
+
+
+def leftovers(directory):
+    return [n for n in os.listdir(directory) if n.endswith(".tmp") or ".tmp." in n]
+
+
+def test_commit(tmp_path):
+    path = photo(tmp_path / "a.jpg")
+    mtime = path.stat().st_mtime_ns
+
+    outcome = batch.apply_edits(str(path), EDITS)
+
+    assert outcome == batch.Outcome(str(path), batch.WRITTEN)
+    assert MetadataManager.load(str(path), use_cache=False)["Artist"] == "Batch artist"
+    assert path.stat().st_mtime_ns == mtime
+    assert leftovers(tmp_path) == []
+    assert batch.apply_edits(str(path), EDITS).status == batch.UNCHANGED
+
+
+def test_file_changed_during_write_is_not_replaced(tmp_path, monkeypatch):
+    path = photo(tmp_path / "a.jpg")
+    write_to = ImageHandler.write_to
+
+    def racing(self, src, dest, data, hint=None):
+        result = write_to(self, src, dest, data, hint)
+        with open(src, "ab") as f:
+            f.write(b"appended by someone else")
+        return result
+    monkeypatch.setattr(ImageHandler, "write_to", racing)
+
+    outcome = batch.apply_edits(str(path), EDITS)
+
+    assert outcome.status == batch.FAILED and "changed while" in outcome.reason
+    assert path.read_bytes().endswith(b"appended by someone else")
+    assert leftovers(tmp_path) == []
+
+
+def test_failed_write_leaves_original(tmp_path, monkeypatch):
+    path = photo(tmp_path / "a.jpg")
+    before = path.read_bytes()
+
+    def fail(self, src, dest, data, hint=None):
+        with open(dest, "wb") as f:
+            f.write(b"half a file")
+        raise OSError("disk full")
+    monkeypatch.setattr(ImageHandler, "write_to", fail)
+
+    outcome = batch.apply_edits(str(path), EDITS)
+
+    assert outcome.status == batch.FAILED and outcome.reason == "OSError: disk full"
+    assert path.read_bytes() == before
+    assert leftovers(tmp_path) == []
+
+
+def test_unreadable_file_is_not_rewritten(tmp_path, monkeypatch):
+    path = tmp_path / "doc.pdf"
+    writer = pypdf.PdfWriter()
+    writer.add_blank_page(100, 100)
+    writer.add_metadata({"/Title": "Old", "/Author": "Kept"})
+    writer.write(str(path))
+    before = path.read_bytes()
+    monkeypatch.setattr(PDFHandler, "load", lambda self, path, hint=None: {})  # As on a read error
+
+    outcome = batch.apply_edits(str(path), {"Title": "T"})
+
+    assert outcome.status == batch.FAILED and "No metadata" in outcome.reason
+    assert path.read_bytes() == before  # Not rewritten with the Title alone, losing Author
+
+
+def test_resume_skips_done_and_retries_failures(tmp_path):
+    files = tmp_path / "files"
+    files.mkdir()
+    done, failed, fresh = (photo(files / f"{n}.jpg") for n in ("done", "failed", "fresh"))
+    journal_path = tmp_path / "journal.jsonl"
+    with batch.Journal(str(journal_path), EDITS) as journal:
+        journal.record(batch.Outcome(str(done), batch.WRITTEN))
+        journal.record(batch.Outcome(str(failed), batch.FAILED, "OSError: disk full"))
+    with open(journal_path, "a", encoding="utf-8") as f:
+        f.write('{"path": "/torn')  # The run died mid-line
+
+    with batch.Journal(str(journal_path), EDITS) as journal:
+        outcomes = list(batch.iter_outcomes([str(files)], EDITS, workers=1, journal=journal))
+
+    assert sorted(o.path for o in outcomes) == sorted([str(failed), str(fresh)])
+    assert all(o.status == batch.WRITTEN for o in outcomes)
+    assert MetadataManager.load(str(done), use_cache=False)["Artist"] == "Old artist"  # Skipped
+    lines = journal_path.read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[0]) == {"journal": batch.JOURNAL_VERSION, "edits": EDITS}
+    with batch.Journal(str(journal_path), EDITS) as journal:
+        assert journal.done == {str(done), str(failed), str(fresh)}
+
+
+def test_journal_rejects_other_edits(tmp_path):
+    journal_path = tmp_path / "journal.jsonl"
+    batch.Journal(str(journal_path), EDITS).close()
+
+    with pytest.raises(batch.BatchError):
+        batch.Journal(str(journal_path), {"Artist": "Someone else"})
@@ -0,0 +1,103 @@
+"""The persistent metadata cache: hits only while the file identity and VERSION match."""
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src import cache
+from src.core import MetadataManager
+
+DATA = {"Artist": "A", "@Pages": "3"}
+
+
+def stat(dev=1, ino=2, size=3, mtime_ns=4):
+    return SimpleNamespace(st_dev=dev, st_ino=ino, st_size=size, st_mtime_ns=mtime_ns)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = cache.MetadataCache(str(tmp_path / "cache.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_hit(store):
+    store.put("/f", stat(), DATA)
+    assert store.get("/f", stat()) == DATA
+    assert store.get("/other", stat()) is None
+
+
+@pytest.mark.parametrize("field", ["dev", "ino", "size", "mtime_ns"])
+def test_identity_change_misses(store, field):
+    store.put("/f", stat(), DATA)
+    assert store.get("/f", stat(**{field: 99})) is None
+
+
+def test_invalidate(store):
+    store.put("/f", stat(), DATA)
+    store.invalidate("/f")
+    assert store.get("/f", stat()) is None and len(store) == 0
+
+
+def test_version_bump_misses(store, monkeypatch):
+    store.put("/f", stat(), DATA)
+    monkeypatch.setattr(cache, "VERSION", cache.VERSION + 1)
+    assert store.get("/f", stat()) is None
+    store.put("/f", stat(), {"Artist": "B"})
+    assert store.get("/f", stat()) == {"Artist": "B"}
+
+
+def test_old_schema_is_dropped(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    db = sqlite3.connect(path)
+    db.executescript("CREATE TABLE entries (path TEXT PRIMARY KEY, data TEXT); PRAGMA user_version = 1;")
+    db.close()
+
+    store = cache.MetadataCache(path)
+    store.put("/f", stat(), DATA)
+    assert store.get("/f", stat()) == DATA
+    store.close()
+
+
+def test_eviction(tmp_path):
+    store = cache.MetadataCache(str(tmp_path / "cache.sqlite3"), max_entries=10)
+    for i in range(11):
+        store.put(f"/f{i}", stat(), DATA)
+    assert len(store) == 9 and store.get("/f10", stat()) == DATA and store.get("/f0", stat()) is None
+    store.close()
+
+
+def test_default_is_opened_once(monkeypatch):
+    opened = []
+
+    class Slow(cache.MetadataCache):
+        def __init__(self, *args, **kwargs):
+            time.sleep(0.05)  # Widen the window between the check and the assignment
+            opened.append(self)
+            super().__init__(*args, **kwargs)
+    monkeypatch.setattr(cache, "MetadataCache", Slow)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_default())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(opened) == 1 and all(r is opened[0] for r in results)
+
+
+def test_load_refreshes_a_changed_file(tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_text("x")
+    store = cache.get_default()
+    MetadataManager.load(str(path))
+    st = path.stat()
+    assert store.get(str(path), st) == {}
+
+    store.put(str(path), st, {"Stale": "yes"})
+    assert MetadataManager.load(str(path))["Stale"] == "yes"  # Same identity: served from the cache
+    path.write_text("longer")
+    assert "Stale" not in MetadataManager.load(str(path))
+    assert store.get(str(path), path.stat()) == {}
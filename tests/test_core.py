@@ -0,0 +1,91 @@
+"""MetadataManager.save: what gets written, and what comes back."""
+from PIL import Image
+import pypdf
+import pytest
+
+from src.core import ImageHandler, MetadataManager, PDFHandler, diff_metadata
+
+ARTIST = 315
+
+
+def test_diff_metadata():
+    old = {"Artist": "A", "Model": "M", "Gone": "x", "@Size": "1", "File:Size": "2 KB"}
+    new = {"Artist": "B", "Model": "M", "New": "n", "@Size": "9", "File:Size": "3 KB"}
+
+    diff = diff_metadata(old, new)
+
+    assert diff.added == {"New": "n"} and diff.changed == {"Artist": "B"} and diff.removed == ["Gone"]
+    assert diff
+    assert not diff_metadata(old, {**old, "@Size": "9", "File:Modified": "now"})  # Not tags
+
+
+@pytest.fixture
+def jpeg(tmp_path):
+    path = tmp_path / "photo.jpg"
+    exif = Image.Exif()
+    exif[ARTIST] = "Old artist"
+    Image.new("RGB", (32, 32), (10, 20, 30)).save(str(path), exif=exif.tobytes())
+    return path
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Records the data every handler write() receives."""
+    seen = []
+    for cls in (ImageHandler, PDFHandler):
+        def spy(self, path, data, hint=None, _write=cls.write):
+            seen.append(dict(data))
+            return _write(self, path, data, hint)
+        monkeypatch.setattr(cls, "write", spy)
+    return seen
+
+
+def tags(data):
+    return {k: v for k, v in data.items() if not k.startswith("File:")}
+
+
+def test_unchanged_save_writes_nothing(jpeg, calls):
+    loaded = MetadataManager.load(str(jpeg))
+    before = jpeg.read_bytes()
+
+    result = MetadataManager.save(str(jpeg), loaded)
+
+    assert calls == []
+    assert jpeg.read_bytes() == before
+    assert tags(result) == tags(loaded)
+
+
+def test_delta_handler_gets_only_changes(jpeg, calls):
+    loaded = MetadataManager.load(str(jpeg))
+
+    result = MetadataManager.save(str(jpeg), {**loaded, "Artist": "New artist", "Copyright": "(c)"})
+
+    assert calls == [{"Artist": "New artist", "Copyright": "(c)"}]
+    assert tags(result) == tags(MetadataManager.load(str(jpeg), use_cache=False))
+    assert result["Artist"] == "New artist"
+
+
+def test_full_handler_gets_every_tag(tmp_path, calls):
+    path = tmp_path / "doc.pdf"
+    w = pypdf.PdfWriter()
+    w.add_blank_page(100, 100)
+    w.add_metadata({"/Title": "T", "/Author": "A"})
+    w.write(str(path))
+    loaded = MetadataManager.load(str(path))
+
+    result = MetadataManager.save(str(path), {**loaded, "Title": "New"})
+
+    assert calls == [{"Title": "New", "Author": "A", "Producer": loaded["Producer"]}]
+    assert tags(result) == tags(MetadataManager.load(str(path), use_cache=False))
+
+
+def test_failed_write_raises(jpeg, monkeypatch):
+    loaded = MetadataManager.load(str(jpeg))
+
+    def fail(self, path, data, hint=None):
+        raise OSError("disk full")
+    monkeypatch.setattr(ImageHandler, "write", fail)
+
+    with pytest.raises(OSError, match="disk full"):
+        MetadataManager.save(str(jpeg), {**loaded, "Artist": "New"})
+    assert MetadataManager.snapshot(str(jpeg)) is None  # The next save diffs against a fresh load
@@ -0,0 +1,89 @@
+"""The single-pass Exif parser against piexif.load, IFD by IFD."""
+import io
+
+from PIL import ExifTags, Image
+import piexif
+import pytest
+
+from src import exif
+
+MAKER_NOTE = b"\x00\xff\xfe\x80binary"
+
+
+def thumbnail():
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8), (9, 9, 9)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def piexif_blob():
+    """Big-endian Exif with every IFD, a thumbnail and a binary MakerNote."""
+    return piexif.dump({
+        "0th": {piexif.ImageIFD.Make: b"Maker", piexif.ImageIFD.Model: b"Model 1",
+                piexif.ImageIFD.Orientation: 6, piexif.ImageIFD.XResolution: (300, 1),
+                piexif.ImageIFD.Artist: "Ünïcødé".encode()},
+        "Exif": {piexif.ExifIFD.DateTimeOriginal: b"2021:02:02 02:02:02", piexif.ExifIFD.ExposureTime: (1, 250),
+                 piexif.ExifIFD.ISOSpeedRatings: 200, piexif.ExifIFD.MakerNote: MAKER_NOTE},
+        "GPS": {piexif.GPSIFD.GPSVersionID: (2, 2, 0, 0), piexif.GPSIFD.GPSLatitudeRef: b"N",
+                piexif.GPSIFD.GPSLatitude: ((52, 1), (30, 1), (1234, 100)), piexif.GPSIFD.GPSAltitude: (15, 2)},
+        "Interop": {piexif.InteropIFD.InteroperabilityIndex: b"R98"},
+        "1st": {piexif.ImageIFD.Compression: 6},
+        "thumbnail": thumbnail(),
+    })
+
+
+def tiff_blob():
+    """A little-endian TIFF file as Pillow writes it."""
+    buf = io.BytesIO()
+    Image.new("RGB", (4, 4)).save(buf, "TIFF", tiffinfo={315: "Artist", 305: "Software", 282: 72.0})
+    return buf.getvalue()
+
+
+@pytest.fixture(params=[piexif_blob, tiff_blob], ids=["exif-be", "tiff-le"])
+def blob(request):
+    return request.param()
+
+
+def test_raw_values_match_piexif(blob):
+    raw = exif.parse(blob)
+    reference = piexif.load(blob)
+
+    assert exif.to_piexif(raw) == reference  # piexif only keeps the tags it knows
+    for ifd in exif.IFD_ORDER:
+        assert set(reference[ifd]) <= set(raw[ifd])
+
+
+PIEXIF_TABLES = {"0th": "Image", "1st": "Image", "Exif": "Exif", "GPS": "GPS", "Interop": "Interop"}
+
+
+def test_display_keys(blob):
+    raw = piexif.load(blob)
+    keys = set()
+    for ifd in exif.IFD_ORDER:
+        names = ExifTags.GPSTAGS if ifd == "GPS" else ExifTags.TAGS  # GPS ids reuse 0th numbers
+        for tag in raw[ifd]:
+            name = names.get(tag) or piexif.TAGS[PIEXIF_TABLES[ifd]][tag]["name"]
+            keys.add(name if ifd == "0th" else f"{ifd}:{name}")
+
+    assert set(exif.read(blob).display) == keys
+
+
+def test_display_values():
+    display = exif.read(piexif_blob()).display
+
+    assert display["Artist"] == "Ünïcødé" and display["Orientation"] == "6"
+    assert display["GPS:GPSLatitudeRef"] == "N" and "GPS:InteropIndex" not in display
+    assert display["GPS:GPSLatitude"] == "((52, 1), (30, 1), (1234, 100))"
+    assert display["Exif:MakerNote"] == f"<Binary {len(MAKER_NOTE)}>"
+    assert display["Interop:InteropIndex"] == "R98" and display["1st:Compression"] == "6"
+
+
+def test_unknown_tags_are_kept():
+    block = Image.Exif()
+    block[315] = "Artist"
+    block[0xC001] = "private"
+    raw = exif.parse(block.tobytes())
+
+    assert raw["0th"][0xC001] == b"private"
+    assert exif.to_display(raw)["0th:Unknown_49153"] == "private"
+    assert 0xC001 not in exif.to_piexif(raw)["0th"]  # piexif.dump can't write it
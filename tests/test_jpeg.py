@@ -0,0 +1,138 @@
+"""JPEG segment splicing: the scan data is copied verbatim, checked against Pillow."""
+import os
+import struct
+
+from PIL import Image
+import pytest
+
+from src import jpeg, xmp
+from src.core import ImageHandler
+
+ARTIST = 315
+APP0, APP1, APP13, COM, SOS = 0xE0, 0xE1, 0xED, 0xFE, 0xDA
+
+
+def exif_block(artist):
+    block = Image.Exif()
+    block[ARTIST] = artist
+    return block.tobytes()
+
+
+def segments(data):
+    """([(marker, payload)] up to SOS, offset of the SOS marker), walked independently of src.scan."""
+    assert data[:2] == b"\xff\xd8"
+    pos, out = 2, []
+    while data[pos + 1] != SOS:
+        marker = data[pos + 1]
+        length = struct.unpack(">H", data[pos + 2:pos + 4])[0]
+        out.append((marker, data[pos + 4:pos + 2 + length]))
+        pos += 2 + length
+    return out, pos
+
+
+def inject(data, *extra):
+    """Puts extra (marker, payload) segments after the existing ones, just before the tables."""
+    pos = 2
+    while data[pos + 1] in range(0xE0, 0xF0):  # Past the APPn run
+        pos += 2 + struct.unpack(">H", data[pos + 2:pos + 4])[0]
+    added = b"".join(bytes((0xFF, m)) + struct.pack(">H", len(p) + 2) + p for m, p in extra)
+    return data[:pos] + added + data[pos:]
+
+
+def save(path, exif=None, jfif=True):
+    im = Image.frombytes("RGB", (64, 48), os.urandom(64 * 48 * 3))
+    im.save(str(path), quality=90, **({"exif": exif} if exif else {}))
+    data = path.read_bytes()
+    if not jfif:
+        markers, _ = segments(data)
+        assert markers[0][0] == APP0
+        data = data[:2] + data[2 + 4 + len(markers[0][1]):]
+    path.write_bytes(inject(data, (APP13, b"Photoshop 3.0\x00fake"), (COM, b"a comment")))
+    return path
+
+
+def decoded(path):
+    with Image.open(str(path)) as im:
+        return im.tobytes()
+
+
+def is_xmp_segment(marker, payload):
+    return marker == APP1 and payload.startswith(jpeg.XMP_HEADER)
+
+
+def check_splice(src, out, edited=jpeg.is_exif_segment):
+    """Everything from SOS on is identical, the pixels too, and every segment but the
+    edited kind is kept in order."""
+    before, after = src.read_bytes(), out.read_bytes()
+    old, old_sos = segments(before)
+    new, new_sos = segments(after)
+    assert after[new_sos:] == before[old_sos:]
+    assert decoded(out) == decoded(src)
+    assert [s for s in new if not edited(*s)] == [s for s in old if not edited(*s)]
+    return new
+
+
+def test_exif_replaced_in_place(tmp_path):
+    src, out = save(tmp_path / "src.jpg", exif_block("Old artist")), tmp_path / "out.jpg"
+    position = [m for m, _ in segments(src.read_bytes())[0]].index(APP1)
+
+    written = jpeg.write_exif(str(src), str(out), exif_block("New artist"))
+
+    assert written == out.stat().st_size
+    new = check_splice(src, out)
+    assert [m for m, _ in new].index(APP1) == position
+    with Image.open(str(out)) as im:
+        assert im.getexif()[ARTIST] == "New artist"
+
+
+@pytest.mark.parametrize("jfif", [True, False], ids=["after-app0", "first"])
+def test_missing_exif_is_inserted(tmp_path, jfif):
+    src, out = save(tmp_path / "src.jpg", jfif=jfif), tmp_path / "out.jpg"
+    assert not any(jpeg.is_exif_segment(m, p) for m, p in segments(src.read_bytes())[0])
+
+    jpeg.write_exif(str(src), str(out), exif_block("Artist"))
+
+    new = check_splice(src, out)
+    assert [m for m, _ in new][:2] == ([APP0, APP1] if jfif else [APP1, APP13])
+    assert jpeg.is_exif_segment(*new[1 if jfif else 0])
+    with Image.open(str(out)) as im:
+        assert im.getexif()[ARTIST] == "Artist"
+
+
+def test_exif_removed(tmp_path):
+    src, out = save(tmp_path / "src.jpg", exif_block("Old artist")), tmp_path / "out.jpg"
+
+    jpeg.write_exif(str(src), str(out), None)
+
+    new = check_splice(src, out)
+    assert not any(jpeg.is_exif_segment(m, p) for m, p in new)
+
+
+def test_xmp_goes_after_exif(tmp_path):
+    src, out = save(tmp_path / "src.jpg", exif_block("Artist")), tmp_path / "out.jpg"
+    packet = xmp.wrap(xmp.update(None, {"XMP:dc:title": "Packet"}))
+
+    jpeg.write_xmp(str(src), str(out), packet)
+
+    new = check_splice(src, out, is_xmp_segment)
+    assert [m for m, _ in new][:3] == [APP0, APP1, APP1]
+    assert new[2][1] == jpeg.XMP_HEADER + packet
+    with Image.open(str(out)) as im:
+        assert im.getexif()[ARTIST] == "Artist"
+
+
+def test_handler_round_trip(tmp_path):
+    path = save(tmp_path / "photo.jpg", exif_block("Old artist"))
+    original = tmp_path / "original.jpg"
+    original.write_bytes(path.read_bytes())
+    handler = ImageHandler()
+    edits = {"Artist": "New artist", "Exif:DateTimeOriginal": "2020:01:01 00:00:00"}
+
+    result = handler.write(str(path), edits)
+
+    assert result.written
+    check_splice(original, path)
+    loaded = handler.load(str(path))
+    assert {k: loaded[k] for k in edits} == edits
+    assert {k: v for k, v in loaded.items() if not k.startswith(("@", "Info:"))} == result.metadata
+    assert not handler.write(str(path), edits).written
@@ -0,0 +1,152 @@
+"""MP4/MOV box writers, checked against mutagen and the media data they must not disturb."""
+import re
+import struct
+
+from mutagen.mp4 import MP4
+import pytest
+
+from src import mp4, xmp
+
+PAYLOAD = bytes(range(256)) * 40
+AUDIO_OFFSET = 1000  # Second track's chunk, relative to the start of the mdat payload
+
+
+def box(btype, payload):
+    return struct.pack(">I4s", 8 + len(payload), btype) + payload
+
+
+def full(btype, version, flags, payload):
+    return box(btype, bytes([version]) + flags.to_bytes(3, "big") + payload)
+
+
+def descriptor(tag, payload):
+    return bytes([tag, len(payload)]) + payload
+
+
+ESDS = full(b"esds", 0, 0, descriptor(3, b"\0\x01\0" + descriptor(
+    4, bytes([0x40, 0x15]) + b"\0\0\0" + struct.pack(">II", 128000, 128000) + descriptor(5, b"\x12\x10"))))
+MP4A = box(b"mp4a", b"\0" * 6 + b"\0\x01" + b"\0" * 8 + struct.pack(">HHHHI", 2, 16, 0, 0, 44100 << 16) + ESDS)
+AVC1 = box(b"avc1", b"\0" * 6 + b"\0\x01" + b"\0" * 16 + struct.pack(">HH", 320, 240) + b"\0" * 50)
+MVHD = full(b"mvhd", 0, 0, struct.pack(">IIII", 3786912000, 3786912000, 600, 6000) + b"\0" * 80)
+
+
+def trak(track_id, handler, entry, chunk_offset, wide):
+    tkhd = full(b"tkhd", 0, 3, struct.pack(">IIIII", 0, 0, track_id, 0, 6000) + b"\0" * 60)
+    mdhd = full(b"mdhd", 0, 0, struct.pack(">IIIIHH", 0, 0, 44100, 441000, 0x15c7, 0))
+    hdlr = full(b"hdlr", 0, 0, b"\0" * 4 + handler + b"\0" * 12 + b"h\0")
+    offsets = full(b"co64", 0, 0, struct.pack(">IQ", 1, chunk_offset)) if wide \
+        else full(b"stco", 0, 0, struct.pack(">II", 1, chunk_offset))
+    stbl = box(b"stbl", full(b"stsd", 0, 0, struct.pack(">I", 1) + entry) + full(b"stts", 0, 0, b"\0" * 4)
+               + full(b"stsc", 0, 0, b"\0" * 4) + full(b"stsz", 0, 0, b"\0" * 8) + offsets)
+    return box(b"trak", tkhd + box(b"mdia", mdhd + hdlr + box(b"minf", stbl)))
+
+
+def build(path, moov_first=True, wide=False, brand=b"isom"):
+    """ftyp, moov and mdat (in either order) with a video and a sound track whose chunk
+    offsets point into the mdat payload."""
+    ftyp = box(b"ftyp", brand + b"\0\0\0\0" + brand + b"mp42")
+
+    def moov(payload_at):
+        return box(b"moov", MVHD + trak(1, b"vide", AVC1, payload_at, wide)
+                   + trak(2, b"soun", MP4A, payload_at + AUDIO_OFFSET, wide))
+
+    size = len(moov(0))
+    payload_at = len(ftyp) + 8 + (size if moov_first else 0)
+    mdat = box(b"mdat", PAYLOAD)
+    body = moov(payload_at) + mdat if moov_first else mdat + moov(payload_at)
+    path.write_bytes(ftyp + body)
+    return path
+
+
+@pytest.fixture(params=[(True, False), (False, False), (True, True)], ids=["moov-first", "moov-last", "co64"])
+def movie(request, tmp_path):
+    moov_first, wide = request.param
+    return build(tmp_path / "movie.m4a", moov_first, wide)
+
+
+def check_media(path):
+    """The payload is intact and every chunk offset still points into it; mutagen opens the file."""
+    data = path.read_bytes()
+    start = data.index(b"mdat") + 4
+    assert data[start:start + len(PAYLOAD)] == PAYLOAD
+    offsets = [struct.unpack(">I", data[m.end() + 8:m.end() + 12])[0] for m in re.finditer(b"stco", data)]
+    offsets += [struct.unpack(">Q", data[m.end() + 8:m.end() + 16])[0] for m in re.finditer(b"co64", data)]
+    assert offsets == [start, start + AUDIO_OFFSET]
+    return MP4(str(path))
+
+
+def items(values):
+    return [mp4.render_item(k, v) for k, v in values.items()]
+
+
+def test_small_items_fit_in_place(movie):
+    mp4.write_items(str(movie), items({"\xa9nam": "Title", "\xa9ART": "Artist"}))
+    size = movie.stat().st_size
+
+    stats = mp4.write_items(str(movie), items({"\xa9nam": "New", "trkn": "(3, 12)"}))
+
+    assert stats.in_place and movie.stat().st_size == size
+    tags = check_media(movie).tags
+    assert tags["\xa9nam"] == ["New"] and tags["trkn"] == [(3, 12)] and "\xa9ART" not in tags
+
+
+def test_growing_moov_relocates_chunks(movie):
+    moov_first = movie.read_bytes().index(b"moov") < movie.read_bytes().index(b"mdat")
+
+    stats = mp4.write_items(str(movie), items({"\xa9cmt": "x" * 40000, "aART": "Album Artist"}))
+
+    assert stats.in_place != moov_first  # A moov before mdat moves the media
+    tags = check_media(movie).tags
+    assert tags["\xa9cmt"] == ["x" * 40000] and tags["aART"] == ["Album Artist"]
+
+    stats = mp4.write_items(str(movie), items({"\xa9cmt": "short"}))
+    assert stats.in_place
+    assert check_media(movie).tags["\xa9cmt"] == ["short"]
+
+
+def test_fast_reader_follows_writes(movie):
+    mp4.write_items(str(movie), items({"\xa9nam": "Title", "----:com.apple.iTunes:MOOD": "calm"}))
+
+    parsed = mp4.read_movie(str(movie))
+
+    assert [(t.kind, t.codec) for t in parsed.tracks] == [("vide", "avc1"), ("soun", "mp4a")]
+    assert parsed.tags == dict(check_media(movie).tags)
+
+
+@pytest.mark.parametrize("brand, location", [(b"isom", b"uuid"), (b"qt  ", b"moov/udta/XMP_")])
+def test_xmp_round_trip(movie, brand, location):
+    data = bytearray(movie.read_bytes())
+    data[8:12] = data[16:20] = brand
+    movie.write_bytes(bytes(data))
+
+    xmp.write(str(movie), {"XMP:dc:title": "First"}, "mp4")
+    check_media(movie)
+    with open(movie, "rb") as f:
+        assert (mp4.find_uuid(f, xmp.MP4_UUID) if location == b"uuid" else mp4.find(f, location)) is not None
+
+    assert xmp.write(str(movie), {"XMP:dc:title": "Second"}, "mp4").in_place
+    xmp.write(str(movie), {"XMP:dc:description": "d" * 5000}, "mp4")
+    check_media(movie)
+    read = xmp.read(str(movie), "mp4")
+    assert read["XMP:dc:title"] == "Second" and read["XMP:dc:description"] == "d" * 5000
+
+
+def test_growing_uuid_before_mdat_relocates_chunks(tmp_path):
+    path = build(tmp_path / "movie.mp4")
+    data = path.read_bytes()
+    uuid = box(b"uuid", xmp.MP4_UUID + xmp.wrap(xmp.update(None, {"XMP:dc:title": "Mid"}), 400))
+    at = data.index(b"mdat") - 4
+    data = bytearray(data[:at] + uuid + data[at:])
+    for m in re.finditer(b"stco", bytes(data)):
+        offset = struct.unpack(">I", data[m.end() + 8:m.end() + 12])[0]
+        data[m.end() + 8:m.end() + 12] = struct.pack(">I", offset + len(uuid))
+    path.write_bytes(bytes(data))
+    check_media(path)
+
+    stats = xmp.write(str(path), {"XMP:dc:description": "e" * 3000}, "mp4")
+
+    assert not stats.in_place
+    check_media(path)
+    assert xmp.read(str(path), "mp4")["XMP:dc:title"] == "Mid"
+    assert xmp.write(str(path), {"XMP:dc:description": "short"}, "mp4").in_place
+    check_media(path)
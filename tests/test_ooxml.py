@@ -0,0 +1,130 @@
+"""DOCX/XLSX properties, checked against python-docx and openpyxl."""
+import datetime
+import zipfile
+
+import docx
+import openpyxl
+import pytest
+
+from src import ooxml
+
+CREATED = datetime.datetime(2021, 3, 4, 5, 6, 7)
+
+
+def make_docx(path):
+    doc = docx.Document()
+    doc.add_paragraph("Body text that must survive untouched.")
+    props = doc.core_properties
+    props.title, props.author, props.keywords, props.revision = "Docx title", "Writer", "a, b", 7
+    props.created = CREATED
+    doc.save(str(path))
+    return path
+
+
+def make_xlsx(path):
+    wb = openpyxl.Workbook()
+    wb.active["A1"] = "cell"
+    wb.properties.title, wb.properties.creator, wb.properties.keywords = "Xlsx title", "Writer", "a, b"
+    wb.properties.created = CREATED
+    wb.save(str(path))
+    return path
+
+
+def docx_properties(path):
+    return docx.Document(str(path)).core_properties
+
+
+def xlsx_properties(path):
+    return openpyxl.load_workbook(str(path)).properties
+
+
+# (builder, editor key names, reference reader, column of CORE_FIELDS with the reader's attributes)
+FORMATS = {
+    ".docx": (make_docx, ooxml.DOCX_NAMES, docx_properties, 0),
+    ".xlsx": (make_xlsx, ooxml.XLSX_NAMES, xlsx_properties, 1),
+}
+
+
+def reference(props, column):
+    """What the reference library reports, in read_properties' display form."""
+    out = {}
+    for attrs in ooxml.CORE_FIELDS.values():
+        value = getattr(props, attrs[column], None)
+        if isinstance(value, datetime.datetime):
+            out[attrs[column]] = value.strftime(ooxml.DISPLAY_DATE)
+        elif value not in (None, ""):
+            out[attrs[column]] = str(value)
+    return out
+
+
+@pytest.fixture(params=sorted(FORMATS))
+def fmt(request):
+    return request.param, FORMATS[request.param]
+
+
+def test_core_properties_match_reference(tmp_path, fmt):
+    ext, (build, names, read_reference, column) = fmt
+    path = build(tmp_path / f"doc{ext}")
+
+    data = ooxml.read_properties(str(path), names)
+
+    core = {k: v for k, v in data.items() if not k.startswith((ooxml.APP_PREFIX, ooxml.CUSTOM_PREFIX))}
+    assert core == reference(read_reference(path), column)
+    assert core[ooxml.CORE_FIELDS["dcterms:created"][column]] == "2021-03-04 05:06:07"
+
+
+def members(path):
+    """name -> (compress_type, compress_size, CRC, data) for every member."""
+    with zipfile.ZipFile(str(path)) as zf:
+        return {i.filename: (i.compress_type, i.compress_size, i.CRC, zf.read(i)) for i in zf.infolist()}
+
+
+def untouched(entries):
+    return {k: v for k, v in entries.items()
+            if not k.startswith("docProps/") and k not in (ooxml.CONTENT_TYPES_PART, ooxml.ROOT_RELS_PART)}
+
+
+def test_write_copies_members_and_reads_back(tmp_path, fmt):
+    ext, (build, names, read_reference, column) = fmt
+    path = build(tmp_path / f"doc{ext}")
+    before = members(path)
+    title = ooxml.CORE_FIELDS["dc:title"][column]
+    data = ooxml.read_properties(str(path), names)
+    data.update({title: "Ünïcode title ✓", "Custom:Project": "X"})
+
+    written, props = ooxml.write_properties(str(path), names, data)
+
+    assert written
+    with zipfile.ZipFile(str(path)) as zf:
+        assert zf.testzip() is None
+    after = members(path)
+    assert untouched(after) == untouched(before)  # Same compressed size and CRC: copied, not recompressed
+    assert "docProps/custom.xml" in after
+    assert ooxml.read_properties(str(path), names) == props
+    assert props[title] == "Ünïcode title ✓" and props["Custom:Project"] == "X"
+    assert getattr(read_reference(path), title) == "Ünïcode title ✓"
+
+
+def test_write_to_dest_leaves_source(tmp_path, fmt):
+    ext, (build, names, read_reference, column) = fmt
+    path = build(tmp_path / f"doc{ext}")
+    original = path.read_bytes()
+    dest = tmp_path / f"out{ext}"
+    data = ooxml.read_properties(str(path), names)
+    data[ooxml.CORE_FIELDS["dc:subject"][column]] = "Subject"
+
+    written, props = ooxml.write_properties(str(path), names, data, str(dest))
+
+    assert written and path.read_bytes() == original
+    assert ooxml.read_properties(str(dest), names) == props
+    assert getattr(read_reference(dest), ooxml.CORE_FIELDS["dc:subject"][column]) == "Subject"
+
+
+def test_unchanged_properties_write_nothing(tmp_path, fmt):
+    ext, (build, names, _, _) = fmt
+    path = build(tmp_path / f"doc{ext}")
+    original = path.read_bytes()
+
+    written, _ = ooxml.write_properties(str(path), names, ooxml.read_properties(str(path), names))
+
+    assert not written and path.read_bytes() == original
@@ -0,0 +1,194 @@
+"""Round trips through the incremental PDF writer, checked against pypdf."""
+import io
+import zlib
+
+import pypdf
+import pytest
+
+from src import instrument, pdf, xmp
+from src.core import PDFHandler
+
+
+def make_classic(path, title="Original"):
+    w = pypdf.PdfWriter()
+    w.add_blank_page(100, 100)
+    w.add_blank_page(200, 200)
+    w.add_metadata({"/Title": title, "/Producer": "pypdf"})
+    w.write(str(path))
+    return path
+
+
+def make_xref_stream(path, info=True):
+    """A PDF 1.5 file indexed by a compressed xref stream (pypdf only writes classic tables)."""
+    objs = [b"<</Type/Catalog/Pages 2 0 R>>", b"<</Type/Pages/Kids[3 0 R]/Count 1>>",
+            b"<</Type/Page/Parent 2 0 R/MediaBox[0 0 100 100]/Resources<<>>>>"]
+    if info:
+        objs.append(b"<</Title(Stream Title)/Producer(hand)>>")
+    out = bytearray(b"%PDF-1.5\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for num, body in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % num + body + b"\nendobj\n"
+    xref_num = len(objs) + 1
+    xref_offset = len(out)
+    offsets.append(xref_offset)
+    rows = b"\x00\x00\x00\xff" + b"".join(b"\x01" + o.to_bytes(2, "big") + b"\x00" for o in offsets)
+    data = zlib.compress(rows)
+    d = b"<</Type/XRef/Size %d/W[1 2 1]/Root 1 0 R%s/Filter/FlateDecode/Length %d/ID[<AB><AB>]>>" % (
+        xref_num + 1, b"/Info 4 0 R" if info else b"", len(data))
+    out += b"%d 0 obj\n" % xref_num + d + b"\nstream\n" + data + b"\nendstream\nendobj\n"
+    out += b"startxref\n%d\n%%%%EOF\n" % xref_offset
+    path.write_bytes(bytes(out))
+    return path
+
+
+def qpdf_check(path):
+    """Runs qpdf's structural check when its bindings are installed."""
+    pikepdf = pytest.importorskip("pikepdf")
+    with pikepdf.open(path) as doc:
+        assert doc.check_pdf_syntax() == []
+        return str(doc.docinfo.get("/Title"))
+
+
+@pytest.fixture(params=["classic", "xref_stream", "xref_stream_no_info"])
+def document(request, tmp_path):
+    if request.param == "classic":
+        return make_classic(tmp_path / "classic.pdf")
+    return make_xref_stream(tmp_path / "stream.pdf", info=request.param == "xref_stream")
+
+
+def test_info_update_appends_and_reads_back(document):
+    before = document.read_bytes()
+    values = {"/Title": "Nouveau titre é✓", "/Author": "Someone", "/Producer": "pypdf"}
+
+    appended = pdf.write_info_incremental(str(document), values)
+
+    after = document.read_bytes()
+    assert appended == len(after) - len(before) > 0
+    assert after.startswith(before)
+
+    reader = pypdf.PdfReader(str(document), strict=True)
+    assert len(reader.pages) == len(pypdf.PdfReader(io.BytesIO(before)).pages)
+    assert {k: str(v) for k, v in reader.metadata.items()} == values
+    with open(document, "rb") as f:
+        assert pdf.PdfFile(f).info() == {k.lstrip("/"): v for k, v in values.items()}
+    assert qpdf_check(document) == values["/Title"]
+
+
+def test_unchanged_info_appends_nothing(document):
+    with open(document, "rb") as f:
+        current = pdf.PdfFile(f).info()
+    before = document.read_bytes()
+
+    assert pdf.write_info_incremental(str(document), {f"/{k}": v for k, v in current.items()}) == 0
+    assert document.read_bytes() == before
+
+
+def test_updates_chain(document):
+    pdf.write_info_incremental(str(document), {"/Title": "First"})
+    middle = document.read_bytes()
+    pdf.write_info_incremental(str(document), {"/Title": "Second", "/Subject": "S"})
+
+    assert document.read_bytes().startswith(middle)
+    reader = pypdf.PdfReader(str(document), strict=True)
+    assert reader.metadata["/Title"] == "Second" and reader.metadata["/Subject"] == "S"
+
+
+def test_xmp_update_appends_and_reads_back(document):
+    before = document.read_bytes()
+    packet = xmp.wrap(xmp.update(None, {"XMP:dc:title": "Packet title"}))
+
+    assert pdf.write_xmp_incremental(str(document), packet) > 0
+
+    assert document.read_bytes().startswith(before)
+    reader = pypdf.PdfReader(str(document), strict=True)
+    assert reader.xmp_metadata.dc_title == {"x-default": "Packet title"}
+    with open(document, "rb") as f:
+        assert pdf.PdfFile(f).xmp() == packet
+    qpdf_check(document)
+
+
+def make_object_streams(path):
+    """Info and catalog compressed into object streams, written by qpdf."""
+    pikepdf = pytest.importorskip("pikepdf")
+    make_classic(path, "In an object stream")
+    with pikepdf.open(path, allow_overwriting_input=True) as doc:
+        doc.save(path, object_stream_mode=pikepdf.ObjectStreamMode.generate)
+    return path
+
+
+@pytest.mark.parametrize("build", [make_classic, make_xref_stream, make_object_streams])
+def test_lazy_reader_matches_pypdf(tmp_path, build):
+    path = build(tmp_path / "doc.pdf")
+    reader = pypdf.PdfReader(str(path))
+    with open(path, "rb") as f:
+        doc = pdf.PdfFile(f)
+        assert doc.page_count() == len(reader.pages)
+        assert doc.info() == {k.lstrip("/"): str(v) for k, v in (reader.metadata or {}).items()}
+        assert doc.xmp() is None
+
+
+def test_lazy_reader_follows_updates(document):
+    pdf.write_info_incremental(str(document), {"/Title": "Updated"})
+    pdf.write_xmp_incremental(str(document), xmp.wrap(xmp.update(None, {"XMP:dc:title": "Updated"})))
+    reader = pypdf.PdfReader(str(document))
+    with open(document, "rb") as f:
+        doc = pdf.PdfFile(f)
+        assert doc.info() == {"Title": "Updated"}
+        assert doc.page_count() == len(reader.pages)
+        assert doc.xmp() == reader.trailer["/Root"]["/Metadata"].get_object().get_data()
+
+
+def test_lazy_reader_reads_a_fraction_of_a_large_file(tmp_path):
+    w = pypdf.PdfWriter()
+    for _ in range(300):
+        page = w.add_blank_page(100, 100)
+        page[pypdf.generic.NameObject("/Filler")] = pypdf.generic.TextStringObject("x" * 4000)
+    w.add_metadata({"/Title": "Large"})
+    path = tmp_path / "large.pdf"
+    w.write(str(path))
+
+    counters = instrument.enable()
+    try:
+        data = PDFHandler().load(str(path))
+    finally:
+        instrument.disable()
+    assert data["Title"] == "Large" and data["@Pages"] == "300"
+    assert 0 < counters.snapshot()["parse"]["bytes_read"] < path.stat().st_size / 10
+
+
+def test_malformed_strings(tmp_path):
+    # Same length as "(Original)", so the xref offsets stay valid
+    path = make_classic(tmp_path / "octal.pdf")
+    path.write_bytes(path.read_bytes().replace(b"(Original)", rb"(a\9bcdef)"))
+    data = PDFHandler().load(str(path))
+    assert data["Title"] == "a9bcdef"  # Not an octal digit: the backslash is dropped
+    assert data["@Pages"] == "2" and data["Producer"] == "pypdf"
+
+    path = make_classic(tmp_path / "hex.pdf")
+    path.write_bytes(path.read_bytes().replace(b"(Original)", b"<4G41aaaa>"))
+    with open(path, "rb") as f, pytest.raises(pdf.PdfError):
+        pdf.PdfFile(f).info()
+    reader = pypdf.PdfReader(str(path))
+    expected = {k.lstrip("/"): str(v) for k, v in reader.metadata.items()}
+    assert PDFHandler().load(str(path)) == {"@Pages": str(len(reader.pages)), **expected}
+
+
+def test_name_values_stay_names(tmp_path):
+    path = tmp_path / "trapped.pdf"
+    w = pypdf.PdfWriter()
+    w.add_blank_page(100, 100)
+    w._info.get_object().update({pypdf.generic.NameObject("/Trapped"): pypdf.generic.NameObject("/True"),
+                                 pypdf.generic.NameObject("/Custom"): pypdf.generic.NameObject("/Draft")})
+    w.write(str(path))
+    loaded = PDFHandler().load(str(path))
+    assert loaded["Trapped"] == "/True" and loaded["Custom"] == "/Draft"
+
+    result = PDFHandler().write(str(path), {**loaded, "Title": "Edited"})
+
+    info = pypdf.PdfReader(str(path)).trailer["/Info"].get_object()
+    assert isinstance(info["/Trapped"], pypdf.generic.NameObject) and info["/Trapped"] == "/True"
+    assert isinstance(info["/Custom"], pypdf.generic.NameObject) and info["/Custom"] == "/Draft"
+    assert info["/Title"] == "Edited"
+    assert {k: v for k, v in PDFHandler().load(str(path)).items() if k != "@Pages"} == result.metadata
+    assert not PDFHandler().write(str(path), PDFHandler().load(str(path))).written
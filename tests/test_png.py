@@ -0,0 +1,106 @@
+"""PNG chunk splicing, checked against Pillow."""
+import os
+import struct
+import zlib
+
+from PIL import Image, PngImagePlugin
+import pytest
+
+from src import png, xmp
+
+ARTIST = 315
+
+
+def exif_block(artist):
+    block = Image.Exif()
+    block[ARTIST] = artist
+    return block.tobytes()
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "image.png"
+    im = Image.frombytes("RGB", (256, 256), os.urandom(256 * 256 * 3))  # Noise spans several IDATs
+    info = PngImagePlugin.PngInfo()
+    info.add_text("Title", "Old title")
+    info.add_text("Comment", "Compressed comment " * 20, zip=True)
+    info.add_itxt("Author", "Ünïcødé", lang="en")
+    im.save(str(path), pnginfo=info, exif=exif_block("Old artist"))
+    with open(path, "ab") as f:
+        f.write(b"trailing bytes")
+    return path
+
+
+def chunks(path):
+    """[(type, raw chunk)] with every CRC checked."""
+    out = []
+    with open(path, "rb") as f:
+        for ctype, offset, length in png.iter_chunks(f):
+            f.seek(offset - 8)
+            raw = f.read(length + 12)
+            assert struct.unpack(">I", raw[-4:])[0] == zlib.crc32(raw[4:-4]), ctype
+            out.append((ctype, raw))
+    return out
+
+
+def idat(path):
+    return [raw for ctype, raw in chunks(path) if ctype == b"IDAT"]
+
+
+def opened(path):
+    with Image.open(str(path)) as im:
+        im.verify()
+    im = Image.open(str(path))
+    im.load()
+    return im
+
+
+def test_splice_reads_back(image, tmp_path):
+    out = tmp_path / "out.png"
+    before = opened(image)
+    packet = xmp.wrap(xmp.update(None, {"XMP:dc:title": "Packet"}))
+
+    written = png.write_chunks(str(image), str(out), exif_block("New artist"),
+                               {"Title": "New title", "Comment": "Short", "Keyword": "Fresh ✓"}, packet)
+
+    assert written == out.stat().st_size
+    assert len(idat(image)) > 1 and idat(out) == idat(image)
+    assert out.read_bytes().endswith(b"IEND\xaeB`\x82trailing bytes")
+    after = opened(out)
+    assert after.tobytes() == before.tobytes()
+    assert after.text["Title"] == "New title" and after.text["Comment"] == "Short"
+    assert after.text["Keyword"] == "Fresh ✓" and after.text["Author"] == "Ünïcødé"
+    assert after.getexif()[ARTIST] == "New artist"
+    assert after.info["xmp"] == packet
+    assert png.read_text(str(out))["Title"] == "New title"
+
+
+def test_replacements_keep_position(image, tmp_path):
+    out = tmp_path / "out.png"
+
+    png.write_chunks(str(image), str(out), exif_block("New artist"), {"Title": "New title"})
+
+    order = [ctype for ctype, _ in chunks(image)]
+    assert [ctype for ctype, _ in chunks(out)] == order
+    assert order.index(b"eXIf") < order.index(b"IDAT")
+
+
+def test_new_chunks_go_before_idat(tmp_path):
+    src, out = tmp_path / "plain.png", tmp_path / "out.png"
+    Image.new("L", (8, 8), 7).save(str(src))
+
+    png.write_chunks(str(src), str(out), exif_block("Artist"), {"Title": "T"})
+
+    order = [ctype for ctype, _ in chunks(out)]
+    assert {b"eXIf", b"tEXt"} <= set(order[:order.index(b"IDAT")])
+    after = opened(out)
+    assert after.text["Title"] == "T" and after.getexif()[ARTIST] == "Artist"
+    assert idat(out) == idat(src)
+
+
+def test_untouched_file_is_copied(image, tmp_path):
+    out = tmp_path / "out.png"
+
+    png.write_chunks(str(image), str(out))
+
+    assert out.read_bytes() == image.read_bytes()
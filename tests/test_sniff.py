@@ -0,0 +1,145 @@
+"""Content sniffing and the prefix-backed file wrapper."""
+import io
+import zipfile
+
+import pytest
+
+from src import sniff
+from src.core import AudioHandler, DocxHandler, ImageHandler, MetadataManager, PDFHandler
+
+OGG_PAGE = b"OggS" + b"\x00" * 22 + b"\x01" + b"\x1e"  # Header with one lacing value
+
+
+@pytest.mark.parametrize("prefix, ext, kind", [
+    (b"\xff\xd8\xff\xe0", "", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "", "png"),
+    (b"GIF89a", "", "gif"),
+    (b"II*\x00", "", "tiff"),
+    (b"MM\x00*", "", "tiff"),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "", "webp"),
+    (b"RIFF\x00\x00\x00\x00WAVEfmt ", "", "wav"),
+    (b"RIFF\x00\x00\x00\x00AVI LIST", "", None),
+    (b"FORM\x00\x00\x00\x00AIFF", "", "aiff"),
+    (b"fLaC\x00", "", "flac"),
+    (OGG_PAGE + b"\x01vorbis", "", "ogg_vorbis"),
+    (OGG_PAGE + b"OpusHead", "", "ogg_opus"),
+    (OGG_PAGE + b"\x7fFLAC", "", "ogg_flac"),
+    (OGG_PAGE + b"Speex   ", "", "ogg_speex"),
+    (OGG_PAGE + b"\x80theora", "", "ogg_theora"),
+    (OGG_PAGE + b"unknown!", "", None),
+    (b"ID3\x04\x00", ".mp3", "mp3"),
+    (b"ID3\x04\x00", ".aac", "aac"),
+    (b"\x00\x00\x00\x18ftypM4A ", "", "mp4"),
+    (b"\x00\x00\x00\x18ftypqt  ", "", "mp4"),
+    (b"\x00\x00\x00\x18ftypheic", "", "heic"),
+    (b"\x00\x00\x00\x18ftypavif", "", "heic"),
+    (b"\x00\x00\x00\x08wide\x00\x00\x00\x08mdat", "", "mp4"),
+    (b"\x1aE\xdf\xa3", "", "matroska"),
+    (bytes.fromhex("3026B2758E66CF11A6D900AA0062CE6C"), "", "asf"),
+    (b"%PDF-1.7\n", "", "pdf"),
+    (b"\xef\xbb\xbf junk before %PDF-1.4", "", "pdf"),
+    (b"BM" + b"\x00" * 12 + (40).to_bytes(4, "little"), "", "bmp"),
+    (b"BM" + b"\x00" * 12 + (7).to_bytes(4, "little"), "", None),
+    (b"\xff\xf1\x50\x80", "", "aac"),
+    (b"\xff\xfb\x90\x64", "", "mp3"),
+    (b"\xff\xfb\xf0\x64", "", None),  # Bad bitrate index
+    (b"plain text", ".jpg", None),
+    (b"", ".png", None),
+])
+def test_detect(prefix, ext, kind):
+    assert sniff.detect(prefix, ext) == kind
+
+
+def zip_prefix(*names, padding=0):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+        zf.writestr("[Content_Types].xml", b" " * padding)
+        for name in names:
+            zf.writestr(name, b"x")
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("names, padding, ext, kind", [
+    (["word/document.xml"], 0, ".bin", "docx"),
+    (["xl/workbook.xml"], 0, ".bin", "xlsx"),
+    (["word/document.xml"], 8192, ".docx", "docx"),  # Marker past the prefix: the extension decides
+    (["xl/workbook.xml"], 8192, ".xlsx", "xlsx"),
+    (["word/document.xml"], 8192, ".zip", "zip"),
+    (["other.txt"], 0, ".zip", "zip"),
+])
+def test_detect_ooxml(names, padding, ext, kind):
+    data = zip_prefix(*names, padding=padding)
+    assert sniff.detect(data[:sniff.PREFIX_SIZE], ext) == kind
+
+
+@pytest.mark.parametrize("content, name, handler", [
+    (b"\x89PNG\r\n\x1a\n" + b"\x00" * 16, "image.jpg", ImageHandler),
+    (b"%PDF-1.4\n", "document.txt", PDFHandler),
+    (b"fLaC\x00\x00\x00\x22", "song.mp3", AudioHandler),
+    (zip_prefix("word/document.xml"), "renamed.bin", DocxHandler),
+])
+def test_wrong_extension(tmp_path, content, name, handler):
+    path = tmp_path / name
+    path.write_bytes(content)
+
+    found, hint = MetadataManager.resolve(str(path))
+
+    assert isinstance(found, handler)
+    assert hint.prefix == content[:sniff.PREFIX_SIZE]
+
+
+class CountingIO(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.reads = 0
+
+    def read(self, *args):
+        self.reads += 1
+        return super().read(*args)
+
+
+DATA = bytes(range(100))
+
+
+@pytest.fixture
+def wrapped():
+    raw = CountingIO(DATA)
+    return sniff.PrefixedFile(raw, DATA[:10]), raw
+
+
+def test_reads_inside_prefix_cost_nothing(wrapped):
+    f, raw = wrapped
+    assert f.read(4) == DATA[:4] and f.read(6) == DATA[4:10]
+    assert f.tell() == 10 and raw.reads == 0
+
+
+def test_reads_across_the_boundary(wrapped):
+    f, raw = wrapped
+    f.seek(7)
+    assert f.read(6) == DATA[7:13] and f.tell() == 13
+    assert f.read(3) == DATA[13:16]  # Past the prefix: straight from the file
+    f.seek(5)
+    assert f.read() == DATA[5:] and f.tell() == len(DATA)
+    assert f.read(10) == b"" and f.read() == b""
+
+
+def test_seek(wrapped):
+    f, _ = wrapped
+    assert f.seek(20) == 20 and f.read(2) == DATA[20:22]
+    assert f.seek(-4, 1) == 18 and f.read(1) == DATA[18:19]
+    assert f.seek(-3, 2) == 97 and f.read() == DATA[97:]
+    assert f.seek(200) == 200 and f.read(5) == b""
+    with pytest.raises(OSError):
+        f.seek(-1)
+    with pytest.raises(OSError):
+        f.seek(-200, 2)
+    assert f.tell() == 200  # A failed seek leaves the position alone
+
+
+def test_readline_across_the_boundary():
+    data = b"first\nsecond line crosses\nthird"
+    f = sniff.PrefixedFile(io.BytesIO(data), data[:10])
+    assert f.readline() == b"first\n"
+    assert f.readline() == b"second line crosses\n"
+    assert f.tell() == data.index(b"third")
+    assert f.readline(3) == b"thi" and f.readline() == b"rd" and f.readline() == b""
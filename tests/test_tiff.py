@@ -0,0 +1,111 @@
+"""In-place TIFF tag patching, checked against Pillow."""
+from PIL import Image
+import pytest
+
+from src import exif, tiff
+from src.core import ImageHandler
+
+DESCRIPTION, ORIENTATION, ARTIST, COPYRIGHT, DATE_ORIGINAL = 270, 274, 315, 33432, 36867
+
+
+@pytest.fixture(params=[1, 3], ids=["single", "multipage"])
+def image(request, tmp_path):
+    path = tmp_path / "image.tif"
+    frames = [Image.new("RGB", (64, 48), (i * 60, 100, 200 - i * 50)) for i in range(request.param)]
+    for i, frame in enumerate(frames):
+        frame.putpixel((i, i), (1, 2, 3))
+    frames[0].save(str(path), save_all=True, append_images=frames[1:], compression="tiff_lzw",
+                   tiffinfo={ARTIST: "An original artist name", DESCRIPTION: "Description"})
+    return path
+
+
+def pixels(path):
+    with Image.open(str(path)) as im:
+        out = []
+        for i in range(getattr(im, "n_frames", 1)):
+            im.seek(i)
+            out.append(im.tobytes())
+        return out
+
+
+def strips(path):
+    """The compressed strip data of every frame, as the file's own offsets locate it."""
+    data = path.read_bytes()
+    with Image.open(str(path)) as im:
+        out = []
+        for i in range(getattr(im, "n_frames", 1)):
+            im.seek(i)
+            offsets, counts = im.tag_v2[273], im.tag_v2[279]
+            out.append([data[o:o + n] for o, n in zip(offsets, counts)])
+        return out
+
+
+def tags(path):
+    with Image.open(str(path)) as im:
+        found = im.getexif()
+        main, sub = dict(found), dict(found.get_ifd(exif.EXIF_POINTER))
+        im.load()  # Decoding checks the strip offsets; read tags first, as it drops Orientation
+        return main, sub
+
+
+def test_shorter_value_is_patched_in_place(image):
+    before, size = pixels(image), image.stat().st_size
+
+    stats = tiff.write_tags(str(image), {"0th": {ARTIST: "Short"}})
+
+    assert stats.patched > 0 and stats.appended == 0
+    assert image.stat().st_size == size
+    assert tags(image)[0][ARTIST] == "Short"
+    assert pixels(image) == before
+
+
+def test_longer_value_is_appended(image):
+    original = image.read_bytes()
+    before = pixels(image)
+
+    stats = tiff.write_tags(str(image), {"0th": {DESCRIPTION: "d" * 300}})
+
+    assert stats.appended > 0
+    assert image.stat().st_size == len(original) + stats.appended
+    assert tags(image)[0][DESCRIPTION] == "d" * 300
+    assert pixels(image) == before
+
+
+def test_new_tags_and_sub_ifd(image):
+    before = pixels(image)
+
+    tiff.write_tags(str(image), {"0th": {COPYRIGHT: "(c) me"}, "Exif": {DATE_ORIGINAL: "2021:02:02 02:02:02"}})
+
+    main, sub = tags(image)
+    assert main[COPYRIGHT] == "(c) me" and main[ARTIST] == "An original artist name"
+    assert sub[DATE_ORIGINAL] == "2021:02:02 02:02:02"
+    assert pixels(image) == before
+
+    # A second edit patches the relocated IFDs
+    tiff.write_tags(str(image), {"0th": {COPYRIGHT: "(c) us"}, "Exif": {DATE_ORIGINAL: "2022:03:03 03:03:03"}})
+    main, sub = tags(image)
+    assert main[COPYRIGHT] == "(c) us" and sub[DATE_ORIGINAL] == "2022:03:03 03:03:03"
+    assert pixels(image) == before
+
+
+def test_numeric_value(image):
+    before = strips(image)
+
+    tiff.write_tags(str(image), {"0th": {ORIENTATION: 6}})
+
+    assert tags(image)[0][ORIENTATION] == 6
+    assert strips(image) == before  # Pillow rotates decoded pixels by Orientation
+
+
+def test_handler_round_trip(image):
+    handler = ImageHandler()
+    before = pixels(image)
+    edits = {"Artist": "Someone else entirely", "Exif:DateTimeOriginal": "2020:01:01 00:00:00"}
+
+    result = handler.write(str(image), edits)
+
+    assert result.written
+    loaded = handler.load(str(image))
+    assert {k: loaded[k] for k in edits} == edits
+    assert not handler.write(str(image), edits).written
+    assert pixels(image) == before
@@ -0,0 +1,95 @@
+"""WebP RIFF editing, checked against Pillow."""
+from PIL import Image
+import pytest
+
+from src import webp, xmp
+
+ARTIST = 315
+METADATA = (webp.VP8X, webp.EXIF, webp.XMP)
+
+
+def exif_block(artist):
+    block = Image.Exif()
+    block[ARTIST] = artist
+    return block.tobytes()
+
+
+def save(path, **params):
+    frames = [Image.new("RGBA", (40, 30), (200, 10 * i, 30, 255 - 60 * i)) for i in range(2)]
+    frames[0].putpixel((3, 4), (1, 2, 3, 4))
+    frames[0].save(str(path), **params)
+    return path
+
+
+FIXTURES = {
+    "lossy": dict(lossless=False),
+    "lossless": dict(lossless=True),
+    "extended": dict(lossless=True, exif=exif_block("Old artist"), xmp=b"<x:xmpmeta/>"),
+    "animated": dict(save_all=True, append_images=[Image.new("RGBA", (40, 30), (0, 90, 0, 200))], duration=100),
+}
+
+
+@pytest.fixture(params=sorted(FIXTURES))
+def image(request, tmp_path):
+    return save(tmp_path / "image.webp", **FIXTURES[request.param])
+
+
+def frames(path):
+    with Image.open(str(path)) as im:
+        out = []
+        for i in range(getattr(im, "n_frames", 1)):
+            im.seek(i)
+            out.append(im.convert("RGBA").tobytes())
+        return out
+
+
+def bitstream(path):
+    """Every chunk but the metadata ones, byte for byte."""
+    with open(path, "rb") as f:
+        out = []
+        for fourcc, offset, length in webp.iter_chunks(f):
+            if fourcc not in METADATA:
+                f.seek(offset)
+                out.append((fourcc, f.read(length)))
+        return out
+
+
+@pytest.mark.parametrize("exif_artist, packet", [
+    ("New artist", None),
+    (None, xmp.wrap(xmp.update(None, {"XMP:dc:title": "Packet"}))),
+    ("Odd length artist", xmp.wrap(xmp.update(None, {"XMP:dc:title": "Both"}))),
+])
+def test_rewrite_reads_back(image, tmp_path, exif_artist, packet):
+    out = tmp_path / "out.webp"
+    exif_bytes = exif_block(exif_artist) if exif_artist else None
+    before = frames(image)
+
+    written = webp.write_chunks(str(image), str(out), exif_bytes, packet)
+
+    data = out.read_bytes()
+    assert written == len(data)
+    assert int.from_bytes(data[4:8], "little") == len(data) - 8
+    assert bitstream(out) == bitstream(image)
+    assert frames(out) == before
+    with Image.open(str(out)) as im:
+        if exif_artist:
+            assert im.getexif()[ARTIST] == exif_artist
+        if packet:
+            assert im.info["xmp"] == packet
+    with open(out, "rb") as f:
+        kinds = [fourcc for fourcc, _, _ in webp.iter_chunks(f)]
+        f.seek(20)  # RIFF header, VP8X chunk header, then the flags byte
+        flags = f.read(1)[0]
+    assert kinds[0] == webp.VP8X
+    assert bool(flags & webp.EXIF_FLAG) == (webp.EXIF in kinds)
+    assert bool(flags & webp.XMP_FLAG) == (webp.XMP in kinds)
+    if webp.EXIF in kinds and webp.XMP in kinds:
+        assert kinds.index(webp.EXIF) < kinds.index(webp.XMP)
+
+
+def test_untouched_file_is_copied(image, tmp_path):
+    out = tmp_path / "out.webp"
+
+    webp.write_chunks(str(image), str(out))
+
+    assert out.read_bytes() == image.read_bytes()